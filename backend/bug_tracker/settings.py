@@ -33,6 +33,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'core.querystats.QueryStatsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -69,6 +70,63 @@ DATABASES = {
     )
 }
 
+# Keep row writes and the denormalized counters they touch in one transaction
+DATABASES['default']['ATOMIC_REQUESTS'] = True
+
+# Cache (use a shared backend such as Redis in production so that
+# invalidations reach every worker)
+CACHES = {
+    'default': {
+        'BACKEND': config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': config('CACHE_LOCATION', default='bug-tracker'),
+    }
+}
+
+# Upper bound on how long cached dashboard stats are served
+DASHBOARD_CACHE_TTL = config('DASHBOARD_CACHE_TTL', default=300, cast=int)
+
+# Authenticated users are resolved through core.usercache: a per-process LRU
+# trusted for USER_CACHE_LOCAL_TTL seconds, in front of the shared cache
+USER_CACHE_TTL = config('USER_CACHE_TTL', default=300, cast=int)
+USER_CACHE_LOCAL_TTL = config('USER_CACHE_LOCAL_TTL', default=5, cast=int)
+USER_CACHE_SIZE = config('USER_CACHE_SIZE', default=1024, cast=int)
+
+# Upper bound on how long a user's owned and member project ids are cached
+PROJECT_ACCESS_CACHE_TTL = config('PROJECT_ACCESS_CACHE_TTL', default=300, cast=int)
+
+# Per-process Bloom filter of revoked refresh tokens (see core.revocation)
+REVOKED_TOKENS_BLOOM_CAPACITY = config('REVOKED_TOKENS_BLOOM_CAPACITY', default=100000, cast=int)
+REVOKED_TOKENS_BLOOM_ERROR_RATE = config('REVOKED_TOKENS_BLOOM_ERROR_RATE', default=0.001, cast=float)
+
+# How long a process trusts an API key it has verified (see core.apikeys)
+API_KEY_CACHE_TTL = config('API_KEY_CACHE_TTL', default=60, cast=int)
+API_KEY_CACHE_SIZE = config('API_KEY_CACHE_SIZE', default=1024, cast=int)
+
+# SQL instrumentation of a sample of requests (see core.querystats)
+QUERY_STATS_SAMPLE_RATE = config('QUERY_STATS_SAMPLE_RATE', default=1.0 if DEBUG else 0.01, cast=float)
+QUERY_STATS_N_PLUS_ONE_THRESHOLD = config('QUERY_STATS_N_PLUS_ONE_THRESHOLD', default=5, cast=int)
+QUERY_STATS_SLOWEST = config('QUERY_STATS_SLOWEST', default=3, cast=int)
+QUERY_STATS_MAX_SQL_LENGTH = config('QUERY_STATS_MAX_SQL_LENGTH', default=500, cast=int)
+QUERY_STATS_SERVER_TIMING = config('QUERY_STATS_SERVER_TIMING', default=True, cast=bool)
+
+# Query stats are logged as one JSON line per sampled request
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'core.querystats': {
+            'handlers': ['console'],
+            'level': config('QUERY_STATS_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,7 +159,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'core.authentication.CustomJWTAuthentication',
+        'core.authentication.APIKeyAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -111,7 +170,16 @@ REST_FRAMEWORK = {
         'rest_framework.filters.SearchFilter',
         'rest_framework.filters.OrderingFilter',
     ],
-    'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
+    'DEFAULT_RENDERER_CLASSES': [
+        'core.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'core.renderers.ORJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'core.pagination.KeysetPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
@@ -0,0 +1,213 @@
+"""
+Which projects a user owns or belongs to.
+
+Access is stored denormalized in ProjectAccessEntry: one row per user and
+project, flagged when the user is the owner. The signal handlers in
+core.signals keep it in step with ``Project.created_by`` and
+``Project.members``, and ``rebuild`` recomputes it from them after bulk
+loads. Every list queryset is scoped with ``scope``, an EXISTS probe on the
+(user, project) unique index, so no query joins the member table and
+de-duplicates with DISTINCT.
+
+Permission checks need the same answer for single objects. Each request
+resolves the requesting user's owned and member project ids once, as two
+sets, and every check after that is a set lookup. The sets are kept in the
+shared cache under the user id and a version stamp. Any change to a user's
+rows bumps their stamp once the transaction commits, so an entry computed
+from pre-commit data is stored under a stamp that is never read again.
+"""
+
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+
+from .models import Project, ProjectAccessEntry
+
+BATCH_SIZE = 5000
+
+
+def version_key(user_id):
+    return f'access:projects:version:{user_id}'
+
+
+def cache_key(user_id, version):
+    return f'access:projects:{user_id}:{version}'
+
+
+def get_ttl():
+    return getattr(settings, 'PROJECT_ACCESS_CACHE_TTL', 300)
+
+
+class ProjectAccess:
+    """
+    The projects one user owns and is a member of.
+    """
+
+    def __init__(self, owned, member):
+        self.owned = frozenset(owned)
+        self.member = frozenset(member)
+        self.projects = self.owned | self.member
+
+    def is_owner(self, project_id):
+        return project_id in self.owned
+
+    def is_member(self, project_id):
+        """
+        Whether the user owns or is a member of the project.
+        """
+        return project_id in self.projects
+
+
+def _current_version(user_id):
+    # A nanosecond clock start means a version lost to eviction never comes back
+    return cache.get_or_set(version_key(user_id), time.time_ns(), None)
+
+
+def get_access(user):
+    """
+    Return the ProjectAccess of ``user``, from the cache when possible.
+    """
+    if not user.is_authenticated:
+        return ProjectAccess((), ())
+
+    key = cache_key(user.pk, _current_version(user.pk))
+    entry = cache.get(key)
+    if entry is None:
+        rows = list(ProjectAccessEntry.objects.filter(user_id=user.pk).values_list('project_id', 'is_owner'))
+        entry = (
+            [project_id for project_id, is_owner in rows if is_owner],
+            [project_id for project_id, is_owner in rows if not is_owner],
+        )
+        cache.set(key, entry, get_ttl())
+    return ProjectAccess(*entry)
+
+
+def for_request(request):
+    """
+    Return the ProjectAccess of the requesting user, resolved once per request.
+    """
+    access = getattr(request, '_project_access', None)
+    if access is None:
+        access = request._project_access = get_access(request.user)
+    return access
+
+
+def has_access(user, project_field='project'):
+    """
+    A filter condition: ``project_field`` is a project ``user`` owns or is a
+    member of. Pass ``'pk'`` when filtering projects themselves.
+    """
+    return Exists(ProjectAccessEntry.objects.filter(user_id=user.pk, project_id=OuterRef(project_field)))
+
+
+def scope(queryset, user, project_field='project'):
+    """
+    Restrict ``queryset`` to the rows of projects ``user`` can access.
+    """
+    return queryset.filter(has_access(user, project_field))
+
+
+def user_ids(project_ids):
+    """
+    Every user with access to one of ``project_ids``.
+    """
+    return set(
+        ProjectAccessEntry.objects.filter(project_id__in=project_ids).values_list('user_id', flat=True)
+    )
+
+
+def _bump(user_ids):
+    for user_id in user_ids:
+        try:
+            cache.incr(version_key(user_id))
+        except ValueError:
+            cache.set(version_key(user_id), time.time_ns(), None)
+
+
+def invalidate(user_ids):
+    """
+    Drop the cached project sets of ``user_ids`` once the current transaction commits.
+    """
+    user_ids = set(user_ids) - {None}
+    if user_ids:
+        transaction.on_commit(lambda: _bump(user_ids))
+
+
+def owner_changed(project, old_owner_id):
+    """
+    Record ``project.created_by`` as its owner, in place of ``old_owner_id``.
+    """
+    if old_owner_id is not None and old_owner_id != project.created_by_id:
+        if project.members.filter(pk=old_owner_id).exists():
+            ProjectAccessEntry.objects.filter(user_id=old_owner_id, project=project).update(is_owner=False)
+        else:
+            ProjectAccessEntry.objects.filter(user_id=old_owner_id, project=project).delete()
+    ProjectAccessEntry.objects.update_or_create(
+        user_id=project.created_by_id, project=project, defaults={'is_owner': True}
+    )
+    invalidate([old_owner_id, project.created_by_id])
+
+
+def members_added(pairs):
+    """
+    Grant access for ``(project_id, user_id)`` pairs.
+    """
+    ProjectAccessEntry.objects.bulk_create(
+        [ProjectAccessEntry(project_id=project_id, user_id=user_id) for project_id, user_id in pairs],
+        ignore_conflicts=True,
+    )
+    invalidate(user_id for _project_id, user_id in pairs)
+
+
+def members_removed(pairs):
+    """
+    Revoke access for ``(project_id, user_id)`` pairs, except the owners'.
+    """
+    for project_id, user_id in pairs:
+        ProjectAccessEntry.objects.filter(project_id=project_id, user_id=user_id, is_owner=False).delete()
+    invalidate(user_id for _project_id, user_id in pairs)
+
+
+def _chunked(iterable):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, BATCH_SIZE)):
+        yield chunk
+
+
+def rebuild():
+    """
+    Recompute every entry from the projects and their members. Returns the number of entries.
+    """
+    with transaction.atomic():
+        affected = set(ProjectAccessEntry.objects.values_list('user_id', flat=True).distinct())
+        ProjectAccessEntry.objects.all().delete()
+
+        owners = Project.objects.values_list('pk', 'created_by_id').iterator(chunk_size=BATCH_SIZE)
+        for chunk in _chunked(owners):
+            ProjectAccessEntry.objects.bulk_create(
+                [ProjectAccessEntry(project_id=pk, user_id=owner_id, is_owner=True) for pk, owner_id in chunk]
+            )
+        members = Project.members.through.objects.values_list('project_id', 'user_id').iterator(chunk_size=BATCH_SIZE)
+        for chunk in _chunked(members):
+            # Owners who are also members keep their owner entry
+            ProjectAccessEntry.objects.bulk_create(
+                [ProjectAccessEntry(project_id=project_id, user_id=user_id) for project_id, user_id in chunk],
+                ignore_conflicts=True,
+            )
+
+        total = ProjectAccessEntry.objects.count()
+        affected.update(ProjectAccessEntry.objects.values_list('user_id', flat=True).distinct())
+        invalidate(affected)
+    return total
+
+
+def install(using='default'):
+    """
+    Fill the table after the migration that creates it, when projects exist already.
+    """
+    if not ProjectAccessEntry.objects.using(using).exists() and Project.objects.using(using).exists():
+        rebuild()
@@ -1,35 +1,19 @@
 from django.contrib import admin
 from django.utils.html import format_html
 from django.urls import reverse
-from django.db.models import Count
+from django.db.models.functions import Coalesce, Now
+from . import counters
 from .models import Project, Issue, Comment, Activity, Label, IssueAttachment, IssueLabel
 
 
 @admin.register(Project)
 class ProjectAdmin(admin.ModelAdmin):
-    list_display = ['name', 'created_by', 'members_count', 'issues_count', 'created_at', 'is_active']
+    list_display = ['name', 'created_by', 'members_count', 'issues_count', 'created_at', 'is_active', 'retention_days']
     list_filter = ['created_at', 'is_active']
     search_fields = ['name', 'description']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'issues_count', 'open_issues_count', 'members_count']
     filter_horizontal = ['members']
     date_hierarchy = 'created_at'
-    
-    def get_queryset(self, request):
-        queryset = super().get_queryset(request)
-        return queryset.annotate(
-            issues_count=Count('issues', distinct=True),
-            members_count=Count('members', distinct=True)
-        )
-    
-    def issues_count(self, obj):
-        return obj.issues_count
-    issues_count.admin_order_field = 'issues_count'
-    issues_count.short_description = 'Issues'
-    
-    def members_count(self, obj):
-        return obj.members_count
-    members_count.admin_order_field = 'members_count'
-    members_count.short_description = 'Members'
 
 
 @admin.register(Issue)
@@ -43,7 +27,7 @@ class IssueAdmin(admin.ModelAdmin):
         'due_date', 'project', 'is_active'
     ]
     search_fields = ['title', 'description']
-    readonly_fields = ['created_at', 'updated_at', 'is_overdue']
+    readonly_fields = ['created_at', 'updated_at', 'closed_at', 'is_overdue', 'comments_count', 'attachments_count']
     raw_id_fields = ['project', 'reporter', 'assignee']
     filter_horizontal = ['watchers']
     date_hierarchy = 'created_at'
@@ -63,7 +47,7 @@ class IssueAdmin(admin.ModelAdmin):
             'fields': ('due_date', 'estimated_hours')
         }),
         ('System Fields', {
-            'fields': ('created_at', 'updated_at', 'is_active'),
+            'fields': ('created_at', 'updated_at', 'closed_at', 'is_active', 'comments_count', 'attachments_count'),
             'classes': ('collapse',)
         })
     )
@@ -74,13 +58,19 @@ class IssueAdmin(admin.ModelAdmin):
         return 'No'
     is_overdue.short_description = 'Overdue'
     
+    def _refresh_project_counters(self, queryset):
+        # QuerySet.update() bypasses the counter signals
+        counters.rebuild(project_ids=set(queryset.values_list('project_id', flat=True)))
+    
     def mark_as_resolved(self, request, queryset):
-        updated = queryset.update(status='resolved')
+        updated = queryset.update(status='resolved', closed_at=Coalesce('closed_at', Now()))
+        self._refresh_project_counters(queryset)
         self.message_user(request, f'{updated} issues marked as resolved.')
     mark_as_resolved.short_description = 'Mark selected issues as resolved'
     
     def mark_as_closed(self, request, queryset):
-        updated = queryset.update(status='closed')
+        updated = queryset.update(status='closed', closed_at=Coalesce('closed_at', Now()))
+        self._refresh_project_counters(queryset)
         self.message_user(request, f'{updated} issues marked as closed.')
     mark_as_closed.short_description = 'Mark selected issues as closed'
     
@@ -0,0 +1,176 @@
+"""
+Project analytics.
+
+``project_summary`` computes every distribution of a project's issues in a
+single GROUP BY pass. Trends over arbitrary date ranges are read from the
+ProjectDailyStats rollup table, which ``rollup`` fills in one day at a time
+so the analytics page never scans the issue table for history.
+
+A rollup row records the issues opened and closed that day and the open
+issues at the end of the day by status, priority and severity. Opened and
+closed counts come from ``created_at``/``closed_at`` and are exact; the
+end-of-day distributions use each issue's attributes at the time the rollup
+runs, so they are exact when the command runs daily and approximate when
+backfilling old history.
+"""
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Min, Q
+from django.utils import timezone
+
+from .models import Issue, ProjectDailyStats
+
+OPEN_STATUSES = ['open', 'in_progress', 'reopened']
+
+
+def project_summary(project):
+    """
+    Return totals and status/priority/severity distributions in one query.
+    """
+    rows = Issue.objects.filter(project=project, is_active=True).values(
+        'status', 'priority', 'severity'
+    ).annotate(
+        total=Count('id'),
+        overdue=Count('id', filter=Q(due_date__lt=timezone.now(), status__in=OPEN_STATUSES)),
+    ).order_by()
+
+    status_counts = dict.fromkeys((value for value, _label in Issue.STATUS_CHOICES), 0)
+    priority_counts = dict.fromkeys((value for value, _label in Issue.PRIORITY_CHOICES), 0)
+    severity_counts = dict.fromkeys((value for value, _label in Issue.SEVERITY_CHOICES), 0)
+    total = overdue = 0
+
+    for row in rows:
+        status_counts[row['status']] = status_counts.get(row['status'], 0) + row['total']
+        priority_counts[row['priority']] = priority_counts.get(row['priority'], 0) + row['total']
+        severity_counts[row['severity']] = severity_counts.get(row['severity'], 0) + row['total']
+        total += row['total']
+        overdue += row['overdue']
+
+    return {
+        'total_issues': total,
+        'overdue_issues': overdue,
+        'status_distribution': status_counts,
+        'priority_distribution': priority_counts,
+        'severity_distribution': severity_counts,
+    }
+
+
+def top_contributors(project, limit=10):
+    """
+    Return ``[(user_id, issue_count)]`` counting issues reported plus issues assigned.
+
+    Reported and assigned issues are grouped separately so one user's rows
+    never multiply each other.
+    """
+    issues = Issue.objects.filter(project=project).order_by()
+    counts = Counter()
+    for user_id, total in issues.values_list('reporter_id').annotate(total=Count('id')):
+        counts[user_id] += total
+    for user_id, total in issues.filter(assignee__isnull=False).values_list('assignee_id').annotate(total=Count('id')):
+        counts[user_id] += total
+    return sorted(counts.items(), key=lambda item: (-item[1], item[0]))[:limit]
+
+
+def trends(project, start, end):
+    """
+    Return the rollup rows of a project between two dates, inclusive.
+    """
+    return list(
+        ProjectDailyStats.objects.filter(project=project, date__range=(start, end)).values(
+            'date', 'opened', 'closed', 'open_total', 'by_status', 'by_priority', 'by_severity'
+        )
+    )
+
+
+def _day_bounds(day):
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    return start, start + timedelta(days=1)
+
+
+def rollup_day(day):
+    """
+    Write the rollup rows of every project for one day. Returns the row count.
+    """
+    day_start, day_end = _day_bounds(day)
+    active = Issue.objects.filter(is_active=True).order_by()
+
+    opened = dict(
+        active.filter(created_at__gte=day_start, created_at__lt=day_end)
+        .values_list('project_id').annotate(total=Count('id'))
+    )
+    closed = dict(
+        active.filter(closed_at__gte=day_start, closed_at__lt=day_end)
+        .values_list('project_id').annotate(total=Count('id'))
+    )
+
+    open_at_end = active.filter(created_at__lt=day_end).filter(
+        Q(closed_at__isnull=True) | Q(closed_at__gte=day_end)
+    )
+    rows = {}
+    for project_id, status, priority, severity, total in open_at_end.values_list(
+        'project_id', 'status', 'priority', 'severity'
+    ).annotate(total=Count('id')):
+        row = rows.setdefault(project_id, {'open_total': 0, 'by_status': Counter(), 'by_priority': Counter(), 'by_severity': Counter()})
+        # An issue closed after this day was still open on it
+        row['by_status'][status if status in OPEN_STATUSES else 'open'] += total
+        row['by_priority'][priority] += total
+        row['by_severity'][severity] += total
+        row['open_total'] += total
+
+    project_ids = set(opened) | set(closed) | set(rows)
+    stats = []
+    for project_id in project_ids:
+        row = rows.get(project_id, {})
+        stats.append(ProjectDailyStats(
+            project_id=project_id,
+            date=day,
+            opened=opened.get(project_id, 0),
+            closed=closed.get(project_id, 0),
+            open_total=row.get('open_total', 0),
+            by_status=dict(row.get('by_status', {})),
+            by_priority=dict(row.get('by_priority', {})),
+            by_severity=dict(row.get('by_severity', {})),
+        ))
+
+    with transaction.atomic():
+        ProjectDailyStats.objects.filter(date=day).delete()
+        ProjectDailyStats.objects.bulk_create(stats, batch_size=1000)
+    return len(stats)
+
+
+def backfill_closed_at():
+    """
+    Give closed issues that predate ``closed_at`` tracking their last update time.
+    """
+    return Issue.objects.filter(
+        status__in=Issue.CLOSED_STATUSES, closed_at__isnull=True
+    ).update(closed_at=F('updated_at'))
+
+
+def pending_days(until=None):
+    """
+    Return the first day that still needs a rollup row and the last day to roll up.
+    """
+    until = until or timezone.localdate() - timedelta(days=1)
+    last = ProjectDailyStats.objects.aggregate(last=Max('date'))['last']
+    if last is not None:
+        return last + timedelta(days=1), until
+
+    first = Issue.objects.aggregate(first=Min('created_at'))['first']
+    if first is None:
+        return until + timedelta(days=1), until
+    return timezone.localtime(first).date(), until
+
+
+def rollup(start, end):
+    """
+    Roll up every day from ``start`` to ``end`` inclusive. Yields ``(day, rows)``.
+    """
+    day = start
+    while day <= end:
+        yield day, rollup_day(day)
+        day += timedelta(days=1)
+
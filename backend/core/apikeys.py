@@ -0,0 +1,204 @@
+"""
+API keys for integrations.
+
+A key looks like ``bt_<prefix>_<secret>``. Only the SHA-256 of the whole
+key is stored, next to the prefix, which has a unique index: verifying a
+key is one primary-key-sized lookup by prefix followed by a constant-time
+comparison of the hashes. The secret is 256 random bits, so a fast hash is
+enough; there is nothing to brute-force.
+
+Verified keys are remembered per process for API_KEY_CACHE_TTL seconds, keyed
+by the hash of the presented key, so a busy integration costs no query at
+all. The user a key acts as comes from core.usercache. Revoking or rotating
+a key drops it from this process's cache at once; other processes stop
+accepting it when their entry expires.
+
+Usage is counted in memory and written as one UPDATE per key once
+USAGE_FLUSH_EVERY requests have accumulated or USAGE_FLUSH_INTERVAL seconds
+have passed. The write runs after the request's transaction commits, and at
+process exit.
+
+Rotating a key issues a new one with the same name, user and scopes. The old
+key keeps working until the end of a grace period, so callers can switch over.
+"""
+
+import atexit
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+from collections import Counter, namedtuple
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import APIKey
+
+KEY_PREFIX = 'bt'
+SCOPES = [scope for scope, _label in APIKey.SCOPE_CHOICES]
+USAGE_FLUSH_EVERY = 100
+USAGE_FLUSH_INTERVAL = 30
+
+# What a request sees as ``request.auth``
+VerifiedKey = namedtuple('VerifiedKey', ['id', 'name', 'user_id', 'scopes', 'expires_at'])
+
+
+def hash_key(raw_key):
+    return hashlib.sha256(raw_key.encode()).hexdigest()
+
+
+def get_cache_ttl():
+    return getattr(settings, 'API_KEY_CACHE_TTL', 60)
+
+
+def generate(name, user, scopes=('read',), expires_at=None):
+    """
+    Create a key and return ``(api_key, raw_key)``. The raw key is not stored
+    and cannot be shown again.
+    """
+    unknown = set(scopes) - set(SCOPES)
+    if unknown:
+        raise ValueError(f'Unknown scopes: {", ".join(sorted(unknown))}')
+
+    prefix = secrets.token_hex(6)
+    raw_key = f'{KEY_PREFIX}_{prefix}_{secrets.token_urlsafe(32)}'
+    api_key = APIKey.objects.create(
+        name=name, user=user, prefix=prefix, key_hash=hash_key(raw_key),
+        scopes=list(scopes), expires_at=expires_at,
+    )
+    return api_key, raw_key
+
+
+class VerificationCache:
+    """
+    Thread-safe map of ``key hash -> (VerifiedKey, verified_at)``.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = {}
+
+    def get(self, digest):
+        with self.lock:
+            entry = self.entries.get(digest)
+        if entry is None or time.monotonic() - entry[1] >= get_cache_ttl():
+            return None
+        return entry[0]
+
+    def set(self, digest, key):
+        with self.lock:
+            if len(self.entries) >= getattr(settings, 'API_KEY_CACHE_SIZE', 1024):
+                self.entries.clear()
+            self.entries[digest] = (key, time.monotonic())
+
+    def discard(self, key_ids):
+        key_ids = set(key_ids)
+        with self.lock:
+            for digest in [d for d, (key, _at) in self.entries.items() if key.id in key_ids]:
+                del self.entries[digest]
+
+
+verified = VerificationCache()
+
+
+def _parse(raw_key):
+    parts = raw_key.split('_', 2)
+    if len(parts) != 3 or parts[0] != KEY_PREFIX:
+        return None
+    return parts[1]
+
+
+def verify(raw_key):
+    """
+    Return the VerifiedKey for ``raw_key``, or None if it is unknown,
+    inactive or expired.
+    """
+    digest = hash_key(raw_key)
+    key = verified.get(digest)
+    if key is None:
+        prefix = _parse(raw_key)
+        if prefix is None:
+            return None
+        row = APIKey.objects.filter(prefix=prefix, is_active=True).values_list(
+            'id', 'name', 'user_id', 'scopes', 'expires_at', 'key_hash'
+        ).first()
+        if row is None or not hmac.compare_digest(row[-1], digest):
+            return None
+        key = VerifiedKey(*row[:-1])
+        verified.set(digest, key)
+
+    if key.expires_at is not None and key.expires_at <= timezone.now():
+        return None
+    return key
+
+
+class UsageCounter:
+    """
+    Per-process usage counts waiting to be written.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counts = Counter()
+        self.last_used = {}
+        self.flushed_at = time.monotonic()
+
+    def record(self, key_id):
+        """
+        Count one use. Returns True when a flush is due.
+        """
+        with self.lock:
+            self.counts[key_id] += 1
+            self.last_used[key_id] = timezone.now()
+            return (
+                sum(self.counts.values()) >= USAGE_FLUSH_EVERY
+                or time.monotonic() - self.flushed_at >= USAGE_FLUSH_INTERVAL
+            )
+
+    def flush(self):
+        with self.lock:
+            counts, last_used = self.counts, self.last_used
+            self.counts, self.last_used = Counter(), {}
+            self.flushed_at = time.monotonic()
+
+        for key_id, count in counts.items():
+            used_at = last_used[key_id]
+            APIKey.objects.filter(pk=key_id).update(
+                usage_count=F('usage_count') + count,
+                last_used_at=Greatest(Coalesce(F('last_used_at'), Value(used_at)), Value(used_at)),
+            )
+
+
+usage = UsageCounter()
+atexit.register(usage.flush)
+
+
+def record_use(key):
+    if usage.record(key.id):
+        transaction.on_commit(usage.flush)
+
+
+def revoke(api_key):
+    api_key.is_active = False
+    api_key.save(update_fields=['is_active'])
+    transaction.on_commit(lambda: verified.discard([api_key.pk]))
+
+
+def rotate(api_key, grace=timedelta(hours=24)):
+    """
+    Issue a replacement for ``api_key`` and let the old key expire after
+    ``grace``. Returns ``(new_key, raw_key)``.
+    """
+    with transaction.atomic():
+        new_key, raw_key = generate(api_key.name, api_key.user, api_key.scopes, api_key.expires_at)
+        expires_at = timezone.now() + grace
+        if api_key.expires_at is None or api_key.expires_at > expires_at:
+            api_key.expires_at = expires_at
+            api_key.save(update_fields=['expires_at'])
+        transaction.on_commit(lambda: verified.discard([api_key.pk]))
+    return new_key, raw_key
@@ -0,0 +1,280 @@
+"""
+Cold storage for issues that have left the working set.
+
+Soft-deleted issues and issues closed for longer than a cutoff are moved out
+of the hot tables (issues, watchers, labels, comments, activities and
+attachments) into one ArchivedIssue row each. That way the tables and
+indexes behind every list, dashboard and search query only hold live data.
+The archived row keeps each table's rows in the backup layout, column names
+plus value lists, and ``restore_issues`` puts them back exactly, ids and
+timestamps included, except where a user or label they point at has been
+deleted since. Attachment files stay where they are.
+
+Issues move in batches, one transaction per batch. The hot rows are deleted
+with raw DELETEs, children first, and the counter, search and dashboard
+side effects that deleting through the ORM would trigger are applied per
+batch. Archived issues leave the lists, counters and analytics summaries.
+Those that were still active stay readable by id: ``load_issue`` rebuilds
+unsaved instances, with comments and attachments prefetched, for the issue
+detail endpoint. They are read-only until restored.
+"""
+
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+import orjson
+from django.contrib.auth.models import User
+from django.db import connection, models, transaction
+from django.db.models import F, Q
+
+from . import counters, dashboard, restore, search
+from .models import Activity, ArchivedIssue, Comment, Issue, IssueAttachment, IssueLabel, Label, Project, SearchDocument
+
+BATCH_SIZE = 200
+
+
+def archived_tables():
+    """
+    Return ``(model, issue column)`` for every table moved with an issue,
+    parents before children.
+    """
+    return [
+        (Issue, 'id'),
+        (Issue.watchers.through, 'issue_id'),
+        (IssueLabel, 'issue_id'),
+        (Comment, 'issue_id'),
+        (Activity, 'issue_id'),
+        (IssueAttachment, 'issue_id'),
+    ]
+
+
+def candidates(now, closed_days):
+    """
+    Issues to archive: soft-deleted ones and those closed more than ``closed_days`` ago.
+    """
+    return Issue.objects.filter(
+        Q(is_active=False) | Q(status__in=Issue.CLOSED_STATUSES, closed_at__lt=now - timedelta(days=closed_days))
+    )
+
+
+def _collect(pks):
+    """
+    Read every row belonging to the issues in ``pks``, grouped by issue.
+    """
+    tables = defaultdict(dict)
+    for model, column in archived_tables():
+        columns = [field.attname for field in model._meta.concrete_fields]
+        rows = model._base_manager.filter(**{f'{column}__in': pks}).order_by('pk').values_list(column, *columns)
+        for issue_id, *values in rows:
+            table = tables[issue_id].setdefault(model._meta.label_lower, {'columns': columns, 'rows': []})
+            table['rows'].append(values)
+    # orjson keeps full datetime precision and turns decimals into strings
+    return {issue_id: orjson.loads(orjson.dumps(rows, default=str)) for issue_id, rows in tables.items()}
+
+
+def _adjust_counters(issue_rows, sign):
+    """
+    Add (``sign`` 1) or remove (-1) the counted issues among ``issue_rows``
+    from their projects' counters. Returns the projects touched.
+    """
+    issues, open_issues = Counter(), Counter()
+    for _pk, project_id, is_active, status in issue_rows:
+        if is_active:
+            issues[project_id] += sign
+            open_issues[project_id] += sign * (status == 'open')
+    for project_id, count in issues.items():
+        Project.objects.filter(pk=project_id).update(
+            issues_count=F('issues_count') + count,
+            open_issues_count=F('open_issues_count') + open_issues[project_id],
+        )
+    return set(issues)
+
+
+def archive_batch(pks, now):
+    """
+    Move the issues in ``pks`` and their rows into the archive.
+    """
+    issue_rows = list(Issue.objects.filter(pk__in=pks).values_list('pk', 'project_id', 'is_active', 'status'))
+    pks = [pk for pk, _project_id, _is_active, _status in issue_rows]
+    tables = _collect(pks)
+
+    ArchivedIssue.objects.bulk_create([
+        ArchivedIssue(id=pk, project_id=project_id, is_active=is_active, archived_at=now, rows=tables[pk])
+        for pk, project_id, is_active, _status in issue_rows
+    ])
+
+    search.remove_documents(SearchDocument.objects.filter(issue_id__in=pks))
+    for model, column in reversed(archived_tables()):
+        model._base_manager.filter(**{f'{column}__in': pks})._raw_delete(connection.alias)
+
+    project_ids = _adjust_counters(issue_rows, -1)
+    dashboard.invalidate(project_ids=project_ids)
+    return len(pks)
+
+
+def archive_issues(queryset, now, batch_size=BATCH_SIZE, pause=0):
+    """
+    Archive the issues in ``queryset`` in batches, sleeping ``pause`` seconds
+    between them. Yields the size of each batch once it has committed.
+    """
+    after = 0
+    while True:
+        pks = list(queryset.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        with transaction.atomic():
+            count = archive_batch(pks, now)
+        after = pks[-1]
+        yield count
+        if pause:
+            time.sleep(pause)
+
+
+def _references(model):
+    """
+    The columns of ``model`` pointing at rows that can be deleted while its
+    issue is archived: users, labels and other rows of the same table.
+    """
+    return [
+        field for field in model._meta.concrete_fields
+        if field.is_relation and field.related_model in (User, Label, model)
+    ]
+
+
+def _live_rows(archived):
+    """
+    Apply the user and label deletions since archiving to the rows of
+    ``archived`` the way their ``on_delete`` would have applied them live.
+
+    Returns ``(tables, skipped, dropped)``: the rows to restore per entry id,
+    the ids of the issues deleted with their reporter, and the number of rows
+    left out per table.
+    """
+    referenced = defaultdict(set)
+    for entry in archived:
+        for model, _column in archived_tables():
+            table = entry.rows.get(model._meta.label_lower)
+            for field in _references(model) if table else ():
+                if field.related_model is not model:
+                    index = table['columns'].index(field.attname)
+                    referenced[field.related_model].update(row[index] for row in table['rows'])
+    live = {
+        related: set(related._base_manager.filter(pk__in=pks - {None}).values_list('pk', flat=True))
+        for related, pks in referenced.items()
+    }
+
+    tables, skipped, dropped = {}, [], Counter()
+    for entry in archived:
+        kept = {}
+        for model, _column in archived_tables():
+            label = model._meta.label_lower
+            table = entry.rows.get(label)
+            if not table:
+                continue
+            columns = table['columns']
+            pk_index = columns.index(model._meta.pk.attname)
+            references = [(columns.index(field.attname), field) for field in _references(model)]
+            gone, rows = set(), []
+            for row in table['rows']:
+                row = list(row)
+                for index, field in references:
+                    value = row[index]
+                    if value is None:
+                        continue
+                    exists = value not in gone if field.related_model is model else value in live[field.related_model]
+                    if exists:
+                        continue
+                    if field.remote_field.on_delete is models.SET_NULL:
+                        row[index] = None
+                    else:
+                        # Cascaded: replies of a left-out comment follow it
+                        gone.add(row[pk_index])
+                        break
+                else:
+                    rows.append(row)
+            if model is Issue and not rows:
+                skipped.append(entry.pk)
+                break
+            dropped[label] += len(gone)
+            kept[label] = {'columns': columns, 'rows': rows}
+        else:
+            tables[entry.pk] = kept
+    return tables, skipped, dropped
+
+
+def restore_issues(pks):
+    """
+    Move archived issues back into the hot tables.
+
+    Users and labels deleted since archiving are applied first: a missing
+    assignee is cleared, rows of a missing user or label are left out, and
+    an issue whose reporter is gone stays in the archive. Returns
+    ``(restored, skipped, dropped)``: the number of issues restored, the ids
+    of those left in the archive and the rows left out per table.
+    """
+    with transaction.atomic():
+        archived = list(ArchivedIssue.objects.filter(pk__in=pks).select_for_update())
+        tables, skipped, dropped = _live_rows(archived)
+        for model, _column in archived_tables():
+            label = model._meta.label_lower
+            for kept in tables.values():
+                table = kept.get(label)
+                if table:
+                    restore.insert_rows(model, restore.build_instances(model, table['columns'], table['rows']))
+
+        restored = list(tables)
+        ArchivedIssue.objects.filter(pk__in=restored).delete()
+        # The archived counts include any comments and attachments left out above
+        counters.refresh_issue_counts(restored)
+        issues = list(Issue.objects.filter(pk__in=restored))
+        project_ids = _adjust_counters([(i.pk, i.project_id, i.is_active, i.status) for i in issues], 1)
+        for issue in issues:
+            search.index_issue(issue)
+        dashboard.invalidate(project_ids=project_ids)
+    return len(restored), skipped, dropped
+
+
+def _prefetched(model, instances):
+    queryset = model._base_manager.none()
+    queryset._result_cache = list(instances)
+    queryset._prefetch_done = True
+    return queryset
+
+
+def load_issue(pk):
+    """
+    Rebuild an archived, still active issue as an unsaved Issue with its
+    comments and attachments prefetched, or return None.
+    """
+    archived = ArchivedIssue.objects.filter(pk=pk, is_active=True).select_related('project').first()
+    if archived is None:
+        return None
+
+    def build(model):
+        table = archived.rows.get(model._meta.label_lower, {'columns': [], 'rows': []})
+        return list(restore.build_instances(model, table['columns'], table['rows']))
+
+    issue = build(Issue)[0]
+    comments, attachments = build(Comment), build(IssueAttachment)
+
+    user_ids = {issue.reporter_id, issue.assignee_id}
+    user_ids.update(comment.author_id for comment in comments)
+    user_ids.update(attachment.uploaded_by_id for attachment in attachments)
+    users = User.objects.in_bulk(filter(None, user_ids))
+
+    issue.project = archived.project
+    for field in ('reporter', 'assignee'):
+        user = users.get(getattr(issue, f'{field}_id'))
+        if user is not None:
+            setattr(issue, field, user)
+    for comment in comments:
+        comment.author = users.get(comment.author_id)
+    for attachment in attachments:
+        attachment.uploaded_by = users.get(attachment.uploaded_by_id)
+
+    issue._prefetched_objects_cache = {
+        'comments': _prefetched(Comment, comments),
+        'attachments': _prefetched(IssueAttachment, attachments),
+    }
+    return issue
@@ -1,13 +1,18 @@
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
-from rest_framework import exceptions
-from django.contrib.auth.models import User
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from rest_framework import exceptions, permissions
 from django.utils.translation import gettext_lazy as _
 
+from . import apikeys, revocation, usercache
+
 
 class CustomJWTAuthentication(JWTAuthentication):
     """
-    Custom JWT Authentication class with enhanced error handling
+    Custom JWT Authentication class with enhanced error handling and cached
+    user lookups (see core.usercache)
     """
     
     def authenticate(self, request):
@@ -37,35 +42,52 @@ class CustomJWTAuthentication(JWTAuthentication):
         except KeyError:
             raise InvalidToken(_('Token contained no recognizable user identification'))
 
-        try:
-            user = User.objects.get(**{'id': user_id})
-        except User.DoesNotExist:
+        user = usercache.get_user(user_id)
+        if user is None:
             raise exceptions.AuthenticationFailed(_('User not found'), code='user_not_found')
 
         return user
 
 
+class RevocableRefreshToken(RefreshToken):
+    """
+    Refresh token that can be revoked on logout and rotation (see core.revocation)
+    """
+    
+    def verify(self, *args, **kwargs):
+        super().verify(*args, **kwargs)
+        
+        if revocation.is_revoked(self.payload[api_settings.JTI_CLAIM]):
+            raise TokenError(_('Token is blacklisted'))
+    
+    def blacklist(self):
+        revocation.revoke(self.payload[api_settings.JTI_CLAIM], datetime_from_epoch(self.payload['exp']))
+
+
 class APIKeyAuthentication:
     """
-    Simple API Key authentication for external integrations
+    API key authentication for external integrations (see core.apikeys)
     """
     
     def authenticate(self, request):
-        api_key = request.META.get('HTTP_X_API_KEY')
-        if not api_key:
+        raw_key = request.META.get('HTTP_X_API_KEY')
+        if not raw_key:
             return None
-            
-        # In a real implementation, you would validate the API key against a database
-        # For now, this is a placeholder
-        if api_key == 'demo-api-key':
-            try:
-                # Return a system user for API access
-                user = User.objects.get(username='system')
-                return (user, None)
-            except User.DoesNotExist:
-                pass
-                
-        return None
+        
+        key = apikeys.verify(raw_key)
+        if key is None:
+            raise exceptions.AuthenticationFailed(_('Invalid API key.'))
+        
+        # Keys without the write scope may only read
+        if request.method not in permissions.SAFE_METHODS and 'write' not in key.scopes:
+            raise exceptions.PermissionDenied(_('This API key is read-only.'))
+        
+        user = usercache.get_user(key.user_id)
+        if user is None or not user.is_active:
+            raise exceptions.AuthenticationFailed(_('User account is disabled.'))
+        
+        apikeys.record_use(key)
+        return user, key
 
     def authenticate_header(self, request):
         return 'X-API-Key'
@@ -0,0 +1,496 @@
+"""
+Streaming database backups.
+
+A backup is a directory holding one compressed NDJSON file per table and a
+``manifest.json`` written last. The first line of each file is the column
+list; every following line is one row as a JSON array. Tables are read in
+primary key order with ``.iterator(chunk_size)`` and written through the
+compressor as they are read, so memory stays flat whatever the table sizes.
+
+All tables are read from one snapshot. On PostgreSQL the coordinating
+transaction runs at REPEATABLE READ and exports its snapshot, and each
+parallel worker imports it before reading; elsewhere the tables are read one
+after another inside a single transaction.
+
+The manifest records, per table, the file name, columns, row count, size
+and SHA-256 of the compressed file, which ``verify`` checks.
+
+Incremental backups
+-------------------
+
+An incremental backup holds only what changed since its parent (the
+previous full or incremental backup), and a restore replays a full backup
+followed by its chain of incrementals. Tables listed in ``TRACKED`` carry a
+high-water mark per backup: ``updated_at`` for rows edited in place, the
+primary key for append-only tables. The next incremental exports rows past
+the parent's mark (``updated_at`` with a safety lag, since timestamps are
+taken before commit) and any row with a primary key the parent had not
+seen. Other tables are small and copied whole every time.
+
+Deletes leave no row to find, so every backup of a tracked table also
+writes a keys file: its primary keys, in order, with ``is_active`` where the
+model soft-deletes. Merging the parent's keys with the current ones yields
+tombstones for rows deleted or deactivated since (the latter catches
+``.update(is_active=False)``, which does not touch ``updated_at``) and the
+keys of late-committed rows the marks would miss.
+
+Counter columns are kept up to date with ``.update()`` and so can lag in an
+incremental; restoring a chain ends with ``counters.rebuild()``.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import orjson
+from django.contrib.auth.models import User
+from django.db import connection, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Activity, ArchivedIssue, Comment, Issue, IssueAttachment, IssueLabel, Label, Project, ProjectDailyStats
+
+try:
+    import zstandard
+except ImportError:  # optional; gzip is used instead
+    zstandard = None
+
+FORMAT_VERSION = 1
+MANIFEST = 'manifest.json'
+CHUNK_SIZE = 5000
+
+# Change tracking per table; the rest are copied in full by incrementals
+TRACKED = {
+    'core.project': 'updated_at',
+    'core.issue': 'updated_at',
+    'core.comment': 'updated_at',
+    'core.issuelabel': 'id',
+    'core.activity': 'id',
+    'core.issueattachment': 'id',
+    'core.archivedissue': 'archived_at',
+}
+# How far before the parent's updated_at mark an incremental starts reading
+WATERMARK_LAG = timedelta(minutes=5)
+
+
+def backup_models():
+    """
+    Return the models to back up, parents before children.
+    """
+    return [
+        User,
+        Project,
+        Project.members.through,
+        ProjectDailyStats,
+        Label,
+        Issue,
+        Issue.watchers.through,
+        IssueLabel,
+        Comment,
+        Activity,
+        IssueAttachment,
+        ArchivedIssue,
+    ]
+
+
+class _HashingWriter:
+    """
+    File wrapper counting and hashing the bytes written through it.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.fileobj.write(data)
+
+    def flush(self):
+        self.fileobj.flush()
+
+
+class Codec:
+    """
+    A compression format: file suffix plus streaming writer and reader.
+    """
+
+    def __init__(self, name, suffix):
+        self.name = name
+        self.suffix = suffix
+
+    def writer(self, fileobj):
+        if self.name == 'gzip':
+            return gzip.GzipFile(fileobj=fileobj, mode='wb', compresslevel=6, mtime=0)
+        if self.name == 'zstd':
+            return zstandard.ZstdCompressor(level=3).stream_writer(fileobj, closefd=False)
+        return fileobj
+
+    def lines(self, fileobj):
+        """
+        Iterate over the decompressed lines of ``fileobj``.
+        """
+        if self.name == 'gzip':
+            return gzip.GzipFile(fileobj=fileobj, mode='rb')
+        if self.name == 'zstd':
+            return _split_lines(zstandard.ZstdDecompressor().read_to_iter(fileobj))
+        return fileobj
+
+
+def _split_lines(chunks):
+    pending = b''
+    for chunk in chunks:
+        *lines, pending = (pending + chunk).split(b'\n')
+        yield from lines
+    if pending:
+        yield pending
+
+
+CODECS = {
+    'zstd': Codec('zstd', '.zst'),
+    'gzip': Codec('gzip', '.gz'),
+    'none': Codec('none', ''),
+}
+
+
+def default_compression():
+    return 'zstd' if zstandard is not None else 'gzip'
+
+
+def get_codec(name):
+    if name == 'zstd' and zstandard is None:
+        raise ValueError('zstd compression needs the zstandard package')
+    return CODECS[name]
+
+
+def _encode(value):
+    # orjson handles datetimes, dates and UUIDs itself
+    return str(value)
+
+
+def _columns(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def _write_rows(directory, filename, codec, columns, rows, chunk_size=CHUNK_SIZE):
+    """
+    Stream ``rows`` (sequences matching ``columns``) into one file. Returns
+    its manifest entry.
+    """
+    count = 0
+    with open(os.path.join(directory, filename), 'wb') as raw:
+        hashing = _HashingWriter(raw)
+        stream = codec.writer(hashing)
+        stream.write(orjson.dumps(columns) + b'\n')
+        batch = []
+        for row in rows:
+            batch.append(orjson.dumps(row, default=_encode))
+            if len(batch) >= chunk_size:
+                stream.write(b'\n'.join(batch) + b'\n')
+                count += len(batch)
+                batch = []
+        if batch:
+            stream.write(b'\n'.join(batch) + b'\n')
+            count += len(batch)
+        if stream is not hashing:
+            stream.close()
+
+    return {
+        'file': filename,
+        'rows': count,
+        'bytes': hashing.size,
+        'sha256': hashing.sha256.hexdigest(),
+    }
+
+
+def dump_table(model, directory, codec, queryset=None, chunk_size=CHUNK_SIZE):
+    """
+    Stream one table to ``directory``. Returns its manifest entry.
+    """
+    label = model._meta.label_lower
+    columns = _columns(model)
+    queryset = model._base_manager.all() if queryset is None else queryset
+    rows = queryset.order_by('pk').values_list(*columns).iterator(chunk_size=chunk_size)
+    entry = _write_rows(directory, f'{label}.ndjson{codec.suffix}', codec, columns, rows, chunk_size)
+    return {'model': label, 'columns': columns, **entry}
+
+
+def _key_columns(model):
+    if any(field.name == 'is_active' for field in model._meta.concrete_fields):
+        return ['id', 'is_active']
+    return ['id']
+
+
+def _read_keys(directory, entry, compression):
+    for row in read_rows(directory, entry, compression):
+        yield row['id'], row.get('is_active', True)
+
+
+def _merge_keys(parent_keys, current_keys):
+    """
+    Walk two primary-key-ordered ``(pk, active)`` streams and yield
+    ``(pk, change)`` for keys that were ``deleted``, ``deactivated`` or
+    ``added`` between them.
+    """
+    parent, current = iter(parent_keys), iter(current_keys)
+    old, new = next(parent, None), next(current, None)
+    while old is not None or new is not None:
+        if new is None or (old is not None and old[0] < new[0]):
+            yield old[0], 'deleted'
+            old = next(parent, None)
+        elif old is None or new[0] < old[0]:
+            yield new[0], 'added'
+            new = next(current, None)
+        else:
+            if old[1] and not new[1]:
+                yield new[0], 'deactivated'
+            old, new = next(parent, None), next(current, None)
+
+
+def backup_table(model, directory, codec, parent=None, chunk_size=CHUNK_SIZE):
+    """
+    Back up one table: all of it, or for a tracked table with a ``parent``
+    (``(directory, manifest)`` of the previous backup) only its changes.
+    Returns the manifest entry.
+    """
+    label = model._meta.label_lower
+    field = TRACKED.get(label)
+    if field is None:
+        return {**dump_table(model, directory, codec, chunk_size=chunk_size), 'mode': 'full'}
+
+    queryset = model._base_manager.all()
+    marks = queryset.aggregate(watermark=Max(field), max_pk=Max('pk'))
+    key_columns = _key_columns(model)
+    keys = _write_rows(
+        directory, f'{label}.keys.ndjson{codec.suffix}', codec, key_columns,
+        queryset.order_by('pk').values_list(*key_columns).iterator(chunk_size=chunk_size), chunk_size,
+    )
+    tracking = {
+        'field': field,
+        'watermark': marks['watermark'].isoformat() if isinstance(marks['watermark'], datetime) else marks['watermark'],
+        'max_pk': marks['max_pk'],
+        'keys': keys,
+    }
+
+    parent_entry = parent and next((t for t in parent[1]['tables'] if t['model'] == label), None)
+    if parent_entry is None:
+        return {**dump_table(model, directory, codec, chunk_size=chunk_size), 'mode': 'full', **tracking}
+
+    parent_dir, parent_manifest = parent
+    compression = parent_manifest['compression']
+    late = []
+
+    def tombstones():
+        changes = _merge_keys(
+            _read_keys(parent_dir, parent_entry['keys'], compression),
+            _read_keys(directory, keys, codec.name),
+        )
+        for pk, change in changes:
+            if change != 'added':
+                yield pk, change
+            elif parent_entry['max_pk'] is not None and pk <= parent_entry['max_pk']:
+                late.append(pk)
+
+    tombstone_entry = _write_rows(
+        directory, f'{label}.tombstones.ndjson{codec.suffix}', codec, ['id', 'change'], tombstones(), chunk_size,
+    )
+
+    if parent_entry['max_pk'] is not None:
+        changed = Q(pk__gt=parent_entry['max_pk'])
+        if late:
+            changed |= Q(pk__in=late)
+        if field != 'id' and parent_entry['watermark']:
+            changed |= Q(**{f'{field}__gt': parse_datetime(parent_entry['watermark']) - WATERMARK_LAG})
+        queryset = queryset.filter(changed)
+
+    entry = dump_table(model, directory, codec, queryset, chunk_size)
+    return {**entry, 'mode': 'changes', **tracking, 'tombstones': tombstone_entry}
+
+
+def _dump_in_snapshot(snapshot_id, *args):
+    """
+    Worker body: back up one table on this thread's connection inside the
+    coordinator's exported snapshot.
+    """
+    try:
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+                cursor.execute('SET TRANSACTION SNAPSHOT %s', [snapshot_id])
+            return backup_table(*args)
+    finally:
+        connection.close()
+
+
+def _write_manifest(directory, manifest):
+    path = os.path.join(directory, MANIFEST)
+    with open(path + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(path + '.tmp', path)
+
+
+def create_backup(backup_dir, compression=None, jobs=1, chunk_size=CHUNK_SIZE, incremental=False, parent=None,
+                  log=print):
+    """
+    Write a backup into a new directory under ``backup_dir`` and return its path.
+
+    With ``incremental`` only the changes since ``parent`` (a backup name,
+    by default the latest backup in ``backup_dir``) are written.
+
+    The directory only gets its final name once every table and the manifest
+    are written, so an interrupted run never looks like a usable backup.
+    """
+    codec = get_codec(compression or default_compression())
+    if incremental:
+        parent = parent or latest_backup(backup_dir)
+        if parent is None:
+            raise ValueError('No backup to base an incremental on; create a full backup first')
+        parent_dir = os.path.join(backup_dir, parent)
+        parent_manifest = load_manifest(parent_dir)
+        if not all('keys' in entry for entry in parent_manifest['tables'] if entry['model'] in TRACKED):
+            raise ValueError(f'{parent} predates change tracking; create a full backup first')
+        parent = (parent_dir, parent_manifest)
+    else:
+        parent = None
+    started = timezone.now()
+    name = f'backup_{datetime.now().strftime("%Y%m%d_%H%M%S")}'
+    directory = os.path.join(backup_dir, name)
+    sequence = 1
+    while os.path.exists(directory) or os.path.exists(directory + '.partial'):
+        # Several backups within one second; the suffix keeps names in creation order
+        sequence += 1
+        directory = os.path.join(backup_dir, f'{name}_{sequence:03d}')
+    partial = directory + '.partial'
+    os.makedirs(partial)
+
+    models = backup_models()
+    parallel = jobs > 1 and connection.vendor == 'postgresql'
+    if jobs > 1 and not parallel:
+        log(f'Parallel dumps need PostgreSQL; dumping sequentially on {connection.vendor}')
+
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'postgresql':
+                with connection.cursor() as cursor:
+                    cursor.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ READ ONLY')
+                    cursor.execute('SELECT pg_export_snapshot()')
+                    snapshot_id = cursor.fetchone()[0]
+
+            if parallel:
+                with ThreadPoolExecutor(max_workers=jobs) as pool:
+                    futures = [
+                        pool.submit(_dump_in_snapshot, snapshot_id, model, partial, codec, parent, chunk_size)
+                        for model in models
+                    ]
+                    entries = [future.result() for future in futures]
+            else:
+                entries = [backup_table(model, partial, codec, parent, chunk_size) for model in models]
+    except BaseException:
+        shutil.rmtree(partial, ignore_errors=True)
+        raise
+
+    for entry in entries:
+        changed = ' changed' if entry.get('mode') == 'changes' else ''
+        tombstones = f', {entry["tombstones"]["rows"]} tombstones' if 'tombstones' in entry else ''
+        log(f'Backed up {entry["rows"]}{changed} {entry["model"]} rows{tombstones} ({entry["bytes"]} bytes)')
+
+    _write_manifest(partial, {
+        'format': FORMAT_VERSION,
+        'kind': 'incremental' if parent else 'full',
+        'parent': os.path.basename(parent[0]) if parent else None,
+        'created_at': started.isoformat(),
+        'database': connection.vendor,
+        'compression': codec.name,
+        'tables': entries,
+    })
+    os.rename(partial, directory)
+    return directory
+
+
+def is_backup(path):
+    return os.path.isfile(os.path.join(path, MANIFEST))
+
+
+def latest_backup(backup_dir):
+    """
+    Return the name of the newest backup in ``backup_dir``, or None.
+    """
+    names = sorted(
+        name for name in os.listdir(backup_dir)
+        if name.startswith('backup_') and is_backup(os.path.join(backup_dir, name))
+    )
+    return names[-1] if names else None
+
+
+def load_manifest(directory):
+    with open(os.path.join(directory, MANIFEST)) as f:
+        manifest = json.load(f)
+    if manifest.get('format') != FORMAT_VERSION:
+        raise ValueError(f'Unsupported backup format: {manifest.get("format")}')
+    return manifest
+
+
+def backup_chain(directory):
+    """
+    Return ``[(directory, manifest), ...]`` from the full backup that
+    ``directory`` builds on through to ``directory`` itself.
+    """
+    chain = []
+    while True:
+        manifest = load_manifest(directory)
+        chain.append((directory, manifest))
+        if manifest['kind'] == 'full':
+            return chain[::-1]
+        directory = os.path.join(os.path.dirname(directory), manifest['parent'])
+        if not is_backup(directory):
+            raise ValueError(f'Parent backup {manifest["parent"]} is missing')
+
+
+def read_rows(directory, entry, compression):
+    """
+    Yield the rows of one table file as ``{column: value}`` dicts.
+    """
+    codec = get_codec(compression)
+    with open(os.path.join(directory, entry['file']), 'rb') as raw:
+        columns = None
+        for line in codec.lines(raw):
+            if columns is None:
+                columns = orjson.loads(line)
+                continue
+            yield dict(zip(columns, orjson.loads(line)))
+
+
+def verify(directory):
+    """
+    Check every table file against the manifest. Returns a list of problems.
+    """
+    manifest = load_manifest(directory)
+    problems = []
+    files = []
+    for table in manifest['tables']:
+        files.append(table)
+        files.extend(table[part] for part in ('keys', 'tombstones') if part in table)
+
+    for entry in files:
+        path = os.path.join(directory, entry['file'])
+        if not os.path.exists(path):
+            problems.append(f'{entry["file"]}: missing')
+            continue
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha256.update(block)
+        if sha256.hexdigest() != entry['sha256']:
+            problems.append(f'{entry["file"]}: checksum mismatch')
+            continue
+        rows = sum(1 for _row in read_rows(directory, entry, manifest['compression']))
+        if rows != entry['rows']:
+            problems.append(f'{entry["file"]}: {rows} rows, manifest says {entry["rows"]}')
+    return problems
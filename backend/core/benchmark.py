@@ -0,0 +1,272 @@
+"""
+Endpoint benchmarks.
+
+``run`` sends every route in core/urls.py through the Django test client,
+each with one scenario per HTTP method it serves, against a dataset from
+core.datagen. Every scenario is run ``warmup`` times unmeasured, then
+``iterations`` times timed with the SQL counted by a core.querystats
+recorder, then once more under tracemalloc for its peak Python memory;
+tracing slows allocation down, so it is kept out of the timed runs.
+Streamed responses are consumed inside the measurement.
+
+Writes run inside a transaction that is rolled back, so every iteration
+sees the same data and the dataset can be reused. Commit hooks do not run
+for them, so the cache is cleared after each write scenario.
+
+Results are plain dicts, stored as JSON by the ``benchmark`` command, and
+``compare`` lists the endpoints that got slower, ran more queries or used
+more memory than a baseline run.
+"""
+
+import math
+import platform
+import statistics
+import time
+import tracemalloc
+from collections import namedtuple
+
+import django
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test import Client
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from . import datagen, querystats, urls
+from .authentication import RevocableRefreshToken
+from .models import Comment, Issue, Project
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Latency changes below this many milliseconds are noise, whatever the ratio
+MIN_LATENCY_DELTA = 1.0
+
+# ``data`` is None or a function of the iteration number returning the body
+Scenario = namedtuple('Scenario', ['route', 'method', 'path', 'data', 'multipart'], defaults=[None, False])
+
+
+def scenario_name(scenario):
+    return f'{scenario.method} {scenario.route}'
+
+
+def fixtures():
+    """
+    The rows the scenarios act on: the first generated project, its owner,
+    the first issue the owner reported in it and a comment by the owner on it.
+    """
+    project = Project.objects.filter(is_active=True).order_by('pk').first()
+    if project is None:
+        raise ValueError('The database has no projects to benchmark against')
+    user = project.created_by
+    issue = project.issues.filter(is_active=True, reporter=user).order_by('pk').first()
+    comment = Comment.objects.filter(issue=issue, author=user, parent__isnull=True).order_by('pk').first()
+    if comment is None:
+        comment = Comment.objects.create(issue=issue, author=user, content='Benchmark comment')
+    issue_ids = list(project.issues.filter(is_active=True).order_by('pk').values_list('pk', flat=True)[:50])
+    return {'project': project, 'user': user, 'issue': issue, 'comment': comment, 'issue_ids': issue_ids}
+
+
+def scenarios(fixture):
+    project, user, issue, comment = fixture['project'], fixture['user'], fixture['issue'], fixture['comment']
+
+    def refresh_token(iteration):
+        return {'refresh': str(RevocableRefreshToken.for_user(user))}
+
+    def route(name, method, data=None, multipart=False, query='', **kwargs):
+        return Scenario(name, method, reverse(name, kwargs=kwargs) + query, data, multipart)
+
+    return [
+        route('register', 'POST', lambda i: {
+            'username': f'benchmark{i}', 'email': f'benchmark{i}@example.com', 'password': datagen.PASSWORD,
+        }),
+        route('login', 'POST', lambda i: {'username': user.username, 'password': datagen.PASSWORD}),
+        route('logout', 'POST', refresh_token),
+        route('token_refresh', 'POST', refresh_token),
+        route('user_profile', 'GET'),
+        route('update_profile', 'PUT', lambda i: {'first_name': 'Benchmark'}),
+        route('dashboard_stats', 'GET'),
+        route('global_search', 'GET', query=f'?q={datagen.WORDS[0]}'),
+        route('user-list', 'GET'),
+        route('user-lookup', 'GET', query=f'?q={user.username}'),
+        route('project-list-create', 'GET'),
+        route('project-list-create', 'POST', lambda i: {'name': 'Benchmark project', 'description': 'Benchmark'}),
+        route('project-lookup', 'GET', query=f'?q={project.name.split()[0]}'),
+        route('project-detail', 'GET', pk=project.pk),
+        route('project-detail', 'PATCH', lambda i: {'description': 'Benchmark'}, pk=project.pk),
+        route('project-detail', 'DELETE', pk=project.pk),
+        route('project-analytics', 'GET', project_id=project.pk),
+        route('project-export', 'GET', project_id=project.pk),
+        route('issue-list-create', 'GET', project_id=project.pk),
+        route('issue-list-create', 'POST', lambda i: {
+            'title': 'Benchmark issue', 'description': 'Benchmark', 'priority': 'high',
+        }, project_id=project.pk),
+        route('issue-detail', 'GET', pk=issue.pk),
+        route('issue-detail', 'PATCH', lambda i: {'status': 'in_progress'}, pk=issue.pk),
+        route('issue-detail', 'DELETE', pk=issue.pk),
+        route('bulk-update-issues', 'POST', lambda i: {
+            'issue_ids': fixture['issue_ids'], 'updates': {'priority': 'high'},
+        }),
+        route('comment-list-create', 'GET', issue_id=issue.pk),
+        route('comment-list-create', 'POST', lambda i: {'content': 'Benchmark comment'}, issue_id=issue.pk),
+        route('comment-detail', 'GET', pk=comment.pk),
+        route('comment-detail', 'PATCH', lambda i: {'content': 'Benchmark edit'}, pk=comment.pk),
+        route('comment-detail', 'DELETE', pk=comment.pk),
+        route('label-list-create', 'GET'),
+        route('label-list-create', 'POST', lambda i: {'name': f'benchmark-{i}'}),
+        route('project-activities', 'GET', project_id=project.pk),
+        route('issue-activities', 'GET', issue_id=issue.pk),
+        route('issue-attachments', 'GET', issue_id=issue.pk),
+        route('issue-attachments', 'POST', lambda i: {
+            'file': SimpleUploadedFile('benchmark.txt', b'benchmark'), 'filename': 'benchmark.txt',
+        }, multipart=True, issue_id=issue.pk),
+    ]
+
+
+def uncovered(scenario_list):
+    """
+    Names of the routes in core/urls.py that no scenario exercises.
+    """
+    covered = {scenario.route for scenario in scenario_list}
+    return [
+        pattern.name for pattern in urls.urlpatterns
+        if isinstance(pattern, URLPattern) and pattern.name not in covered
+    ]
+
+
+def percentile(samples, fraction):
+    """
+    Nearest-rank percentile of ``samples``.
+    """
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(fraction * len(ordered)) - 1)]
+
+
+def _body(scenario, iteration):
+    return scenario.data(iteration) if scenario.data else None
+
+
+def _send(client, scenario, data):
+    method = getattr(client, scenario.method.lower())
+    if scenario.multipart:
+        response = method(scenario.path, data)
+    elif data is not None:
+        response = method(scenario.path, data, content_type='application/json')
+    else:
+        response = method(scenario.path)
+    if response.streaming:
+        for _chunk in response.streaming_content:
+            pass
+    return response
+
+
+def _request(client, scenario, data):
+    if scenario.method in SAFE_METHODS:
+        return _send(client, scenario, data)
+    with transaction.atomic():
+        response = _send(client, scenario, data)
+        transaction.set_rollback(True)
+    return response
+
+
+def measure(client, scenario, iterations, warmup):
+    """
+    Run one scenario. Returns its status, latency percentiles, queries and peak memory.
+    """
+    for iteration in range(warmup):
+        _request(client, scenario, _body(scenario, iteration))
+
+    latencies, queries, db_times = [], [], []
+    for iteration in range(warmup, warmup + iterations):
+        data = _body(scenario, iteration)
+        stats = querystats.QueryStats()
+        with connection.execute_wrapper(stats):
+            start = time.perf_counter()
+            response = _request(client, scenario, data)
+            latencies.append((time.perf_counter() - start) * 1000)
+        queries.append(stats.count)
+        db_times.append(stats.duration * 1000)
+
+    data = _body(scenario, warmup + iterations)
+    tracemalloc.start()
+    try:
+        _request(client, scenario, data)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    if scenario.method not in SAFE_METHODS:
+        cache.clear()
+
+    return {
+        'status': response.status_code,
+        'p50_ms': round(percentile(latencies, 0.5), 3),
+        'p95_ms': round(percentile(latencies, 0.95), 3),
+        'db_ms': round(statistics.median(db_times), 3),
+        'queries': round(statistics.median(queries)),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(iterations=20, warmup=2, only=None, log=lambda message: None):
+    """
+    Benchmark every scenario whose name contains ``only`` (all by default).
+    Returns ``{'meta': ..., 'endpoints': {name: measurement}}``.
+    """
+    fixture = fixtures()
+    scenario_list = scenarios(fixture)
+    for name in uncovered(scenario_list):
+        log(f'No scenario for route {name}')
+
+    client = Client(raise_request_exception=False, HTTP_AUTHORIZATION=f'Bearer {RevocableRefreshToken.for_user(fixture["user"]).access_token}')
+    results = {
+        'meta': {
+            'started_at': timezone.now().isoformat(),
+            'issues': Issue.objects.count(),
+            'projects': Project.objects.count(),
+            'users': User.objects.count(),
+            'comments': Comment.objects.count(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        },
+        'endpoints': {},
+    }
+    for scenario in scenario_list:
+        name = scenario_name(scenario)
+        if only and only not in name:
+            continue
+        results['endpoints'][name] = measurement = measure(client, scenario, iterations, warmup)
+        log(
+            f'{name}: {measurement["status"]} p50 {measurement["p50_ms"]}ms p95 {measurement["p95_ms"]}ms '
+            f'{measurement["queries"]} queries {measurement["peak_kb"]}KB'
+        )
+    return results
+
+
+def compare(results, baseline, tolerance=0.2):
+    """
+    List the regressions of ``results`` against ``baseline`` as
+    ``(endpoint, metric, before, after)``. Latency and memory may grow by
+    ``tolerance`` (a fraction); query counts and statuses may not change.
+    """
+    regressions = []
+    for name, after in results['endpoints'].items():
+        before = baseline['endpoints'].get(name)
+        if before is None:
+            continue
+        if after['status'] != before['status']:
+            regressions.append((name, 'status', before['status'], after['status']))
+        if after['queries'] > before['queries']:
+            regressions.append((name, 'queries', before['queries'], after['queries']))
+        for metric in ('p50_ms', 'p95_ms'):
+            if (
+                after[metric] > before[metric] * (1 + tolerance)
+                and after[metric] - before[metric] > MIN_LATENCY_DELTA
+            ):
+                regressions.append((name, metric, before[metric], after[metric]))
+        if after['peak_kb'] > before['peak_kb'] * (1 + tolerance):
+            regressions.append((name, 'peak_kb', before['peak_kb'], after['peak_kb']))
+    return regressions
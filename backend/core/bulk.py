@@ -0,0 +1,142 @@
+"""
+Set-based bulk updates of issues.
+
+The permission check, the old-value snapshot, the UPDATE and the Activity
+rows each cost one query per chunk of issues instead of several queries per
+issue. Side effects that per-row ``save()`` would trigger through signals are
+applied in bulk as well: project open-issue counters, ``closed_at``,
+``updated_at`` and dashboard cache invalidation.
+"""
+
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from . import access, dashboard
+from .models import Activity, Issue, Project
+
+CHUNK_SIZE = 500
+
+# Fields a bulk update may change, mapped to the Activity action it records
+UPDATABLE_FIELDS = {
+    'status': 'status_changed',
+    'priority': 'priority_changed',
+    'severity': 'updated',
+    'assignee_id': 'assigned',
+    'due_date': 'updated',
+    'estimated_hours': 'updated',
+}
+
+
+def editable_issues(user, issue_ids):
+    """
+    Active issues among ``issue_ids`` that ``user`` reported, is assigned,
+    owns the project of, or is a member of the project of.
+    """
+    return Issue.objects.filter(id__in=issue_ids, is_active=True).filter(
+        Q(reporter=user) | Q(assignee=user) | access.has_access(user)
+    )
+
+
+def _describe(field, old, new, names):
+    if field == 'status':
+        labels = dict(Issue.STATUS_CHOICES)
+        return f'Changed status from {labels.get(old, old)} to {labels.get(new, new)}'
+    if field == 'priority':
+        labels = dict(Issue.PRIORITY_CHOICES)
+        return f'Changed priority from {labels.get(old, old)} to {labels.get(new, new)}'
+    if field == 'assignee_id':
+        return f'Assigned to {names[new]}' if new is not None else 'Removed assignee'
+    return f'Changed {field.replace("_", " ")} from {old} to {new}'
+
+
+def _status_changes(changes, now):
+    extra = {}
+    if 'status' in changes:
+        if changes['status'] in Issue.CLOSED_STATUSES:
+            extra['closed_at'] = Coalesce(F('closed_at'), now)
+        else:
+            extra['closed_at'] = None
+    return extra
+
+
+def _apply_chunk(user, chunk_ids, changes, now, names):
+    """
+    Update one chunk of already-permitted issues. Returns the affected rows' old values.
+    """
+    fields = list(changes)
+    old_rows = list(Issue.objects.filter(id__in=chunk_ids).values('id', 'project_id', 'status', *fields))
+    if not old_rows:
+        return []
+
+    Issue.objects.filter(id__in=chunk_ids).update(**changes, **_status_changes(changes, now), updated_at=now)
+
+    if 'status' in changes:
+        # Keep Project.open_issues_count in step with the new status
+        delta = Counter()
+        for row in old_rows:
+            delta[row['project_id']] += (changes['status'] == 'open') - (row['status'] == 'open')
+        for project_id, change in delta.items():
+            if change:
+                Project.objects.filter(pk=project_id).update(open_issues_count=F('open_issues_count') + change)
+
+    activities = []
+    for row in old_rows:
+        for field, new in changes.items():
+            if row[field] == new:
+                continue
+            activities.append(Activity(
+                action=UPDATABLE_FIELDS[field],
+                description=_describe(field, row[field], new, names),
+                user=user,
+                issue_id=row['id'],
+                project_id=row['project_id'],
+                created_at=now,
+            ))
+    Activity.objects.bulk_create(activities, batch_size=CHUNK_SIZE)
+    return old_rows
+
+
+def bulk_update(user, issue_ids, changes):
+    """
+    Apply ``changes`` (already validated, keys from UPDATABLE_FIELDS) to every
+    issue in ``issue_ids`` that ``user`` may edit, atomically.
+
+    Returns ``(updated_ids, skipped_ids)``.
+    """
+    unknown = set(changes) - set(UPDATABLE_FIELDS)
+    if unknown:
+        raise ValueError(f'Fields cannot be bulk updated: {", ".join(sorted(unknown))}')
+
+    names = {}
+    if changes.get('assignee_id') is not None:
+        assignee = User.objects.filter(pk=changes['assignee_id'], is_active=True).first()
+        if assignee is None:
+            raise ValueError('Assignee does not exist')
+        names[assignee.pk] = assignee.get_full_name() or assignee.username
+
+    requested = list(dict.fromkeys(issue_ids))
+    now = timezone.now()
+    updated_ids = []
+    project_ids = set()
+    assignee_ids = {changes.get('assignee_id')}
+
+    with transaction.atomic():
+        for start in range(0, len(requested), CHUNK_SIZE):
+            chunk = requested[start:start + CHUNK_SIZE]
+            permitted = list(
+                editable_issues(user, chunk).select_for_update(of=('self',)).values_list('id', flat=True)
+            )
+            for row in _apply_chunk(user, permitted, changes, now, names):
+                updated_ids.append(row['id'])
+                project_ids.add(row['project_id'])
+                assignee_ids.add(row.get('assignee_id'))
+
+        dashboard.invalidate(project_ids=project_ids, user_ids=assignee_ids - {None})
+
+    updated = set(updated_ids)
+    return updated_ids, [pk for pk in requested if pk not in updated]
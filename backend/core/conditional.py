@@ -0,0 +1,73 @@
+"""
+Conditional GET support for polled endpoints.
+
+Views that mix in ConditionalGetMixin describe the current state of what
+they return with ``get_version``: one small query that reads timestamps and
+counters, never the payload itself. The version becomes a weak ETag, and
+when the client's If-None-Match still matches, the view answers 304 Not
+Modified and the serializer never runs.
+
+No Last-Modified is sent. Every version here is derived: row counts,
+counters and child rows change what is returned without moving any
+timestamp (a soft delete, a deleted comment), so If-Modified-Since would
+answer 304 for changed content.
+
+The ETag also covers the user, the negotiated media type and the full path
+including the query string, so filters, ordering, pagination cursors and
+``max_depth`` each get their own tag.
+"""
+
+import hashlib
+
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+
+def make_etag(*parts):
+    digest = hashlib.md5(repr(parts).encode(), usedforsecurity=False).hexdigest()
+    return f'W/"{digest}"'
+
+
+def collection_version(queryset, modified_field, **aggregates):
+    """
+    Return the version of a collection: the row count, the newest
+    ``modified_field`` and any extra ``aggregates`` (e.g. counter totals)
+    over ``queryset``, in one query.
+    """
+    row = queryset.order_by().aggregate(
+        count=Count('pk'), last_modified=Max(modified_field), **aggregates
+    )
+    return tuple(row.values())
+
+
+class ConditionalGetMixin:
+    """
+    Answer GET requests with 304 when the resource is unchanged.
+
+    Must come before the generic view in the class bases.
+    """
+
+    def get_version(self):
+        """
+        Return the version, or ``None`` when the resource does not exist and
+        the view should respond as usual.
+        """
+        raise NotImplementedError
+
+    def get(self, request, *args, **kwargs):
+        version = self.get_version()
+        if version is None:
+            return super().get(request, *args, **kwargs)
+
+        etag = make_etag(request.user.pk, request.accepted_media_type, request.get_full_path(), version)
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            response = super().get(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+        response['ETag'] = etag
+        # Let clients keep the body but revalidate it on every use
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ['Authorization'])
+        return response
@@ -0,0 +1,178 @@
+"""
+Denormalized aggregate counters.
+
+Project and Issue rows carry counts of their children so that list endpoints
+can render them without a COUNT query per row. The deltas are applied with
+F() expressions from the signal handlers in core.signals; ``rebuild`` and
+``find_mismatches`` recompute everything from the source tables.
+"""
+
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import Project, Issue, Comment, IssueAttachment
+
+
+def _issue_contribution(is_active, status):
+    """
+    Return the (issues, open_issues) amounts an issue adds to its project.
+    """
+    if not is_active:
+        return 0, 0
+    return 1, 1 if status == 'open' else 0
+
+
+def snapshot_issue(issue):
+    """
+    Remember the counted state of an issue as it was loaded.
+
+    Reads ``__dict__`` directly so deferred fields never trigger a query.
+    """
+    issue._counter_state = (
+        issue.__dict__.get('project_id'),
+        issue.__dict__.get('is_active'),
+        issue.__dict__.get('status'),
+    )
+
+
+def _apply_project_delta(project_id, issues, open_issues):
+    if project_id is None or (issues == 0 and open_issues == 0):
+        return
+    Project.objects.filter(pk=project_id).update(
+        issues_count=F('issues_count') + issues,
+        open_issues_count=F('open_issues_count') + open_issues,
+    )
+
+
+def issue_saved(issue, created):
+    """
+    Apply the counter changes caused by saving an issue.
+    """
+    old_project_id, old_active, old_status = (
+        (None, False, None) if created else getattr(issue, '_counter_state', (None, False, None))
+    )
+    old_issues, old_open = _issue_contribution(old_active, old_status)
+    new_issues, new_open = _issue_contribution(issue.is_active, issue.status)
+
+    with transaction.atomic():
+        if old_project_id == issue.project_id:
+            _apply_project_delta(issue.project_id, new_issues - old_issues, new_open - old_open)
+        else:
+            _apply_project_delta(old_project_id, -old_issues, -old_open)
+            _apply_project_delta(issue.project_id, new_issues, new_open)
+
+    snapshot_issue(issue)
+
+
+def issue_deleted(issue):
+    """
+    Remove a hard-deleted issue from its project's counters.
+    """
+    project_id, is_active, status = getattr(
+        issue, '_counter_state', (issue.project_id, issue.is_active, issue.status)
+    )
+    issues, open_issues = _issue_contribution(is_active, status)
+    _apply_project_delta(project_id, -issues, -open_issues)
+
+
+def adjust_issue_counter(issue_id, field, delta):
+    """
+    Add ``delta`` to one of the per-issue counters.
+    """
+    Issue.objects.filter(pk=issue_id).update(**{field: F(field) + delta})
+
+
+def _count_subquery(queryset, outer_field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{outer_field: OuterRef('pk')})
+            .order_by().values(outer_field).annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def refresh_members_count(project_ids):
+    """
+    Recount the members of the given projects.
+
+    The member list is part of a project's representation, so this also
+    touches ``updated_at`` to change the project's ETag.
+    """
+    Project.objects.filter(pk__in=project_ids).update(
+        members_count=_count_subquery(Project.members.through.objects.all(), 'project_id'),
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_issue_counts(issue_ids):
+    """
+    Recount the comments and attachments of the given issues.
+    """
+    return Issue.objects.filter(pk__in=issue_ids).update(**_issue_expressions())
+
+
+def _project_expressions():
+    active_issues = Issue.objects.filter(is_active=True)
+    return {
+        'issues_count': _count_subquery(active_issues, 'project_id'),
+        'open_issues_count': _count_subquery(active_issues.filter(status='open'), 'project_id'),
+        'members_count': _count_subquery(Project.members.through.objects.all(), 'project_id'),
+    }
+
+
+def _issue_expressions():
+    return {
+        'comments_count': _count_subquery(Comment.objects.all(), 'issue_id'),
+        'attachments_count': _count_subquery(IssueAttachment.objects.all(), 'issue_id'),
+    }
+
+
+@transaction.atomic
+def rebuild(project_ids=None):
+    """
+    Recompute every counter from the source tables.
+
+    Limited to the given projects (and their issues) when ``project_ids`` is
+    passed. Returns the number of (projects, issues) rows rewritten.
+    """
+    projects = Project.objects.all()
+    issues = Issue.objects.all()
+    if project_ids is not None:
+        projects = projects.filter(pk__in=project_ids)
+        issues = issues.filter(project_id__in=project_ids)
+
+    return (
+        projects.update(**_project_expressions()),
+        issues.update(**_issue_expressions()),
+    )
+
+
+def find_mismatches(project_ids=None):
+    """
+    Yield ``(model_name, pk, field, stored, actual)`` for every stale counter.
+    """
+    checks = [
+        (Project.objects.all(), _project_expressions()),
+        (Issue.objects.all(), _issue_expressions()),
+    ]
+    for queryset, expressions in checks:
+        if project_ids is not None:
+            lookup = 'pk__in' if queryset.model is Project else 'project_id__in'
+            queryset = queryset.filter(**{lookup: project_ids})
+
+        annotations = {f'actual_{name}': expression for name, expression in expressions.items()}
+        stale = Q()
+        for name in expressions:
+            stale |= ~Q(**{name: F(f'actual_{name}')})
+
+        rows = queryset.annotate(**annotations).filter(stale).values(
+            'pk', *expressions.keys(), *annotations.keys()
+        )
+        for row in rows.iterator(chunk_size=2000):
+            for name in expressions:
+                if row[name] != row[f'actual_{name}']:
+                    yield queryset.model.__name__, row['pk'], name, row[name], row[f'actual_{name}']
@@ -0,0 +1,126 @@
+"""
+Cached per-user dashboard statistics.
+
+Each user's stats are computed once and kept in the cache until a write
+that can change them: an issue, activity or membership change invalidates
+only the users with access to the affected project (plus the old and new
+assignee of an issue).
+
+Entries are keyed by the user id and a version stamp that is read before
+the stats are computed. Invalidation bumps the stamps of the affected users
+once the surrounding transaction commits, so a request that computed from
+pre-commit data stores its entry under a stamp that is never read again.
+
+Entries also expire on their own after DASHBOARD_CACHE_TTL seconds, or
+earlier when an open issue's due date passes and the overdue count changes.
+"""
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Min, Q, Sum
+from django.utils import timezone
+
+from . import access
+from .models import Activity, Issue, Project
+from .serializers import ActivitySerializer
+
+OPEN_STATUSES = ['open', 'in_progress', 'reopened']
+
+
+def version_key(user_id):
+    return f'dashboard:stats:version:{user_id}'
+
+
+def cache_key(user_id, version):
+    return f'dashboard:stats:{user_id}:{version}'
+
+
+def get_ttl():
+    return getattr(settings, 'DASHBOARD_CACHE_TTL', 300)
+
+
+def compute_stats(user):
+    """
+    Compute the dashboard payload and the number of seconds it stays exact.
+    """
+    now = timezone.now()
+    user_projects = access.scope(Project.objects.filter(is_active=True), user, 'pk').values('id')
+
+    # The per-project counters make the project totals a single aggregate
+    project_totals = Project.objects.filter(id__in=user_projects).aggregate(
+        total_projects=Count('id'),
+        total_issues=Sum('issues_count'),
+    )
+
+    open_in_projects = Q(project__in=user_projects, status__in=OPEN_STATUSES)
+    issue_totals = Issue.objects.filter(
+        Q(assignee=user) | Q(project__in=user_projects),
+        is_active=True,
+    ).aggregate(
+        assigned_issues=Count('id', filter=Q(assignee=user, status__in=OPEN_STATUSES)),
+        overdue_issues=Count('id', filter=open_in_projects & Q(due_date__lt=now)),
+        next_due=Min('due_date', filter=open_in_projects & Q(due_date__gte=now)),
+    )
+
+    recent_activities = Activity.objects.filter(
+        project__in=user_projects
+    ).select_related('user', 'issue', 'project')[:10]
+
+    ttl = get_ttl()
+    if issue_totals['next_due'] is not None:
+        ttl = min(ttl, max(int((issue_totals['next_due'] - now).total_seconds()) + 1, 1))
+
+    data = {
+        'total_projects': project_totals['total_projects'],
+        'total_issues': project_totals['total_issues'] or 0,
+        'assigned_issues': issue_totals['assigned_issues'],
+        'overdue_issues': issue_totals['overdue_issues'],
+        'recent_activities': ActivitySerializer(recent_activities, many=True).data,
+    }
+    return data, ttl
+
+
+def _current_version(user_id):
+    # A nanosecond clock start means a version lost to eviction never comes back
+    return cache.get_or_set(version_key(user_id), time.time_ns(), None)
+
+
+def get_stats(user):
+    """
+    Return ``(data, generated_at, cached)`` for the user's dashboard.
+    """
+    key = cache_key(user.pk, _current_version(user.pk))
+    entry = cache.get(key)
+    if entry is not None:
+        return entry['data'], entry['generated_at'], True
+
+    data, ttl = compute_stats(user)
+    generated_at = time.time()
+    cache.set(key, {'data': data, 'generated_at': generated_at}, ttl)
+    return data, generated_at, False
+
+
+def _bump(project_ids, user_ids):
+    user_ids = set(user_ids)
+    project_ids = [pk for pk in project_ids if pk is not None]
+    if project_ids:
+        user_ids.update(access.user_ids(project_ids))
+    user_ids.discard(None)
+    for user_id in user_ids:
+        try:
+            cache.incr(version_key(user_id))
+        except ValueError:
+            cache.set(version_key(user_id), time.time_ns(), None)
+
+
+def invalidate(project_ids=(), user_ids=()):
+    """
+    Expire the cached stats of every user who can see one of ``project_ids``,
+    plus ``user_ids``, once the current transaction commits.
+    """
+    project_ids, user_ids = set(project_ids), set(user_ids)
+    if project_ids or user_ids:
+        transaction.on_commit(lambda: _bump(project_ids, user_ids))
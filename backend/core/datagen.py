@@ -0,0 +1,315 @@
+"""
+Synthetic datasets at production scale.
+
+``generate(issues)`` adds ``issues`` issues to the database along with the
+users, projects, labels, comments, activities and link rows around them.
+The shape follows what real trackers look like rather than averages:
+
+* Project sizes follow a Zipf law: a few projects hold most issues and most
+  have a handful. Member counts grow with the square root of a project's
+  expected size, and reporters, assignees, watchers and comment authors are
+  drawn from the project's members.
+* Comments per issue are Pareto distributed: most issues have none or a
+  few, with a long tail of busy threads up to MAX_COMMENTS. Later comments
+  reply to an earlier one with REPLY_PROBABILITY, so threads nest, up to
+  MAX_REPLY_DEPTH deep.
+* Labels are Zipf distributed too. Each issue has a ``created`` activity,
+  a ``commented`` activity per comment, and sometimes a status change.
+* ``updated_at`` follows each row's history, as the app would have set it:
+  an issue's is its latest closing or status change, and projects and
+  comments are never edited after they are created.
+
+Every value comes from a ``random.Random`` seeded by the caller, and every
+timestamp is relative to ``now``, so the same seed and ``now`` on the same
+starting database produce the same rows. Primary keys are explicit,
+counted up from the current maximum, and sequences are reset at the end.
+
+Rows are built lazily and written in batches of ``batch_size``: with
+PostgreSQL's COPY, elsewhere with one prepared multi-row INSERT. A batch is only written
+after the pending rows of every model it references, so memory stays flat
+at any scale. Generation is not one transaction; an interrupted run leaves
+the batches written so far. No signals fire. The derived tables (counters,
+project access, search documents and the last ROLLUP_DAYS of analytics
+rollups) are rebuilt once at the end, as a restore does.
+
+The first generated user is staff, owns the first generated project and
+reported its first issue. All generated users share the password PASSWORD.
+"""
+
+import io
+import math
+import random
+from bisect import bisect
+from collections import Counter
+from datetime import timedelta
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from . import access, analytics, counters, search
+from .models import Activity, Comment, Issue, IssueLabel, Label, Project
+
+SCALES = {'1k': 1_000, '100k': 100_000, '1m': 1_000_000}
+ISSUES_PER_PROJECT = 100
+ISSUES_PER_USER = 20
+LABELS = 50
+PROJECT_ZIPF_EXPONENT = 1.1
+LABEL_ZIPF_EXPONENT = 1.0
+MAX_MEMBERS = 200
+# Pareto shape of comments per issue: most have none, the mean is about 2.5, a few run to hundreds
+COMMENT_TAIL = 1.3
+MAX_COMMENTS = 1000
+REPLY_PROBABILITY = 0.4
+MAX_REPLY_DEPTH = 5
+STATUS_CHANGE_PROBABILITY = 0.5
+HISTORY_DAYS = 365
+# The analytics endpoint shows the last 30 days by default
+ROLLUP_DAYS = 30
+BATCH_SIZE = 5000
+PASSWORD = 'benchmark-password'
+
+WORDS = [
+    'login', 'crash', 'timeout', 'export', 'search', 'upload', 'dashboard', 'email',
+    'report', 'mobile', 'payment', 'session', 'cache', 'render', 'sync', 'import',
+    'filter', 'layout', 'api', 'token', 'permission', 'query', 'memory', 'latency',
+]
+
+
+def _next_pk(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def zipf_weights(count, exponent):
+    """
+    Cumulative weights of ranks 1 to ``count`` under a Zipf law.
+    """
+    return list(accumulate(1 / rank ** exponent for rank in range(1, count + 1)))
+
+
+def _pick(rng, items, cumulative):
+    return items[bisect(cumulative, rng.random() * cumulative[-1])]
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return str(value).replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def write_rows(model, objs):
+    """
+    Insert model instances in one statement: COPY on PostgreSQL, a prepared
+    ``executemany`` elsewhere. Values are prepared as bulk_create prepares
+    them, defaults included, without compiling a query per batch, except
+    that ``auto_now`` fields keep the value set on the instance instead of
+    the wall clock. No signals are sent.
+    """
+    # Resolved once: every attribute read on the ``connection`` proxy is a lookup
+    db = connections[model.objects.db]
+    fields = [
+        field for field in model._meta.concrete_fields
+        if not (field.primary_key and objs[0].pk is None)
+    ]
+    rows = [
+        [
+            field.get_db_prep_save(
+                getattr(obj, field.attname) if getattr(field, 'auto_now', False) else field.pre_save(obj, True), db
+            )
+            for field in fields
+        ]
+        for obj in objs
+    ]
+
+    quote = db.ops.quote_name
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    with transaction.atomic(using=db.alias), db.cursor() as cursor:
+        if db.vendor == 'postgresql':
+            data = io.StringIO(''.join('\t'.join(map(_copy_value, row)) + '\n' for row in rows))
+            cursor.cursor.copy_expert(f'COPY {table} ({columns}) FROM STDIN', data)
+        else:
+            placeholders = ', '.join(['%s'] * len(fields))
+            cursor.executemany(f'INSERT INTO {table} ({columns}) VALUES ({placeholders})', rows)
+
+
+class Writer:
+    """
+    Per-model buffers of unsaved rows, written in batches.
+
+    Models must be added parent first: writing a batch first writes the
+    pending rows of every model added before it, so foreign keys always
+    point at rows already in their table.
+    """
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.buffers = {}
+        self.counts = Counter()
+
+    def add(self, obj):
+        model = type(obj)
+        buffer = self.buffers.setdefault(model, [])
+        buffer.append(obj)
+        if len(buffer) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, until=None):
+        for model, buffer in self.buffers.items():
+            if buffer:
+                write_rows(model, buffer)
+                self.counts[model._meta.db_table] += len(buffer)
+                buffer.clear()
+            if model is until:
+                return
+
+
+def generate(issues, users=None, projects=None, seed=0, now=None, batch_size=BATCH_SIZE, log=lambda message: None):
+    """
+    Insert a dataset of ``issues`` issues, with ``users`` users and
+    ``projects`` projects (by default in proportion to the issues). Returns
+    the number of rows written per table.
+    """
+    rng = random.Random(seed)
+    now = now or timezone.now()
+    user_count = users or max(10, issues // ISSUES_PER_USER)
+    project_count = projects or max(1, issues // ISSUES_PER_PROJECT)
+    writer = Writer(batch_size)
+
+    first_user, first_label, first_project, first_issue, first_comment, first_activity = (
+        _next_pk(model) for model in (User, Label, Project, Issue, Comment, Activity)
+    )
+    user_ids = range(first_user, first_user + user_count)
+    label_ids = range(first_label, first_label + LABELS)
+    project_ids = range(first_project, first_project + project_count)
+    history_start = now - timedelta(days=HISTORY_DAYS)
+
+    def moment(start):
+        return start + (now - start) * rng.random()
+
+    log(f'Generating {user_count} users, {project_count} projects and {issues} issues')
+    password = make_password(PASSWORD)
+    for pk in user_ids:
+        writer.add(User(
+            pk=pk, username=f'user{pk}', email=f'user{pk}@example.com', password=password,
+            first_name=rng.choice(WORDS).title(), last_name=rng.choice(WORDS).title(),
+            is_staff=pk == first_user, date_joined=moment(history_start),
+        ))
+
+    for pk in label_ids:
+        writer.add(Label(pk=pk, name=f'{rng.choice(WORDS)}-{pk}', color=f'#{rng.randrange(0x1000000):06x}'))
+    label_weights = zipf_weights(LABELS, LABEL_ZIPF_EXPONENT)
+
+    # Ranks are shuffled so that project size does not follow the primary key
+    rank_weights = [1 / rank ** PROJECT_ZIPF_EXPONENT for rank in range(1, project_count + 1)]
+    rng.shuffle(rank_weights)
+    project_weights = list(accumulate(rank_weights))
+
+    members = {}
+    for pk, weight in zip(project_ids, rank_weights):
+        owner = first_user if pk == first_project else rng.choice(user_ids)
+        expected = issues * weight / project_weights[-1]
+        others = rng.sample(user_ids, min(user_count, MAX_MEMBERS, int(math.sqrt(expected))))
+        members[pk] = [owner, *(user_id for user_id in others if user_id != owner)]
+        created_at = moment(history_start)
+        writer.add(Project(
+            pk=pk, name=f'{_sentence(rng, 2).title()} {pk}', description=_sentence(rng, 12),
+            created_by_id=owner, created_at=created_at, updated_at=created_at,
+        ))
+    for pk in project_ids:
+        for user_id in members[pk]:
+            writer.add(Project.members.through(project_id=pk, user_id=user_id))
+
+    has_issues = set()
+    comment_pk, activity_pk = first_comment, first_activity
+    for issue_pk in range(first_issue, first_issue + issues):
+        project_id = first_project if issue_pk == first_issue else _pick(rng, project_ids, project_weights)
+        team = members[project_id]
+        status = rng.choice(Issue.STATUS_CHOICES)[0]
+        created_at = moment(history_start)
+        closed_at = moment(created_at) if status in Issue.CLOSED_STATUSES else None
+        status_changed_at = moment(created_at) if rng.random() < STATUS_CHANGE_PROBABILITY else None
+        # Every project's first issue comes from its owner
+        reporter_id = rng.choice(team) if project_id in has_issues else team[0]
+        has_issues.add(project_id)
+        writer.add(Issue(
+            pk=issue_pk, title=_sentence(rng, 5).capitalize(), description=_sentence(rng, 30),
+            status=status, priority=rng.choice(Issue.PRIORITY_CHOICES)[0],
+            severity=rng.choice(Issue.SEVERITY_CHOICES)[0], created_at=created_at, closed_at=closed_at,
+            # Comments do not touch an issue's updated_at; closing and status changes do
+            updated_at=max(filter(None, [created_at, closed_at, status_changed_at])),
+            due_date=created_at + timedelta(days=rng.randrange(7, 60)) if rng.random() < 0.5 else None,
+            project_id=project_id, reporter_id=reporter_id,
+            assignee_id=rng.choice(team) if rng.random() < 0.7 else None,
+        ))
+
+        labels = {_pick(rng, label_ids, label_weights) for _ in range(rng.randrange(4))}
+        for label_id in sorted(labels):
+            writer.add(IssueLabel(issue_id=issue_pk, label_id=label_id, added_by_id=reporter_id))
+        for user_id in rng.sample(team, min(len(team), rng.randrange(3))):
+            writer.add(Issue.watchers.through(issue_id=issue_pk, user_id=user_id))
+
+        writer.add(Activity(
+            pk=activity_pk, action='created', description='created issue', user_id=reporter_id,
+            issue_id=issue_pk, project_id=project_id, created_at=created_at,
+        ))
+        activity_pk += 1
+
+        # (pk, root_id, depth) of the comments so far, for replies to pick from
+        thread = []
+        comment_count = min(MAX_COMMENTS, int(rng.paretovariate(COMMENT_TAIL)) - 1)
+        for commented_at in sorted(moment(created_at) for _ in range(comment_count)):
+            parent = rng.choice(thread) if thread and rng.random() < REPLY_PROBABILITY else None
+            if parent is not None and parent[2] >= MAX_REPLY_DEPTH:
+                parent = None
+            root_id, depth = (parent[1] or parent[0], parent[2] + 1) if parent else (None, 0)
+            author_id = rng.choice(team)
+            writer.add(Comment(
+                pk=comment_pk, issue_id=issue_pk, author_id=author_id, content=_sentence(rng, 15),
+                created_at=commented_at, updated_at=commented_at,
+                parent_id=parent[0] if parent else None, root_id=root_id, depth=depth,
+            ))
+            writer.add(Activity(
+                pk=activity_pk, action='commented', description='commented on issue', user_id=author_id,
+                issue_id=issue_pk, project_id=project_id, created_at=commented_at,
+            ))
+            thread.append((comment_pk, root_id, depth))
+            comment_pk += 1
+            activity_pk += 1
+
+        if status_changed_at is not None:
+            writer.add(Activity(
+                pk=activity_pk, action='status_changed', description=f'changed status to {status}',
+                user_id=rng.choice(team), issue_id=issue_pk, project_id=project_id, created_at=status_changed_at,
+            ))
+            activity_pk += 1
+
+    writer.flush()
+    for name, count in writer.counts.items():
+        log(f'  {count} {name}')
+
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [User, Label, Project, Issue, Comment, Activity]):
+            cursor.execute(sql)
+
+    log('Rebuilding counters and project access')
+    with transaction.atomic():
+        counters.rebuild()
+        access.rebuild()
+    log('Rebuilding search documents')
+    search.rebuild(batch_size=batch_size)
+    log(f'Rolling up the last {ROLLUP_DAYS} days of analytics')
+    yesterday = timezone.localdate(now) - timedelta(days=1)
+    for _day, _rows in analytics.rollup(yesterday - timedelta(days=ROLLUP_DAYS - 1), yesterday):
+        pass
+    return dict(writer.counts)
@@ -0,0 +1,232 @@
+"""
+Read-only fast serialization for the busiest list endpoints.
+
+Rendering a page through ModelSerializer builds a model instance per row and
+runs every DRF field's ``get_attribute``/``to_representation`` pair, which
+costs more than the SQL on the issue, project and activity lists. The
+``*Rows`` classes below select exactly the columns those serializers read
+with ``.values()`` (related names through joins) and turn each row into the
+same dict the serializer produces, with the conversions compiled into plain
+functions. Output must stay identical to the serializers, byte for byte once
+rendered. FastPathParityTests in core/tests.py checks that on purpose-built
+rows, and ``manage.py verify_fast_serializers`` compares both paths on a
+live database.
+
+FastListMixin routes a view's plain GET list through the fast path and falls
+back to the serializer when ``?fields=``/``?expand=`` ask for another shape.
+"""
+
+import decimal
+
+from django.utils import timezone
+from rest_framework.response import Response
+
+from . import sparse
+from .models import Activity, Issue, Project
+
+AVATAR = '/placeholder.svg?height=40&width=40'
+USER_COLUMNS = ['id', 'username', 'email', 'first_name', 'last_name', 'is_active', 'date_joined']
+
+
+def format_datetime(value, tz):
+    """
+    Match DRF's DateTimeField: ISO 8601 in the current time zone, UTC as ``Z``.
+    """
+    if not value:
+        return None
+    value = value.astimezone(tz) if timezone.is_aware(value) else timezone.make_aware(value, tz)
+    value = value.isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def decimal_formatter(max_digits, decimal_places):
+    """
+    Compile DRF's DecimalField output (a fixed-point string) for one field.
+    """
+    exponent = decimal.Decimal('.1') ** decimal_places
+    context = decimal.getcontext().copy()
+    context.prec = max_digits
+
+    def format_decimal(value):
+        if value is None:
+            return None
+        if not isinstance(value, decimal.Decimal):
+            value = decimal.Decimal(str(value).strip())
+        return '{:f}'.format(value.quantize(exponent, context=context))
+
+    return format_decimal
+
+
+def user_columns(prefix):
+    return [f'{prefix}__{column}' for column in USER_COLUMNS]
+
+
+def map_user(row, prefix, tz):
+    """
+    Build UserSerializer output from the ``prefix__*`` columns of a row.
+    """
+    pk = row[f'{prefix}__id']
+    if pk is None:
+        return None
+    first_name = row[f'{prefix}__first_name']
+    last_name = row[f'{prefix}__last_name']
+    username = row[f'{prefix}__username']
+    return {
+        'id': pk,
+        'username': username,
+        'email': row[f'{prefix}__email'],
+        'first_name': first_name,
+        'last_name': last_name,
+        'full_name': f'{first_name} {last_name}'.strip() or username,
+        'avatar': AVATAR,
+        'is_active': row[f'{prefix}__is_active'],
+        'date_joined': format_datetime(row[f'{prefix}__date_joined'], tz),
+    }
+
+
+class Rows:
+    """
+    Base class: the columns one serializer reads and how to map them.
+
+    Column names use the model's attnames (``project_id``) so the keyset
+    paginator can read ordering values straight off the row dicts.
+    """
+    model = None
+    columns = []
+
+    def project(self, queryset):
+        """
+        Turn a filtered, ordered queryset into a queryset of row dicts.
+        """
+        return queryset.select_related(None).prefetch_related(None).values(*self.columns)
+
+    def to_representation(self, rows):
+        tz = timezone.get_current_timezone()
+        rows = list(rows)
+        extra = self.load_related(rows)
+        return [self.map_row(row, tz, extra) for row in rows]
+
+    def load_related(self, rows):
+        return None
+
+    def map_row(self, row, tz, extra):
+        raise NotImplementedError
+
+
+class IssueRows(Rows):
+    """
+    Mirrors IssueSerializer.
+    """
+    model = Issue
+    columns = [
+        'id', 'title', 'description', 'status', 'priority', 'severity',
+        'created_at', 'updated_at', 'due_date', 'estimated_hours',
+        'project_id', 'project__name', 'comments_count', 'attachments_count', 'is_active',
+        *user_columns('reporter'), *user_columns('assignee'),
+    ]
+    format_hours = staticmethod(decimal_formatter(6, 2))
+
+    def map_row(self, row, tz, extra):
+        due_date = row['due_date']
+        return {
+            'id': row['id'],
+            'title': row['title'],
+            'description': row['description'],
+            'status': row['status'],
+            'priority': row['priority'],
+            'severity': row['severity'],
+            'created_at': format_datetime(row['created_at'], tz),
+            'updated_at': format_datetime(row['updated_at'], tz),
+            'due_date': format_datetime(due_date, tz),
+            'estimated_hours': self.format_hours(row['estimated_hours']),
+            'project': row['project_id'],
+            'project_name': row['project__name'],
+            'reporter': map_user(row, 'reporter', tz),
+            'assignee': map_user(row, 'assignee', tz),
+            'comments_count': row['comments_count'],
+            'attachments_count': row['attachments_count'],
+            'is_overdue': bool(
+                due_date and row['status'] not in Issue.CLOSED_STATUSES and timezone.now() > due_date
+            ),
+            'is_active': row['is_active'],
+        }
+
+
+class ProjectRows(Rows):
+    """
+    Mirrors ProjectSerializer; members load with one extra query per page.
+    """
+    model = Project
+    columns = [
+        'id', 'name', 'description', 'created_at', 'updated_at',
+        'issues_count', 'open_issues_count', 'members_count', 'is_active',
+        *user_columns('created_by'),
+    ]
+
+    def load_related(self, rows):
+        members = {row['id']: [] for row in rows}
+        if members:
+            memberships = Project.members.through.objects.filter(
+                project_id__in=list(members)
+            ).order_by('project_id', 'user_id').values('project_id', *user_columns('user'))
+            for membership in memberships:
+                members[membership['project_id']].append(membership)
+        return members
+
+    def map_row(self, row, tz, extra):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'description': row['description'],
+            'created_at': format_datetime(row['created_at'], tz),
+            'updated_at': format_datetime(row['updated_at'], tz),
+            'created_by': map_user(row, 'created_by', tz),
+            'members': [map_user(member, 'user', tz) for member in extra[row['id']]],
+            'issues_count': row['issues_count'],
+            'open_issues_count': row['open_issues_count'],
+            'members_count': row['members_count'],
+            'is_active': row['is_active'],
+        }
+
+
+class ActivityRows(Rows):
+    """
+    Mirrors ActivitySerializer.
+    """
+    model = Activity
+    columns = [
+        'id', 'action', 'description', 'created_at', 'issue__title', 'project__name',
+        *user_columns('user'),
+    ]
+
+    def map_row(self, row, tz, extra):
+        return {
+            'id': row['id'],
+            'action': row['action'],
+            'description': row['description'],
+            'created_at': format_datetime(row['created_at'], tz),
+            'user': map_user(row, 'user', tz),
+            'issue_title': row['issue__title'],
+            'project_name': row['project__name'],
+        }
+
+
+class FastListMixin:
+    """
+    Serve a list view's GET through ``fast_rows_class`` instead of its serializer.
+    """
+    fast_rows_class = None
+
+    def list(self, request, *args, **kwargs):
+        fields, expand = sparse.get_params(request)
+        if self.fast_rows_class is None or fields is not None or expand is not None:
+            return super().list(request, *args, **kwargs)
+
+        rows = self.fast_rows_class()
+        queryset = rows.project(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(rows.to_representation(page))
+        return Response(rows.to_representation(queryset))
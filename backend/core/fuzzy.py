@@ -0,0 +1,290 @@
+"""
+Typo-tolerant trigram lookup for users and projects.
+
+Pickers call the lookup endpoints on every keystroke, so matching must not
+scan the tables. On PostgreSQL the work is done by pg_trgm with a GIN
+trigram index over a normalized text expression. Elsewhere (SQLite for
+local runs) each process keeps an in-memory trigram index: postings narrow
+the candidates, which are then rescored exactly from their text.
+
+The in-process index applies this process's writes through the signal
+handlers in core.signals once their transaction commits, so a rolled-back
+write never reaches it. Committed writes also bump a shared generation
+number in the cache, after commit so that no other process rebuilds from
+pre-commit data and then counts itself current. An index behind the
+generation is rebuilt at most once every REBUILD_INTERVAL seconds.
+"""
+
+import re
+import threading
+import time
+from collections import Counter
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connections, transaction
+
+from .models import Project
+
+MIN_SIMILARITY = 0.2
+CANDIDATES = 200
+REBUILD_INTERVAL = 60
+
+
+def normalize(text):
+    return ' '.join(re.findall(r'[^\W_]+', (text or '').lower()))
+
+
+def trigrams(text):
+    """
+    Return the pg_trgm-style trigram set: words padded with two leading
+    spaces and one trailing space.
+    """
+    grams = set()
+    for word in normalize(text).split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def similarity(query_grams, text):
+    """
+    Share of the query's trigrams found in ``text`` (like word_similarity).
+    """
+    if not query_grams:
+        return 0.0
+    return len(query_grams & trigrams(text)) / len(query_grams)
+
+
+class Source:
+    """
+    A lookup target: which rows are searchable and the text each one is matched on.
+    """
+
+    def __init__(self, name, model, table, columns, filters, email_column=None):
+        self.name = name
+        self.model = model
+        self.table = table
+        self.columns = columns
+        self.filters = filters
+        self.email_column = email_column
+
+    def rows(self):
+        queryset = self.model.objects.filter(**self.filters).order_by()
+        fields = self.columns + ([self.email_column] if self.email_column else [])
+        for pk, *values in queryset.values_list('pk', *fields).iterator(chunk_size=5000):
+            yield pk, self.text(values)
+
+    def text(self, values):
+        if self.email_column:
+            # Only the local part: every address shares the domain trigrams
+            *values, email = values
+            values.append((email or '').split('@')[0])
+        return ' '.join(value or '' for value in values)
+
+    def text_for(self, instance):
+        fields = self.columns + ([self.email_column] if self.email_column else [])
+        return self.text([getattr(instance, field) for field in fields])
+
+    def is_searchable(self, instance):
+        return all(getattr(instance, field) == value for field, value in self.filters.items())
+
+    def sql_expression(self):
+        parts = [f"coalesce({column}, '')" for column in self.columns]
+        if self.email_column:
+            parts.append(f"split_part(coalesce({self.email_column}, ''), '@', 1)")
+        return 'lower(' + " || ' ' || ".join(parts) + ')'
+
+
+SOURCES = {
+    'users': Source(
+        'users', User, 'auth_user', ['username', 'first_name', 'last_name'],
+        {'is_active': True}, email_column='email',
+    ),
+    'projects': Source('projects', Project, 'core_project', ['name'], {'is_active': True}),
+}
+
+
+class TrigramIndex:
+    """
+    In-memory inverted index from trigram to row ids.
+
+    A row's trigrams are recomputed from its stored text when it is replaced
+    or removed, so its postings come out exactly and a frequently saved row
+    never accumulates duplicates.
+    """
+
+    def __init__(self, rows=()):
+        self.postings = {}
+        self.texts = {}
+        for pk, text in rows:
+            self.add(pk, text)
+
+    def add(self, pk, text):
+        self.remove(pk)
+        self.texts[pk] = text
+        for gram in trigrams(text):
+            self.postings.setdefault(gram, set()).add(pk)
+
+    def remove(self, pk):
+        text = self.texts.pop(pk, None)
+        if text is None:
+            return
+        for gram in trigrams(text):
+            postings = self.postings.get(gram)
+            if postings is not None:
+                postings.discard(pk)
+                if not postings:
+                    del self.postings[gram]
+
+    def search(self, query, limit, within=None):
+        query_grams = trigrams(query)
+        counts = Counter()
+        for gram in query_grams:
+            postings = self.postings.get(gram)
+            if postings is None:
+                continue
+            # Filter before ranking, or rows outside ``within`` take the candidate slots
+            counts.update(postings if within is None else postings & within)
+
+        results = []
+        for pk, _count in counts.most_common(max(CANDIDATES, limit)):
+            text = self.texts[pk]
+            score = similarity(query_grams, text)
+            if score >= MIN_SIMILARITY:
+                results.append((score, -len(text), pk))
+
+        results.sort(reverse=True)
+        return [(pk, score) for score, _length, pk in results[:limit]]
+
+
+class InProcessBackend:
+    """
+    Per-process trigram indexes, one per source, built lazily.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.indexes = {}
+
+    def _generation_key(self, source):
+        return f'fuzzy:generation:{source.name}'
+
+    def _current_generation(self, source):
+        return cache.get_or_set(self._generation_key(source), 0, None)
+
+    def get_index(self, source):
+        generation = self._current_generation(source)
+        with self.lock:
+            entry = self.indexes.get(source.name)
+            if entry is not None:
+                index, built_generation, built_at = entry
+                if built_generation == generation or time.monotonic() - built_at < REBUILD_INTERVAL:
+                    return index
+
+        index = TrigramIndex(source.rows())
+        with self.lock:
+            self.indexes[source.name] = (index, generation, time.monotonic())
+        return index
+
+    def lookup(self, source, query, limit, within=None):
+        return self.get_index(source).search(query, limit, within)
+
+    def record_change(self, source, instance, deleted=False):
+        # Read the row now (a delete clears the pk), apply it once committed
+        pk = instance.pk
+        text = None if deleted or not source.is_searchable(instance) else source.text_for(instance)
+        transaction.on_commit(lambda: self._apply_change(source, pk, text))
+
+    def _apply_change(self, source, pk, text):
+        key = self._generation_key(source)
+        try:
+            generation = cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+            generation = 1
+
+        with self.lock:
+            entry = self.indexes.get(source.name)
+            if entry is None:
+                return
+            index, built_generation, built_at = entry
+            index.remove(pk)
+            if text is not None:
+                index.add(pk, text)
+            if built_generation == generation - 1:
+                # Nobody else wrote in between, so this index is still current
+                self.indexes[source.name] = (index, generation, built_at)
+
+
+class PostgresBackend:
+    """
+    pg_trgm word similarity over an expression GIN index.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+            for source in SOURCES.values():
+                cursor.execute(
+                    f'CREATE INDEX IF NOT EXISTS {source.table}_lookup_trgm '
+                    f'ON {source.table} USING gin (({source.sql_expression()}) gin_trgm_ops)'
+                )
+
+    def lookup(self, source, query, limit, within=None):
+        expression = source.sql_expression()
+        conditions = ' AND '.join(f'{column} = %s' for column in source.filters)
+        params = list(source.filters.values())
+        if within is not None:
+            conditions += ' AND id = ANY(%s)'
+            params.append(list(within))
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(MIN_SIMILARITY)]
+            )
+            cursor.execute(
+                f'SELECT id, word_similarity(%s, {expression}) AS score FROM {source.table} '
+                f'WHERE {conditions} AND %s <%% {expression} '
+                f'ORDER BY score DESC, length({expression}), id LIMIT %s',
+                [normalize(query), *params, normalize(query), limit]
+            )
+            return cursor.fetchall()
+
+
+_in_process = InProcessBackend()
+
+
+def get_backend(using='default'):
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return PostgresBackend(connection)
+    return _in_process
+
+
+def install(using='default'):
+    backend = get_backend(using)
+    if isinstance(backend, PostgresBackend):
+        backend.install()
+
+
+def lookup(source_name, query, limit=10, within=None):
+    """
+    Return up to ``limit`` ``(pk, score)`` pairs, best match first. Pass a
+    set of pks as ``within`` to rank only those rows.
+    """
+    if not normalize(query) or (within is not None and not within):
+        return []
+    return get_backend().lookup(SOURCES[source_name], query, limit, within)
+
+
+def record_change(source_name, instance, deleted=False):
+    """
+    Keep the in-process index in step with a saved or deleted row.
+    """
+    backend = get_backend()
+    if isinstance(backend, InProcessBackend):
+        backend.record_change(SOURCES[source_name], instance, deleted)
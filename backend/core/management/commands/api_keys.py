@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from core import apikeys
+from core.models import APIKey
+
+
+class Command(BaseCommand):
+    help = 'Create, rotate, revoke and list API keys for integrations'
+    
+    def add_arguments(self, parser):
+        subparsers = parser.add_subparsers(dest='action', required=True)
+        
+        create = subparsers.add_parser('create', help='Issue a new key')
+        create.add_argument('name', help='Name of the integration')
+        create.add_argument('--user', required=True, help='Username the key acts as')
+        create.add_argument(
+            '--scope',
+            action='append',
+            choices=apikeys.SCOPES,
+            dest='scopes',
+            help='Grant this scope (can be repeated; read by default)'
+        )
+        
+        rotate = subparsers.add_parser('rotate', help='Replace a key, keeping the old one valid for a grace period')
+        rotate.add_argument('prefix', help='Prefix of the key to replace')
+        rotate.add_argument('--grace-hours', type=float, default=24, help='Hours the old key keeps working')
+        
+        revoke = subparsers.add_parser('revoke', help='Disable a key immediately')
+        revoke.add_argument('prefix', help='Prefix of the key to revoke')
+        
+        subparsers.add_parser('list', help='Show all keys and their usage')
+    
+    def handle(self, *args, **options):
+        action = options['action']
+        
+        if action == 'create':
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f'No user named {options["user"]}')
+            api_key, raw_key = apikeys.generate(options['name'], user, options['scopes'] or ['read'])
+            self.print_key(api_key, raw_key)
+        
+        elif action == 'rotate':
+            api_key, raw_key = apikeys.rotate(
+                self.get_key(options['prefix']), timedelta(hours=options['grace_hours'])
+            )
+            self.print_key(api_key, raw_key)
+        
+        elif action == 'revoke':
+            apikeys.revoke(self.get_key(options['prefix']))
+            self.stdout.write(self.style.SUCCESS(f'Revoked {options["prefix"]}'))
+        
+        else:
+            for api_key in APIKey.objects.select_related('user'):
+                state = 'active' if api_key.is_active else 'revoked'
+                expires = f', expires {api_key.expires_at:%Y-%m-%d %H:%M}' if api_key.expires_at else ''
+                self.stdout.write(
+                    f'{api_key.prefix}  {api_key.name} as {api_key.user.username} [{",".join(api_key.scopes)}] '
+                    f'{state}{expires}, {api_key.usage_count} uses'
+                )
+    
+    def get_key(self, prefix):
+        try:
+            return APIKey.objects.get(prefix=prefix, is_active=True)
+        except APIKey.DoesNotExist:
+            raise CommandError(f'No active key with prefix {prefix}')
+    
+    def print_key(self, api_key, raw_key):
+        self.stdout.write(self.style.SUCCESS(f'Created key {api_key.prefix} for {api_key.name}'))
+        self.stdout.write(raw_key)
+        self.stdout.write('Store it now; it cannot be shown again.')
@@ -0,0 +1,77 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from core import archive
+
+
+class Command(BaseCommand):
+    help = 'Move soft-deleted and long-closed issues to the archive, or restore archived issues'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--closed-days',
+            type=int,
+            default=365,
+            help='Archive issues closed more than this many days ago (soft-deleted issues are always archived)'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=archive.BATCH_SIZE,
+            help='Issues moved per transaction'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.1,
+            help='Seconds to sleep between batches'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Show how many issues would be archived without moving them'
+        )
+        parser.add_argument(
+            '--restore',
+            nargs='+',
+            type=int,
+            metavar='ISSUE_ID',
+            help='Move these archived issues back instead'
+        )
+    
+    def handle(self, *args, **options):
+        if options['restore']:
+            restored, skipped, dropped = archive.restore_issues(options['restore'])
+            for label, count in sorted(dropped.items()):
+                if count:
+                    self.stdout.write(self.style.WARNING(
+                        f'{label}: left out {count} rows of deleted users, labels or comments'
+                    ))
+            if skipped:
+                self.stdout.write(self.style.WARNING(
+                    f'Kept {len(skipped)} issues in the archive, their reporter was deleted: '
+                    + ' '.join(map(str, skipped))
+                ))
+            missing = len(set(options['restore'])) - restored - len(skipped)
+            if missing:
+                raise CommandError(f'Restored {restored} issues; {missing} were not in the archive')
+            self.stdout.write(self.style.SUCCESS(f'Restored {restored} issues'))
+            return
+        
+        now = timezone.now()
+        queryset = archive.candidates(now, options['closed_days'])
+        remaining = queryset.count()
+        
+        if options['dry_run']:
+            self.stdout.write(f'Would archive {remaining} issues')
+            return
+        
+        done, started = 0, time.monotonic()
+        for count in archive.archive_issues(queryset, now, options['batch_size'], options['pause']):
+            done += count
+            rate = done / max(time.monotonic() - started, 0.001)
+            self.stdout.write(f'issues: {done}/{remaining} ({rate:.0f} rows/s)')
+        
+        self.stdout.write(self.style.SUCCESS(f'Archived {done} issues'))
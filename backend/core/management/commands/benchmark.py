@@ -0,0 +1,116 @@
+import json
+import tempfile
+from pathlib import Path
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from core import benchmark, datagen
+from core.models import Issue
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API endpoint against a generated dataset in a throwaway test database'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            choices=sorted(datagen.SCALES),
+            default='1k',
+            help='Dataset size by issue count (default: 1k)'
+        )
+        parser.add_argument(
+            '--issues',
+            type=int,
+            help='Exact number of issues, instead of --scale'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Seed of the generated dataset (default: 0)'
+        )
+        parser.add_argument(
+            '--iterations',
+            type=int,
+            default=20,
+            help='Timed requests per endpoint (default: 20)'
+        )
+        parser.add_argument(
+            '--warmup',
+            type=int,
+            default=2,
+            help='Untimed requests per endpoint before timing (default: 2)'
+        )
+        parser.add_argument(
+            '--only',
+            help='Only benchmark endpoints whose name ("GET issue-detail") contains this text'
+        )
+        parser.add_argument(
+            '--output',
+            help='Where to write the JSON results (default: benchmark-<scale>.json)'
+        )
+        parser.add_argument(
+            '--baseline',
+            help='JSON results of an earlier run to compare against'
+        )
+        parser.add_argument(
+            '--tolerance',
+            type=float,
+            default=0.2,
+            help='Allowed latency and memory growth over the baseline, as a fraction (default: 0.2)'
+        )
+        parser.add_argument(
+            '--keepdb',
+            action='store_true',
+            help='Keep the test database, and its dataset, for the next run'
+        )
+    
+    def handle(self, *args, **options):
+        if options['iterations'] < 1:
+            raise CommandError('--iterations must be at least 1')
+        issues = options['issues'] or datagen.SCALES[options['scale']]
+        label = options['scale'] if options['issues'] is None else str(issues)
+        output = Path(options['output'] or f'benchmark-{label}.json')
+        
+        baseline = None
+        if options['baseline']:
+            try:
+                baseline = json.loads(Path(options['baseline']).read_text())
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Cannot read baseline {options["baseline"]}: {e}')
+        
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=options['keepdb'])
+        try:
+            if Issue.objects.count() != issues:
+                if Issue.objects.exists():
+                    call_command('flush', interactive=False, verbosity=0)
+                self.stdout.write(f'Generating {issues} issues (seed {options["seed"]})...')
+                datagen.generate(issues, seed=options['seed'], log=self.stdout.write)
+            
+            self.stdout.write(f'Benchmarking on {connection.vendor}...')
+            # Uploads go to a scratch directory; request sampling would skew the timings
+            with tempfile.TemporaryDirectory() as media_root, override_settings(
+                MEDIA_ROOT=media_root, QUERY_STATS_SAMPLE_RATE=0
+            ):
+                results = benchmark.run(
+                    options['iterations'], options['warmup'], options['only'], log=self.stdout.write
+                )
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keepdb'])
+            teardown_test_environment()
+        
+        results['meta'].update(scale=label, seed=options['seed'])
+        output.write_text(json.dumps(results, indent=2) + '\n')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {len(results["endpoints"])} endpoint results to {output}'))
+        
+        if baseline is not None:
+            regressions = benchmark.compare(results, baseline, options['tolerance'])
+            for name, metric, before, after in regressions:
+                self.stdout.write(self.style.ERROR(f'{name}: {metric} {before} -> {after}'))
+            if regressions:
+                raise CommandError(f'{len(regressions)} regressions against {options["baseline"]}')
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
@@ -1,8 +1,12 @@
-from django.core.management.base import BaseCommand
+import json
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_datetime
 
-from core.models import Activity, Issue, Project
+from core import retention
 
 
 class Command(BaseCommand):
@@ -13,58 +17,112 @@ class Command(BaseCommand):
             '--days',
             type=int,
             default=365,
-            help='Delete activities older than this many days'
+            help='Delete activities older than this many days (projects can set their own retention)'
         )
         parser.add_argument(
             '--dry-run',
             action='store_true',
             help='Show what would be deleted without actually deleting'
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=retention.BATCH_SIZE,
+            help='Rows deleted or updated per transaction'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.1,
+            help='Seconds to sleep between batches'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            help='File recording progress; an interrupted run started with the same file resumes where it stopped'
+        )
+        parser.add_argument(
+            '--archive-dir',
+            help='Write deleted activities to a compressed NDJSON file in this directory'
+        )
+        parser.add_argument(
+            '--deactivate-idle-projects',
+            action='store_true',
+            help='Also deactivate active projects with no activity inside their retention period (off by default)'
+        )
     
     def handle(self, *args, **options):
-        cutoff_date = timezone.now() - timedelta(days=options['days'])
-        
-        # Find old activities
-        old_activities = Activity.objects.filter(created_at__lt=cutoff_date)
-        activity_count = old_activities.count()
+        state = self.load_checkpoint(options)
+        now = parse_datetime(state['now'])
+        querysets = retention.candidates(now, state['days'])
+        stages = retention.stages(state['idle_projects'])
         
-        # Find inactive projects with no recent activity
-        inactive_projects = Project.objects.filter(
-            is_active=False,
-            updated_at__lt=cutoff_date
-        )
-        project_count = inactive_projects.count()
+        if options['dry_run']:
+            self.stdout.write(f'Would delete {querysets["activities"].count()} old activities')
+            self.stdout.write(f'Would archive {querysets["issues"].count()} old closed issues')
+            if state['idle_projects']:
+                self.stdout.write(f'Would deactivate {querysets["projects"].count()} projects with no recent activity')
+            return
         
-        # Find closed issues older than cutoff
-        old_closed_issues = Issue.objects.filter(
-            status='closed',
-            updated_at__lt=cutoff_date,
-            is_active=True
-        )
-        issue_count = old_closed_issues.count()
+        if options['archive_dir'] and not state['archive']:
+            os.makedirs(options['archive_dir'], exist_ok=True)
+            state['archive'] = retention.archive_path(options['archive_dir'], now)
         
-        if options['dry_run']:
-            self.stdout.write(f'Would delete {activity_count} old activities')
-            self.stdout.write(f'Would archive {project_count} inactive projects')
-            self.stdout.write(f'Would archive {issue_count} old closed issues')
-        else:
-            # Delete old activities
-            deleted_activities = old_activities.delete()[0]
+        for stage in stages[stages.index(state['stage']):]:
+            state['stage'] = stage
+            queryset = querysets[stage]
+            remaining = queryset.filter(pk__gt=state['after']).count()
+            done, started = 0, time.monotonic()
+            archive = state['archive'] if stage == 'activities' else None
             
-            # Archive old projects (soft delete)
-            for project in inactive_projects:
-                project.is_active = False
-                project.save()
+            for state['after'], count in retention.run_stage(
+                stage, queryset, now, state['after'], options['batch_size'], options['pause'], archive
+            ):
+                done += count
+                state['totals'][stage] += count
+                self.save_checkpoint(options, state)
+                rate = done / max(time.monotonic() - started, 0.001)
+                self.stdout.write(f'{stage}: {done}/{remaining} ({rate:.0f} rows/s)')
             
-            # Archive old closed issues (soft delete)
-            for issue in old_closed_issues:
-                issue.is_active = False
-                issue.save()
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'Deleted {deleted_activities} activities, '
-                    f'archived {project_count} projects, '
-                    f'archived {issue_count} issues'
-                )
-            )
+            state['after'] = 0
+        
+        if options['checkpoint'] and os.path.exists(options['checkpoint']):
+            os.remove(options['checkpoint'])
+        if state['archive']:
+            self.stdout.write(f'Archived activities to {state["archive"]}')
+        
+        totals = state['totals']
+        summary = f'Deleted {totals["activities"]} activities, archived {totals["issues"]} issues'
+        if state['idle_projects']:
+            summary += f', deactivated {totals["projects"]} idle projects'
+        self.stdout.write(self.style.SUCCESS(summary))
+    
+    def load_checkpoint(self, options):
+        path = options['checkpoint']
+        if not path or not os.path.exists(path):
+            return {
+                'now': timezone.now().isoformat(),
+                'days': options['days'],
+                'idle_projects': options['deactivate_idle_projects'],
+                'stage': retention.STAGES[0],
+                'after': 0,
+                'archive': None,
+                'totals': dict.fromkeys(retention.STAGES, 0),
+            }
+        
+        with open(path) as f:
+            state = json.load(f)
+        if state['days'] != options['days']:
+            raise CommandError(f'{path} was written with --days={state["days"]}; pass the same value to resume')
+        if state.get('idle_projects', False) != options['deactivate_idle_projects']:
+            raise CommandError(f'{path} was written with a different --deactivate-idle-projects; pass the same to resume')
+        state['idle_projects'] = options['deactivate_idle_projects']
+        self.stdout.write(f'Resuming from {path}: {state["stage"]} after id {state["after"]}')
+        return state
+    
+    def save_checkpoint(self, options, state):
+        path = options['checkpoint']
+        if not path:
+            return
+        with open(path + '.tmp', 'w') as f:
+            json.dump(state, f)
+        os.replace(path + '.tmp', path)
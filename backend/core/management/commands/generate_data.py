@@ -0,0 +1,77 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from core import datagen
+
+
+def aware_datetime(value):
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(value)
+    return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed)
+
+
+class Command(BaseCommand):
+    help = 'Generate a large, deterministic dataset with realistic skew for performance work'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            choices=sorted(datagen.SCALES),
+            default='100k',
+            help='Dataset size by issue count (default: 100k)'
+        )
+        parser.add_argument(
+            '--issues',
+            type=int,
+            help='Exact number of issues, instead of --scale'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            help=f'Number of users (default: one per {datagen.ISSUES_PER_USER} issues)'
+        )
+        parser.add_argument(
+            '--projects',
+            type=int,
+            help=f'Number of projects (default: one per {datagen.ISSUES_PER_PROJECT} issues)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed; the same seed gives the same rows (default: 0)'
+        )
+        parser.add_argument(
+            '--now',
+            type=aware_datetime,
+            help='Timestamp the generated history ends at (default: now); fix it to reproduce timestamps too'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=datagen.BATCH_SIZE,
+            help=f'Rows per insert (default: {datagen.BATCH_SIZE})'
+        )
+    
+    def handle(self, *args, **options):
+        issues = options['issues'] or datagen.SCALES[options['scale']]
+        for name in ('issues', 'users', 'projects', 'batch_size'):
+            if options[name] is not None and options[name] < 1:
+                raise CommandError(f'--{name.replace("_", "-")} must be at least 1')
+        
+        started = timezone.now()
+        created = datagen.generate(
+            issues,
+            users=options['users'],
+            projects=options['projects'],
+            seed=options['seed'],
+            now=options['now'],
+            batch_size=options['batch_size'],
+            log=self.stdout.write,
+        )
+        
+        elapsed = (timezone.now() - started).total_seconds()
+        rows = sum(created.values())
+        self.stdout.write(self.style.SUCCESS(f'Generated {rows} rows in {elapsed:.0f}s ({rows / max(elapsed, 1):.0f} rows/s)'))
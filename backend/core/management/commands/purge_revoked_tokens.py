@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core import revocation
+
+
+class Command(BaseCommand):
+    help = 'Delete revoked refresh tokens that have expired'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=revocation.BATCH_SIZE,
+            help='Rows deleted per transaction'
+        )
+        parser.add_argument(
+            '--pause',
+            type=float,
+            default=0.1,
+            help='Seconds to sleep between batches'
+        )
+    
+    def handle(self, *args, **options):
+        deleted = 0
+        for count in revocation.purge_expired(timezone.now(), options['batch_size'], options['pause']):
+            deleted += count
+            self.stdout.write(f'revoked tokens: {deleted} deleted')
+        
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired revoked tokens'))
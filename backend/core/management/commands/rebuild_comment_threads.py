@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from core import threads
+
+
+class Command(BaseCommand):
+    help = 'Recompute the thread root and depth of every comment from its parent links'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=2000,
+            help='Number of comments written per UPDATE batch'
+        )
+    
+    def handle(self, *args, **options):
+        fixed = threads.rebuild_thread_fields(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated thread fields of {fixed} comments'))
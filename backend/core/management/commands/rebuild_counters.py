@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from core import counters
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the denormalized project and issue counters'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Only report stale counters; exit with an error if any are found'
+        )
+        parser.add_argument(
+            '--project',
+            type=int,
+            action='append',
+            dest='project_ids',
+            help='Limit to this project id (can be repeated)'
+        )
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=50,
+            help='Maximum number of mismatches to print in --check mode'
+        )
+    
+    def handle(self, *args, **options):
+        project_ids = options['project_ids']
+        
+        if options['check']:
+            mismatches = 0
+            for model_name, pk, field, stored, actual in counters.find_mismatches(project_ids):
+                mismatches += 1
+                if mismatches <= options['limit']:
+                    self.stdout.write(f'{model_name} {pk}: {field} is {stored}, expected {actual}')
+            
+            if mismatches:
+                raise CommandError(f'Found {mismatches} stale counters')
+            self.stdout.write(self.style.SUCCESS('All counters are up to date'))
+            return
+        
+        projects, issues = counters.rebuild(project_ids)
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt counters for {projects} projects and {issues} issues')
+        )
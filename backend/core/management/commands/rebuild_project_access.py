@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from core import access
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the user-to-project access table from project owners and members'
+    
+    def handle(self, *args, **options):
+        total = access.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} project access entries'))
@@ -0,0 +1,54 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core import analytics
+from core.models import ProjectDailyStats
+
+
+class Command(BaseCommand):
+    help = 'Fill in the daily project statistics used for analytics trends'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='First day to roll up (YYYY-MM-DD); defaults to the day after the last rollup'
+        )
+        parser.add_argument(
+            '--until',
+            type=date.fromisoformat,
+            help='Last day to roll up (YYYY-MM-DD); defaults to yesterday'
+        )
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Delete all existing rollups and recompute from the first issue'
+        )
+    
+    def handle(self, *args, **options):
+        backfilled = analytics.backfill_closed_at()
+        if backfilled:
+            self.stdout.write(f'Backfilled closed_at for {backfilled} issues')
+        
+        if options['rebuild']:
+            ProjectDailyStats.objects.all().delete()
+        
+        start, end = analytics.pending_days(options['until'])
+        if options['since']:
+            start = options['since']
+        if start > end:
+            if options['since']:
+                raise CommandError('--since must not be after --until')
+            self.stdout.write('Rollups are already up to date')
+            return
+        
+        days = rows = 0
+        for day, count in analytics.rollup(start, end):
+            days += 1
+            rows += count
+            self.stdout.write(f'{day}: {count} projects')
+        
+        self.stdout.write(
+            self.style.SUCCESS(f'Rolled up {days} days ({rows} rows) from {start} to {end}')
+        )
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core import usercache
+
+
+class Command(BaseCommand):
+    help = 'Show hit and miss totals of the authentication user cache'
+    
+    def handle(self, *args, **options):
+        totals = usercache.stats()['shared']
+        lookups = sum(totals.values())
+        for outcome in usercache.OUTCOMES:
+            self.stdout.write(f'{outcome}: {totals[outcome]}')
+        
+        hits = lookups - totals['misses']
+        rate = hits / lookups if lookups else 0
+        self.stdout.write(self.style.SUCCESS(f'{lookups} lookups, {rate:.1%} served from cache'))
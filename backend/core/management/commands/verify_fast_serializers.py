@@ -0,0 +1,68 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Prefetch
+from rest_framework.renderers import JSONRenderer
+
+from core.fastpath import ActivityRows, IssueRows, ProjectRows
+from core.models import Activity, Issue, Project
+from core.renderers import ORJSONRenderer
+from core.serializers import ActivitySerializer, IssueSerializer, ProjectSerializer
+
+
+def _cases():
+    yield 'issues', IssueRows(), IssueSerializer, Issue.objects.select_related('project', 'reporter', 'assignee')
+    yield 'projects', ProjectRows(), ProjectSerializer, Project.objects.select_related('created_by').prefetch_related(
+        Prefetch('members', queryset=User.objects.order_by('id'))
+    )
+    yield 'activities', ActivityRows(), ActivitySerializer, Activity.objects.select_related('user', 'issue', 'project')
+
+
+class Command(BaseCommand):
+    help = 'Check that the fast list path and the orjson renderer match the serializers byte for byte'
+    
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit',
+            type=int,
+            default=1000,
+            help='Number of rows of each model to compare (newest first)'
+        )
+        parser.add_argument(
+            '--show',
+            type=int,
+            default=5,
+            help='Maximum number of differing rows to print per model'
+        )
+    
+    def handle(self, *args, **options):
+        stdlib, fast_renderer = JSONRenderer(), ORJSONRenderer()
+        failures = 0
+
+        for name, rows, serializer_class, queryset in _cases():
+            queryset = queryset.order_by('-pk')[:options['limit']]
+            expected = serializer_class(queryset, many=True).data
+            actual = rows.to_representation(rows.project(queryset))
+
+            differing = 0
+            if len(expected) != len(actual):
+                differing += 1
+                self.stdout.write(f'{name}: {len(expected)} serialized rows but {len(actual)} fast rows')
+            for serialized, fast in zip(expected, actual):
+                reference = stdlib.render(serialized)
+                if reference == stdlib.render(fast) and reference == fast_renderer.render(fast):
+                    continue
+                differing += 1
+                if differing <= options['show']:
+                    self.stdout.write(f'{name} {serialized.get("id")}:')
+                    self.stdout.write(f'  serializer: {reference.decode()}')
+                    self.stdout.write(f'  fast path:  {fast_renderer.render(fast).decode()}')
+
+            if differing:
+                failures += differing
+                self.stdout.write(self.style.ERROR(f'{name}: {differing} of {len(expected)} rows differ'))
+            else:
+                self.stdout.write(f'{name}: {len(expected)} rows identical')
+
+        if failures:
+            raise CommandError(f'Found {failures} differing rows')
+        self.stdout.write(self.style.SUCCESS('Fast path output matches the serializers'))
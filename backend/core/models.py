@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.search import SearchVectorField
 from django.utils import timezone
 from django.core.validators import MinLengthValidator
 
@@ -12,6 +13,13 @@ class Project(models.Model):
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name='created_projects')
     members = models.ManyToManyField(User, related_name='projects', blank=True)
     is_active = models.BooleanField(default=True)
+    # Days of history cleanup_old_data keeps for this project; its --days when empty
+    retention_days = models.PositiveIntegerField(null=True, blank=True)
+    
+    # Denormalized counters, maintained by core.counters
+    issues_count = models.PositiveIntegerField(default=0, editable=False)
+    open_issues_count = models.PositiveIntegerField(default=0, editable=False)
+    members_count = models.PositiveIntegerField(default=0, editable=False)
     
     class Meta:
         ordering = ['-created_at']
@@ -23,14 +31,6 @@ class Project(models.Model):
     
     def __str__(self):
         return self.name
-    
-    @property
-    def issues_count(self):
-        return self.issues.filter(is_active=True).count()
-    
-    @property
-    def open_issues_count(self):
-        return self.issues.filter(status='open', is_active=True).count()
 
 
 class Issue(models.Model):
@@ -64,9 +64,14 @@ class Issue(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
     due_date = models.DateTimeField(null=True, blank=True)
+    closed_at = models.DateTimeField(null=True, blank=True, editable=False)
     estimated_hours = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     
+    # Denormalized counters, maintained by core.counters
+    comments_count = models.PositiveIntegerField(default=0, editable=False)
+    attachments_count = models.PositiveIntegerField(default=0, editable=False)
+    
     # Relationships
     project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='issues')
     reporter = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reported_issues')
@@ -83,18 +88,83 @@ class Issue(models.Model):
             models.Index(fields=['updated_at']),
             models.Index(fields=['due_date']),
             models.Index(fields=['is_active']),
+            # Keyset pagination of a project's issue list, one per ordering option
+            models.Index(fields=['project', 'is_active', 'created_at', 'id']),
+            models.Index(fields=['project', 'is_active', 'updated_at', 'id']),
+            models.Index(fields=['project', 'is_active', 'due_date', 'id']),
+            models.Index(fields=['project', 'is_active', 'priority', 'id']),
         ]
     
+    CLOSED_STATUSES = ['closed', 'resolved']
+    
     def __str__(self):
         return f"{self.project.name} - {self.title}"
     
+    def save(self, *args, **kwargs):
+        # Track when the issue entered a closed state, for the daily rollups
+        if self.status in self.CLOSED_STATUSES:
+            if self.closed_at is None:
+                self.closed_at = timezone.now()
+        else:
+            self.closed_at = None
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'closed_at'}
+        super().save(*args, **kwargs)
+    
     @property
     def is_overdue(self):
-        if self.due_date and self.status not in ['closed', 'resolved']:
+        if self.due_date and self.status not in self.CLOSED_STATUSES:
             return timezone.now() > self.due_date
         return False
 
 
+class ProjectDailyStats(models.Model):
+    """
+    End-of-day snapshot of a project's issues, filled in by the
+    rollup_project_stats command (see core.analytics).
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='daily_stats')
+    date = models.DateField()
+    opened = models.PositiveIntegerField(default=0)
+    closed = models.PositiveIntegerField(default=0)
+    open_total = models.PositiveIntegerField(default=0)
+    
+    # Open issues at the end of the day, keyed by choice value
+    by_status = models.JSONField(default=dict)
+    by_priority = models.JSONField(default=dict)
+    by_severity = models.JSONField(default=dict)
+    
+    class Meta:
+        ordering = ['date']
+        unique_together = ['project', 'date']
+        verbose_name_plural = 'project daily stats'
+    
+    def __str__(self):
+        return f"{self.project.name} - {self.date}"
+
+
+class ProjectAccessEntry(models.Model):
+    """
+    One row per user and project they own or are a member of: the
+    denormalized form of ``created_by`` and ``members`` that list querysets
+    are scoped with. Maintained by core.access.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='project_access')
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='access_entries')
+    is_owner = models.BooleanField(default=False)
+    
+    class Meta:
+        # The unique index serves lookups by user; the second one invalidation by project
+        unique_together = ['user', 'project']
+        indexes = [
+            models.Index(fields=['project', 'user']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user_id} -> {self.project_id}"
+
+
 class Comment(models.Model):
     content = models.TextField(validators=[MinLengthValidator(1)])
     created_at = models.DateTimeField(default=timezone.now)
@@ -106,15 +176,25 @@ class Comment(models.Model):
     author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='comments')
     parent = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='replies')
     
+    # Thread position, derived from parent on creation (see core.threads)
+    root = models.ForeignKey('self', on_delete=models.CASCADE, null=True, blank=True, related_name='thread_comments', editable=False)
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    
     class Meta:
         ordering = ['created_at']
         indexes = [
             models.Index(fields=['created_at']),
-            models.Index(fields=['issue']),
+            models.Index(fields=['issue', 'created_at', 'id']),
         ]
     
     def __str__(self):
         return f"Comment by {self.author.username} on {self.issue.title}"
+    
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.parent_id:
+            self.root_id = self.parent.root_id or self.parent_id
+            self.depth = self.parent.depth + 1
+        super().save(*args, **kwargs)
 
 
 class IssueAttachment(models.Model):
@@ -182,7 +262,103 @@ class Activity(models.Model):
         indexes = [
             models.Index(fields=['created_at']),
             models.Index(fields=['action']),
+            models.Index(fields=['project', 'created_at', 'id']),
+            models.Index(fields=['issue', 'created_at', 'id']),
         ]
     
     def __str__(self):
         return f"{self.user.username} {self.action} {self.issue.title}"
+
+
+class SearchDocument(models.Model):
+    """
+    Denormalized full-text search row for a project, or for an issue together
+    with the text of its comments. Maintained by core.search.
+    """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='search_documents')
+    issue = models.OneToOneField(Issue, on_delete=models.CASCADE, null=True, blank=True, related_name='search_document')
+    title = models.CharField(max_length=200)
+    body = models.TextField(blank=True)
+    comments = models.TextField(blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    # Only populated on PostgreSQL, where it carries a GIN index
+    search_vector = SearchVectorField(null=True, editable=False)
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['project'],
+                condition=models.Q(issue__isnull=True),
+                name='unique_project_search_document',
+            ),
+        ]
+    
+    def __str__(self):
+        return self.title
+
+
+class ArchivedIssue(models.Model):
+    """
+    Cold storage for an issue moved out of the hot tables, holding the rows
+    of the issue and everything that belonged to it. Maintained by
+    core.archive.
+    """
+    # The archived issue's own id
+    id = models.BigIntegerField(primary_key=True)
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='archived_issues')
+    is_active = models.BooleanField()
+    archived_at = models.DateTimeField(default=timezone.now)
+    # {table label: {'columns': [...], 'rows': [[...], ...]}}, as in a backup
+    rows = models.JSONField()
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['archived_at']),
+        ]
+    
+    def __str__(self):
+        return f"Archived issue {self.id}"
+
+
+class RevokedToken(models.Model):
+    """
+    A refresh token that may no longer be used, kept until it would have
+    expired anyway. Maintained by core.revocation.
+    """
+    jti = models.UUIDField(primary_key=True)
+    expires_at = models.DateTimeField(db_index=True)
+    
+    def __str__(self):
+        return f"Revoked token {self.jti}"
+
+
+class APIKey(models.Model):
+    """
+    A hashed API key for an integration, acting as ``user``. Issued,
+    verified and rotated by core.apikeys.
+    """
+    SCOPE_CHOICES = [
+        ('read', 'Read'),
+        ('write', 'Write'),
+    ]
+    
+    name = models.CharField(max_length=100)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_keys')
+    # The key's public first part, used to find it; the rest is only stored hashed
+    prefix = models.CharField(max_length=16, unique=True)
+    key_hash = models.CharField(max_length=64)
+    scopes = models.JSONField(default=list)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    is_active = models.BooleanField(default=True)
+    
+    # Maintained in batches by core.apikeys
+    usage_count = models.PositiveBigIntegerField(default=0, editable=False)
+    last_used_at = models.DateTimeField(null=True, blank=True, editable=False)
+    
+    class Meta:
+        ordering = ['name', '-created_at']
+    
+    def __str__(self):
+        return f"{self.name} ({self.prefix})"
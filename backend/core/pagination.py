@@ -0,0 +1,236 @@
+import base64
+import json
+from functools import reduce
+from operator import and_, or_
+from types import SimpleNamespace
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db.models import F, Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset (cursor) mode.
+
+    Requests without a ``cursor`` parameter are paginated exactly like
+    PageNumberPagination. Passing ``?cursor=`` (empty for the first page)
+    switches to keyset pagination: the next page is selected with a
+    ``WHERE (key...) > (last row's key...)`` condition on the current ordering
+    plus the primary key as a tie-breaker, so deep pages cost the same as the
+    first one. ``?count=false`` skips the COUNT(*) query in cursor mode.
+
+    Nullable ordering fields always sort their NULLs last, in both directions.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.keys = self.get_keys(queryset)
+        cursor = self.decode_cursor(request)
+
+        self.count = None
+        if self.include_count(request):
+            self.count = queryset.count()
+
+        reverse = cursor is not None and cursor['reverse']
+        queryset = queryset.order_by(*self.get_order_expressions(reverse))
+        if cursor is not None:
+            queryset = queryset.filter(self.get_after_condition(cursor['values'], reverse))
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+
+        if reverse:
+            rows.reverse()
+            self.has_next = True
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+
+        payload = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        }
+        if self.count is not None:
+            payload = {'count': self.count, **payload}
+        return Response(payload)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(
+                replace_query_param(self.base_url, self.cursor_query_param, ''), 'page'
+            )
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def include_count(self, request):
+        value = request.query_params.get(self.count_query_param, 'true')
+        return value.lower() not in ('0', 'false', 'no')
+
+    def get_keys(self, queryset):
+        """
+        Return the ordering as a list of (field, descending) pairs ending in the primary key.
+        """
+        opts = queryset.model._meta
+        ordering = queryset.query.order_by or opts.ordering
+
+        keys = []
+        for item in ordering:
+            if not isinstance(item, str) or item == '?' or '__' in item:
+                raise ValidationError({'ordering': _('Cursor pagination does not support this ordering.')})
+
+            descending = item.startswith('-')
+            name = item.lstrip('-')
+            try:
+                field = opts.pk if name == 'pk' else opts.get_field(name)
+            except FieldDoesNotExist:
+                raise ValidationError({'ordering': _('Cursor pagination does not support this ordering.')})
+            if field.is_relation:
+                raise ValidationError({'ordering': _('Cursor pagination does not support this ordering.')})
+
+            keys.append((field, descending))
+            if field.primary_key:
+                return keys
+
+        # The primary key breaks ties in the direction of the leading key
+        keys.append((opts.pk, keys[0][1] if keys else False))
+        return keys
+
+    def get_order_expressions(self, reverse):
+        expressions = []
+        for field, descending in self.keys:
+            descending = descending != reverse
+            expression = F(field.name).desc if descending else F(field.name).asc
+            if field.null:
+                # NULLs sort last going forwards, so first when walking back
+                expressions.append(expression(**{'nulls_first' if reverse else 'nulls_last': True}))
+            else:
+                expressions.append(expression())
+        return expressions
+
+    def get_after_condition(self, values, reverse):
+        """
+        Build the filter selecting rows strictly after ``values`` in the walk order.
+        """
+        terms = []
+        equal_so_far = []
+        for (field, descending), value in zip(self.keys, values):
+            descending = descending != reverse
+            nulls_after = field.null and not reverse
+            lookup = f'{field.name}__lt' if descending else f'{field.name}__gt'
+
+            if value is None:
+                # Only non-NULL rows can follow a NULL, and only when NULLs come first
+                after = None if nulls_after else Q(**{f'{field.name}__isnull': False})
+                equal = Q(**{f'{field.name}__isnull': True})
+            else:
+                after = Q(**{lookup: value})
+                if nulls_after:
+                    after |= Q(**{f'{field.name}__isnull': True})
+                equal = Q(**{field.name: value})
+
+            if after is not None:
+                terms.append(reduce(and_, equal_so_far + [after]))
+            equal_so_far.append(equal)
+
+        if not terms:
+            return Q(pk__in=[])
+        return reduce(or_, terms)
+
+    def encode_cursor(self, obj, reverse):
+        if isinstance(obj, dict):
+            # A .values() row keyed by attname
+            obj = SimpleNamespace(**obj)
+        values = []
+        for field, _descending in self.keys:
+            value = getattr(obj, field.attname)
+            values.append(None if value is None else field.value_to_string(obj))
+
+        position = {
+            'o': [('-' if descending else '') + field.name for field, descending in self.keys],
+            'v': values,
+            'r': reverse,
+        }
+        encoded = base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+        url = remove_query_param(self.base_url, 'page')
+        return replace_query_param(url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            position = json.loads(base64.urlsafe_b64decode(encoded.encode()).decode())
+            ordering = [('-' if descending else '') + field.name for field, descending in self.keys]
+            if position['o'] != ordering or len(position['v']) != len(self.keys):
+                raise ValueError('cursor was issued for a different ordering')
+            values = [
+                None if value is None else field.to_python(value)
+                for (field, _descending), value in zip(self.keys, position['v'])
+            ]
+        except (TypeError, ValueError, KeyError, DjangoValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return {'values': values, 'reverse': bool(position.get('r'))}
+
+    def get_paginated_response_schema(self, schema):
+        response_schema = super().get_paginated_response_schema(schema)
+        response_schema['required'] = ['results']
+        return response_schema
+
+    def get_schema_operation_parameters(self, view):
+        parameters = super().get_schema_operation_parameters(view)
+        parameters += [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Switches to keyset pagination. Empty for the first page.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.count_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Set to false to omit the total count in cursor mode.',
+                'schema': {'type': 'boolean'},
+            },
+        ]
+        return parameters
@@ -1,5 +1,7 @@
 from rest_framework import permissions
 
+from . import access
+
 
 class IsReporterOrAssignee(permissions.BasePermission):
     """
@@ -40,8 +42,7 @@ class IsProjectMemberOrReadOnly(permissions.BasePermission):
             return True
         
         # Write permissions are only allowed to project creator or members
-        return (obj.created_by == request.user or 
-                request.user in obj.members.all())
+        return access.for_request(request).is_member(obj.pk)
 
 
 class IsProjectOwnerOrReadOnly(permissions.BasePermission):
@@ -56,11 +57,10 @@ class IsProjectOwnerOrReadOnly(permissions.BasePermission):
         
         # Delete/modify permissions only for project owner
         if request.method == 'DELETE':
-            return obj.created_by == request.user
+            return access.for_request(request).is_owner(obj.pk)
         
         # Update permissions for owner or members
-        return (obj.created_by == request.user or 
-                request.user in obj.members.all())
+        return access.for_request(request).is_member(obj.pk)
 
 
 class CanManageIssue(permissions.BasePermission):
@@ -74,16 +74,10 @@ class CanManageIssue(permissions.BasePermission):
             return True
         
         # Check if user is project member
-        is_project_member = (
-            obj.project.created_by == request.user or 
-            request.user in obj.project.members.all()
-        )
+        is_project_member = access.for_request(request).is_member(obj.project_id)
         
         # Check if user is issue reporter or assignee
-        is_issue_participant = (
-            obj.reporter == request.user or 
-            obj.assignee == request.user
-        )
+        is_issue_participant = request.user.pk in (obj.reporter_id, obj.assignee_id)
         
         return is_project_member or is_issue_participant
 
@@ -0,0 +1,183 @@
+"""
+Per-request SQL instrumentation.
+
+QueryStatsMiddleware wraps every database connection with
+``connection.execute_wrapper`` for the length of a sampled request and
+records each statement the view runs: how many, how long they took together,
+and the slowest ones. A sampled request gets a ``Server-Timing`` header with
+the database and total time, and one structured log record on the
+``core.querystats`` logger.
+
+Statements are grouped by shape. The wrapper sees SQL before parameters are
+bound, so two lookups of different rows already have the same text; only
+``IN (%s, %s, ...)`` lists vary in length and are collapsed. A shape run
+QUERY_STATS_N_PLUS_ONE_THRESHOLD times in one request is reported as an
+N+1. When a shape first repeats, the call stack is searched for the DRF
+serializer fields being rendered, and the report names them outermost first,
+e.g. ``IssueDetailSerializer.comments > CommentSerializer.replies``, which
+is usually the missing ``select_related``/``prefetch_related``.
+
+Only QUERY_STATS_SAMPLE_RATE of requests are instrumented; the rest do not
+pay for the wrapper at all. Logged SQL carries no parameter values, so user
+data does not reach the logs, and is cut to QUERY_STATS_MAX_SQL_LENGTH
+characters. Statements run while a streaming response is iterated, after
+the view has returned, are not counted.
+"""
+
+import logging
+import random
+import re
+import sys
+import time
+from contextlib import ExitStack
+
+import orjson
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import Serializer
+
+logger = logging.getLogger(__name__)
+
+IN_LIST = re.compile(r'IN \((?:%s, )+%s\)')
+
+
+def get_sample_rate():
+    return getattr(settings, 'QUERY_STATS_SAMPLE_RATE', 0.01)
+
+
+def get_threshold():
+    return getattr(settings, 'QUERY_STATS_N_PLUS_ONE_THRESHOLD', 5)
+
+
+def shape(sql):
+    """
+    The statement with variable-length ``IN`` lists collapsed to one placeholder.
+    """
+    return IN_LIST.sub('IN (%s)', sql)
+
+
+def truncate(sql):
+    limit = getattr(settings, 'QUERY_STATS_MAX_SQL_LENGTH', 500)
+    return sql if len(sql) <= limit else sql[:limit] + '...'
+
+
+def serializer_fields():
+    """
+    The serializer fields being rendered by the current call stack, outermost
+    first, as ``"Serializer.field > ..."``, or None outside serialization.
+    """
+    path = []
+    frame = sys._getframe(1)
+    while frame is not None:
+        if frame.f_code.co_name == 'to_representation':
+            owner, field = frame.f_locals.get('self'), frame.f_locals.get('field')
+            if isinstance(owner, Serializer) and field is not None:
+                path.append(f'{type(owner).__name__}.{field.field_name}')
+        frame = frame.f_back
+    return ' > '.join(reversed(path)) or None
+
+
+class QueryStats:
+    """
+    The statements run by one request. Installed as an execute wrapper.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.timings = []
+        self.shapes = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.record(sql, time.perf_counter() - start)
+
+    def record(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        self.timings.append((duration, sql))
+
+        key = shape(sql)
+        entry = self.shapes.get(key)
+        if entry is None:
+            self.shapes[key] = [1, duration, None]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            if entry[0] == 2:
+                # Only a repeated shape is worth walking the stack for
+                entry[2] = serializer_fields()
+
+    def slowest(self, limit):
+        return sorted(self.timings, key=lambda timing: timing[0], reverse=True)[:limit]
+
+    def repeated(self, threshold):
+        """
+        The shapes run at least ``threshold`` times, most frequent first.
+        """
+        found = [(sql, *entry) for sql, entry in self.shapes.items() if entry[0] >= threshold]
+        return sorted(found, key=lambda item: item[1], reverse=True)
+
+
+def server_timing(stats, total):
+    return (
+        f'db;desc="{stats.count} queries";dur={stats.duration * 1000:.2f}, '
+        f'total;dur={total * 1000:.2f}'
+    )
+
+
+class QueryStatsMiddleware:
+    """
+    Record the SQL of a sample of requests, report it in ``Server-Timing``
+    and log it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        rate = get_sample_rate()
+        if rate <= 0 or (rate < 1 and random.random() >= rate):
+            return self.get_response(request)
+
+        stats = QueryStats()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = time.perf_counter() - start
+
+        if getattr(settings, 'QUERY_STATS_SERVER_TIMING', True):
+            response['Server-Timing'] = server_timing(stats, total)
+        self.log(request, response, stats, total)
+        return response
+
+    def log(self, request, response, stats, total):
+        match = request.resolver_match
+        n_plus_one = [
+            {'sql': truncate(sql), 'count': count, 'ms': round(duration * 1000, 2), 'field': field}
+            for sql, count, duration, field in stats.repeated(get_threshold())
+        ]
+        record = {
+            'method': request.method,
+            'path': request.path,
+            'view': match.view_name if match else None,
+            'status': response.status_code,
+            'queries': stats.count,
+            'db_ms': round(stats.duration * 1000, 2),
+            'total_ms': round(total * 1000, 2),
+            'slowest': [
+                {'sql': truncate(sql), 'ms': round(duration * 1000, 2)}
+                for duration, sql in stats.slowest(getattr(settings, 'QUERY_STATS_SLOWEST', 3))
+            ],
+            'n_plus_one': n_plus_one,
+        }
+        logger.log(
+            logging.WARNING if n_plus_one else logging.INFO,
+            orjson.dumps(record).decode(),
+            extra={'query_stats': record},
+        )
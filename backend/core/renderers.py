@@ -0,0 +1,60 @@
+"""
+orjson-backed JSON renderer and parser.
+
+The output is byte-identical to DRF's JSONRenderer with the default compact,
+unicode and strict settings: values orjson has no native (or no matching)
+encoding for - datetimes, decimals, lazy strings, querysets - go through
+DRF's own JSONEncoder, and U+2028/U+2029 are escaped the same way. Requests
+for indented output (the browsable API, ``; indent=N`` media types) use the
+stdlib renderer.
+"""
+
+import codecs
+
+import orjson
+from django.conf import settings
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_encoder = JSONEncoder()
+
+
+def dumps(data):
+    """
+    Encode ``data`` exactly as DRF's compact JSONRenderer would, as bytes.
+    """
+    ret = orjson.dumps(data, default=_encoder.default, option=OPTIONS)
+    # Match the stdlib renderer, which escapes these for JavaScript
+    return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class ORJSONRenderer(renderers.JSONRenderer):
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) or self.ensure_ascii or not (self.compact and self.strict):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return dumps(data)
+
+
+class ORJSONParser(JSONParser):
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,185 @@
+"""
+Bulk restore of the backups written by core.backup.
+
+A restore runs in one transaction. The backed-up tables are emptied with
+the database's flush SQL (TRUNCATE on PostgreSQL), then every table file of
+the full backup is streamed and inserted in batches, in the manifest's
+parent-before-child order, many-to-many link tables included. Incremental
+backups in the chain are replayed in the same transaction: tombstones are
+deleted, changed rows replace their old versions and the small tables
+copied whole replace theirs. Sequences are reset at the end.
+
+Rows are inserted the way ``loaddata`` saves them: raw, so ``auto_now``
+columns keep their backed-up values and no signals fire. The batches go
+through the same ``_insert`` call that ``bulk_create`` makes, with the raw
+flag ``bulk_create`` does not expose. Deletes are raw as well; foreign keys
+are checked at commit, by which point every table is consistent again.
+
+Existing users are kept, as user accounts outlive the data; backed-up users
+are only inserted when no user has their primary key. The project access
+table is derived data and is rebuilt in the same transaction; the search
+documents are rebuilt once the restore has committed.
+"""
+
+from itertools import islice
+
+from django.apps import apps
+from django.contrib.auth.models import User
+from django.core.management.color import no_style
+from django.db import connection, transaction
+
+from . import access, backup, counters, search
+from .models import ProjectAccessEntry, SearchDocument
+
+
+def _chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def build_instances(model, columns, rows):
+    """
+    Yield unsaved instances of ``model`` for rows of JSON values in
+    ``columns`` order.
+    """
+    fields = [model._meta.get_field(column) for column in columns]
+    for row in rows:
+        yield model(**{field.attname: field.to_python(value) for field, value in zip(fields, row)})
+
+
+def _instances(directory, entry, compression):
+    """
+    Yield unsaved model instances for the rows of one table file.
+    """
+    rows = backup.read_rows(directory, entry, compression)
+    yield from build_instances(apps.get_model(entry['model']), entry['columns'], (row.values() for row in rows))
+
+
+def insert_rows(model, instances, chunk_size=backup.CHUNK_SIZE):
+    """
+    Insert ``instances`` in batches as raw rows. Returns the row count.
+    """
+    fields = model._meta.concrete_fields
+    manager = model._base_manager.using(connection.alias)
+    batch_size = max(1, min(chunk_size, connection.ops.bulk_batch_size(fields, range(chunk_size))))
+    count = 0
+    for batch in _chunked(instances, batch_size):
+        manager._insert(batch, fields=fields, raw=True)
+        count += len(batch)
+    return count
+
+
+def _delete(model, pks, chunk_size):
+    for chunk in _chunked(pks, chunk_size):
+        model._base_manager.filter(pk__in=chunk)._raw_delete(connection.alias)
+
+
+def _new_users(instances, existing_users):
+    for user in instances:
+        if user.pk not in existing_users:
+            existing_users.add(user.pk)
+            yield user
+
+
+def _load_table(directory, entry, compression, existing_users, chunk_size):
+    model = apps.get_model(entry['model'])
+    instances = _instances(directory, entry, compression)
+    if model is User:
+        instances = _new_users(instances, existing_users)
+    return insert_rows(model, instances, chunk_size)
+
+
+def _replace_changed(model, instances, chunk_size):
+    """
+    Insert ``instances``, replacing rows that have the same primary key.
+    """
+    count = 0
+    for batch in _chunked(instances, chunk_size):
+        _delete(model, [instance.pk for instance in batch], chunk_size)
+        count += insert_rows(model, batch, chunk_size)
+    return count
+
+
+def _apply_incremental(directory, manifest, existing_users, chunk_size, log):
+    """
+    Replay one incremental backup. Returns the number of rows inserted.
+    """
+    compression = manifest['compression']
+
+    for entry in reversed(manifest['tables']):
+        if 'tombstones' not in entry:
+            continue
+        model = apps.get_model(entry['model'])
+        tombstones = backup.read_rows(directory, entry['tombstones'], compression)
+        for chunk in _chunked(tombstones, chunk_size):
+            _delete(model, [row['id'] for row in chunk if row['change'] == 'deleted'], chunk_size)
+            deactivated = [row['id'] for row in chunk if row['change'] == 'deactivated']
+            if deactivated:
+                model._base_manager.filter(pk__in=deactivated).update(is_active=False)
+
+    total = 0
+    for entry in manifest['tables']:
+        model = apps.get_model(entry['model'])
+        if entry.get('mode') == 'changes':
+            count = _replace_changed(model, _instances(directory, entry, compression), chunk_size)
+        elif model is User:
+            count = _load_table(directory, entry, compression, existing_users, chunk_size)
+        else:
+            model._base_manager.all()._raw_delete(connection.alias)
+            count = insert_rows(model, _instances(directory, entry, compression), chunk_size)
+        log(f'  {count} {entry["model"]} rows')
+        total += count
+    return total
+
+
+def cleared_models():
+    """
+    Return the models a restore empties: every backed-up table except the
+    users, plus derived tables that reference them.
+    """
+    return [model for model in backup.backup_models() if model is not User] + [SearchDocument, ProjectAccessEntry]
+
+
+def restore(directory, chunk_size=backup.CHUNK_SIZE, log=print):
+    """
+    Replace the data with the backup at ``directory``, replaying the chain of
+    incrementals it builds on. Returns the number of rows inserted.
+    """
+    chain = backup.backup_chain(directory)
+    base_dir, base = chain[0]
+    if len(chain) > 1:
+        log(f'Replaying {len(chain) - 1} incremental backup(s) on top of {base_dir}')
+
+    total = 0
+    with transaction.atomic():
+        existing_users = set(User.objects.values_list('pk', flat=True))
+
+        models = cleared_models()
+        connection.ops.execute_sql_flush(
+            connection.ops.sql_flush(no_style(), [model._meta.db_table for model in models])
+        )
+
+        log(f'Restoring {base_dir}')
+        for entry in base['tables']:
+            count = _load_table(base_dir, entry, base['compression'], existing_users, chunk_size)
+            log(f'  {count} {entry["model"]} rows')
+            total += count
+
+        for incremental_dir, manifest in chain[1:]:
+            log(f'Applying {incremental_dir}')
+            total += _apply_incremental(incremental_dir, manifest, existing_users, chunk_size, log)
+
+        if len(chain) > 1:
+            # Counters are updated in place and can lag behind in incrementals
+            counters.rebuild()
+        access.rebuild()
+
+        restored = {User, *models} - {SearchDocument, ProjectAccessEntry}
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), list(restored)):
+                cursor.execute(sql)
+
+    log('Rebuilding search documents')
+    search.rebuild()
+    return total
@@ -0,0 +1,169 @@
+"""
+Data retention for the cleanup_old_data command.
+
+Stages run in order: old activities are deleted and long-closed issues are
+deactivated. Deactivating active projects with no activity left inside
+their retention window is a third, opt-in stage (IDLE_PROJECTS_STAGE),
+since it hides projects people may still use. Each stage walks its candidates in primary key
+order in small batches, one short transaction per batch, so no statement
+holds locks on a large range or produces a large transaction log. The
+side effects that per-row ``save()`` would trigger through signals -
+counters, search documents, the fuzzy lookup index and dashboard caches -
+are applied per batch.
+
+A project's ``retention_days`` overrides the default number of days kept.
+
+Deleted activities can be archived first: each batch is appended to a
+compressed NDJSON file as a complete gzip (or zstd) member, in the same
+layout as a backup table file (first line the columns, then one JSON array
+per row). A batch is archived before it is deleted, so a run interrupted in
+between archives those rows twice rather than losing them.
+"""
+
+import os
+import time
+from collections import Counter
+from datetime import timedelta
+
+import orjson
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef, Q
+
+from . import backup, dashboard, fuzzy, search
+from .models import Activity, Issue, Project, SearchDocument
+
+STAGES = ('activities', 'issues', 'projects')
+# Only run when asked for explicitly
+IDLE_PROJECTS_STAGE = 'projects'
+BATCH_SIZE = 1000
+
+
+def retention_filter(now, days, field, project='project'):
+    """
+    Match rows whose ``field`` is older than their project's retention:
+    ``retention_days`` where set, ``days`` otherwise. ``project`` is the path
+    to the project, or None when filtering projects themselves.
+    """
+    prefix = f'{project}__' if project else ''
+    expired = Q(**{f'{prefix}retention_days__isnull': True, f'{field}__lt': now - timedelta(days=days)})
+    policies = Project.objects.filter(retention_days__isnull=False).values_list('retention_days', flat=True)
+    for policy in set(policies):
+        expired |= Q(**{f'{prefix}retention_days': policy, f'{field}__lt': now - timedelta(days=policy)})
+    return expired
+
+
+def stages(idle_projects=False):
+    """
+    The stages to run, in order; the idle project stage only with ``idle_projects``.
+    """
+    return tuple(stage for stage in STAGES if idle_projects or stage != IDLE_PROJECTS_STAGE)
+
+
+def candidates(now, days):
+    """
+    Return the queryset each stage works through.
+    """
+    recent_activity = Activity.objects.filter(project=OuterRef('pk')).exclude(
+        retention_filter(now, days, 'created_at')
+    )
+    return {
+        'activities': Activity.objects.filter(retention_filter(now, days, 'created_at')),
+        'issues': Issue.objects.filter(status='closed', is_active=True).filter(
+            retention_filter(now, days, 'updated_at')
+        ),
+        'projects': Project.objects.filter(is_active=True).filter(
+            retention_filter(now, days, 'updated_at', project=None)
+        ).exclude(Exists(recent_activity)),
+    }
+
+
+def archive_path(directory, now):
+    codec = backup.get_codec(backup.default_compression())
+    return os.path.join(directory, f'activities_{now.strftime("%Y%m%d_%H%M%S")}.ndjson{codec.suffix}')
+
+
+def _archive_codec(path):
+    for codec in backup.CODECS.values():
+        if codec.suffix and path.endswith(codec.suffix):
+            return backup.get_codec(codec.name)
+    return backup.CODECS['none']
+
+
+def archive_activities(path, pks):
+    """
+    Append the activities in ``pks`` to the archive at ``path``; the file
+    suffix picks the compression.
+    """
+    codec = _archive_codec(path)
+    columns = [field.attname for field in Activity._meta.concrete_fields]
+    rows = Activity.objects.filter(pk__in=pks).order_by('pk').values_list(*columns)
+
+    with open(path, 'ab') as raw:
+        new_file = raw.tell() == 0
+        stream = codec.writer(raw)
+        if new_file:
+            stream.write(orjson.dumps(columns) + b'\n')
+        stream.write(b''.join(orjson.dumps(row, default=str) + b'\n' for row in rows))
+        if stream is not raw:
+            stream.close()
+        raw.flush()
+        os.fsync(raw.fileno())
+
+
+def delete_activities(pks, now):
+    Activity.objects.filter(pk__in=pks).delete()
+
+
+def deactivate_issues(pks, now):
+    rows = list(Issue.objects.filter(pk__in=pks, is_active=True).values_list('pk', 'project_id', 'status'))
+    Issue.objects.filter(pk__in=[pk for pk, _project_id, _status in rows]).update(is_active=False, updated_at=now)
+
+    # The counters only include active issues
+    issues, open_issues = Counter(), Counter()
+    for _pk, project_id, status in rows:
+        issues[project_id] += 1
+        open_issues[project_id] += status == 'open'
+    for project_id, count in issues.items():
+        Project.objects.filter(pk=project_id).update(
+            issues_count=F('issues_count') - count,
+            open_issues_count=F('open_issues_count') - open_issues[project_id],
+        )
+
+    search.remove_documents(SearchDocument.objects.filter(issue_id__in=pks))
+    dashboard.invalidate(project_ids=issues)
+
+
+def deactivate_projects(pks, now):
+    Project.objects.filter(pk__in=pks).update(is_active=False, updated_at=now)
+    search.remove_documents(SearchDocument.objects.filter(project_id__in=pks, issue__isnull=True))
+    for pk in pks:
+        fuzzy.record_change('projects', Project(pk=pk), deleted=True)
+    dashboard.invalidate(project_ids=pks)
+
+
+ACTIONS = {
+    'activities': delete_activities,
+    'issues': deactivate_issues,
+    'projects': deactivate_projects,
+}
+
+
+def run_stage(stage, queryset, now, after=0, batch_size=BATCH_SIZE, pause=0, archive=None):
+    """
+    Apply ``stage`` to ``queryset`` in batches of primary keys above
+    ``after``, sleeping ``pause`` seconds between batches. Yields
+    ``(last_pk, count)`` once each batch has committed.
+    """
+    action = ACTIONS[stage]
+    while True:
+        pks = list(queryset.filter(pk__gt=after).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        if archive is not None:
+            archive_activities(archive, pks)
+        with transaction.atomic():
+            action(pks, now)
+        after = pks[-1]
+        yield after, len(pks)
+        if pause:
+            time.sleep(pause)
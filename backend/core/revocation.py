@@ -0,0 +1,185 @@
+"""
+Refresh token revocation.
+
+Logging out and rotating a refresh token both revoke it. A revoked token is
+stored as one narrow row, its jti and expiry, and ``purge_revoked_tokens``
+deletes the rows in batches once the tokens have expired. Tokens that
+expired are rejected before the revocation check, so their rows are no
+longer needed. The table therefore holds at most one refresh lifetime of
+revocations.
+
+Almost every token presented is not revoked. Each process answers that case
+from an in-memory Bloom filter of the revoked jtis, without touching the
+database; only a possible match is confirmed with a primary key lookup.
+
+The filter must include revocations made by other processes. Every
+revocation, after its transaction commits, takes the next number of a
+generation counter in the shared cache and stores its jti under that
+number. A check reads the counter. When this process's filter is behind,
+it adds the jtis it missed from the cache. A filter more than MAX_GAP
+generations behind, missing an entry that was evicted, or fuller than its
+capacity is rebuilt from the table. While the newest entry is not written
+yet, the check falls back to the database.
+"""
+
+import hashlib
+import math
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils import timezone
+
+from .models import RevokedToken
+
+GENERATION_KEY = 'auth:revoked:generation'
+# How many missed revocations are read from the cache before rebuilding instead
+MAX_GAP = 1000
+ENTRY_TTL = 24 * 60 * 60
+BATCH_SIZE = 5000
+
+
+def entry_key(generation):
+    return f'auth:revoked:{generation}'
+
+
+def _key(jti):
+    return uuid.UUID(str(jti)).bytes
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over byte strings.
+    """
+
+    def __init__(self, capacity, error_rate):
+        self.capacity = capacity
+        self.size = max(64, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key):
+        # Double hashing: k positions from the two halves of one digest
+        digest = hashlib.blake2b(key, digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, key):
+        for position in self._positions(key):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, key):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(key))
+
+
+def _current_generation():
+    # A nanosecond clock start means a counter lost to eviction jumps far ahead
+    return cache.get_or_set(GENERATION_KEY, time.time_ns(), None)
+
+
+class LocalFilter:
+    """
+    This process's view of the revoked jtis.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.bloom = None
+        self.generation = None
+
+    def _rebuild(self, generation):
+        revoked = RevokedToken.objects.filter(expires_at__gt=timezone.now())
+        capacity = max(getattr(settings, 'REVOKED_TOKENS_BLOOM_CAPACITY', 100000), 2 * revoked.count())
+        bloom = BloomFilter(capacity, getattr(settings, 'REVOKED_TOKENS_BLOOM_ERROR_RATE', 0.001))
+        for jti in revoked.values_list('jti', flat=True).iterator(chunk_size=BATCH_SIZE):
+            bloom.add(jti.bytes)
+        self.bloom, self.generation = bloom, generation
+
+    def _catch_up(self, current):
+        """
+        Add the revocations published since the last sync. Returns False if
+        the newest one is not in the cache yet.
+        """
+        generations = range(self.generation + 1, current + 1)
+        entries = cache.get_many([entry_key(generation) for generation in generations])
+        for generation in generations:
+            jti = entries.get(entry_key(generation))
+            if jti is None:
+                if generation != current:
+                    self._rebuild(current)
+                    return True
+                self.generation = generation - 1
+                return False
+            self.bloom.add(_key(jti))
+        self.generation = current
+        return True
+
+    def might_contain(self, key):
+        """
+        Return False only when ``key`` is certainly not revoked.
+        """
+        current = _current_generation()
+        with self.lock:
+            if (
+                self.bloom is None
+                or not 0 <= current - self.generation <= MAX_GAP
+                or self.bloom.count >= self.bloom.capacity
+            ):
+                self._rebuild(current)
+            elif current != self.generation and not self._catch_up(current):
+                return True
+            return key in self.bloom
+
+    def add(self, key):
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(key)
+
+
+local = LocalFilter()
+
+
+def _publish(jti):
+    try:
+        generation = cache.incr(GENERATION_KEY)
+    except ValueError:
+        generation = time.time_ns()
+        cache.set(GENERATION_KEY, generation, None)
+    cache.set(entry_key(generation), str(jti), ENTRY_TTL)
+
+
+def revoke(jti, expires_at):
+    """
+    Revoke the token with ``jti`` until ``expires_at``.
+    """
+    RevokedToken.objects.bulk_create([RevokedToken(jti=jti, expires_at=expires_at)], ignore_conflicts=True)
+    local.add(_key(jti))
+    transaction.on_commit(lambda: _publish(jti))
+
+
+def is_revoked(jti):
+    if not local.might_contain(_key(jti)):
+        return False
+    return RevokedToken.objects.filter(jti=jti).exists()
+
+
+def purge_expired(now, batch_size=BATCH_SIZE, pause=0):
+    """
+    Delete revocations of tokens expired before ``now`` in batches, sleeping
+    ``pause`` seconds between them. Yields the size of each batch.
+    """
+    expired = RevokedToken.objects.filter(expires_at__lt=now)
+    while True:
+        pks = list(expired.order_by('expires_at').values_list('pk', flat=True)[:batch_size])
+        if not pks:
+            return
+        with transaction.atomic():
+            RevokedToken.objects.filter(pk__in=pks).delete()
+        yield len(pks)
+        if pause:
+            time.sleep(pause)
@@ -0,0 +1,388 @@
+"""
+Full-text search over projects and issues.
+
+Every active project and issue has a SearchDocument row; an issue's document
+also carries the text of its comments, so a comment hit ranks its issue.
+The rows are kept current by the signal handlers in core.signals and can be
+rebuilt with the ``rebuild_search_index`` management command.
+
+The text index itself depends on the database:
+
+* PostgreSQL: a weighted ``tsvector`` column with a GIN index.
+* SQLite: an FTS5 virtual table keyed by the document id.
+* Anything else: plain ``icontains`` matching, for completeness only.
+"""
+
+import re
+
+from django.contrib.postgres.search import SearchHeadline, SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Concat
+
+from .models import Comment, Issue, Project, SearchDocument
+
+FTS_TABLE = 'core_searchdocument_fts'
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_STOP = '</mark>'
+MAX_TERMS = 16
+
+
+def tokenize(query):
+    """
+    Split user input into plain search terms, dropping any query syntax.
+    """
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def _pick_snippet(body, comments):
+    # Prefer whichever part actually contains a match
+    for snippet in (body, comments):
+        if snippet and HIGHLIGHT_START in snippet:
+            return snippet.strip()
+    return (body or comments or '').strip()
+
+
+class SearchBackend:
+    """
+    Fallback backend using unindexed ``icontains`` matching.
+    """
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        pass
+
+    def document_saved(self, document_id):
+        pass
+
+    def documents_deleted(self, document_ids):
+        pass
+
+    def refresh_all(self):
+        pass
+
+    def search(self, documents, terms, offset, limit):
+        """
+        Return ``(total, hits)`` for the documents matching every term.
+        """
+        for term in terms:
+            documents = documents.filter(
+                Q(title__icontains=term) | Q(body__icontains=term) | Q(comments__icontains=term)
+            )
+
+        total = documents.count()
+        rows = documents.order_by('-updated_at').values(
+            'id', 'project_id', 'issue_id', 'title', 'body', 'comments'
+        )[offset:offset + limit]
+
+        pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+
+        def mark(text):
+            return pattern.sub(lambda m: f'{HIGHLIGHT_START}{m.group(0)}{HIGHLIGHT_STOP}', text[:300])
+
+        hits = [
+            {
+                'document_id': row['id'],
+                'project_id': row['project_id'],
+                'issue_id': row['issue_id'],
+                'rank': 0.0,
+                'title': mark(row['title']),
+                'snippet': _pick_snippet(mark(row['body']), mark(row['comments'])),
+            }
+            for row in rows
+        ]
+        return total, hits
+
+
+class PostgresSearchBackend(SearchBackend):
+    """
+    Weighted tsvector column (title A, body B, comments C) with a GIN index.
+    """
+    config = 'english'
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                'CREATE INDEX IF NOT EXISTS core_searchdocument_vector_gin '
+                'ON core_searchdocument USING gin (search_vector)'
+            )
+
+    def _vector(self):
+        return (
+            SearchVector('title', weight='A', config=self.config)
+            + SearchVector('body', weight='B', config=self.config)
+            + SearchVector('comments', weight='C', config=self.config)
+        )
+
+    def document_saved(self, document_id):
+        SearchDocument.objects.filter(pk=document_id).update(search_vector=self._vector())
+
+    def refresh_all(self):
+        SearchDocument.objects.update(search_vector=self._vector())
+
+    def search(self, documents, terms, offset, limit):
+        # Prefix-match the last term so results follow the user's typing
+        raw = ' & '.join(terms[:-1] + [f'{terms[-1]}:*'])
+        query = SearchQuery(raw, search_type='raw', config=self.config)
+
+        matches = documents.filter(search_vector=query)
+        total = matches.count()
+
+        headline = {'start_sel': HIGHLIGHT_START, 'stop_sel': HIGHLIGHT_STOP, 'config': self.config}
+        rows = matches.annotate(
+            rank=SearchRank(F('search_vector'), query),
+            title_highlight=SearchHeadline('title', query, highlight_all=True, **headline),
+            body_snippet=SearchHeadline('body', query, max_words=30, min_words=10, **headline),
+            comments_snippet=SearchHeadline('comments', query, max_words=30, min_words=10, **headline),
+        ).order_by('-rank', '-updated_at').values(
+            'id', 'project_id', 'issue_id', 'rank', 'title_highlight', 'body_snippet', 'comments_snippet'
+        )[offset:offset + limit]
+
+        hits = [
+            {
+                'document_id': row['id'],
+                'project_id': row['project_id'],
+                'issue_id': row['issue_id'],
+                'rank': row['rank'],
+                'title': row['title_highlight'],
+                'snippet': _pick_snippet(row['body_snippet'], row['comments_snippet']),
+            }
+            for row in rows
+        ]
+        return total, hits
+
+
+class SQLiteSearchBackend(SearchBackend):
+    """
+    FTS5 virtual table mirroring the document text, ranked with bm25.
+    """
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} '
+                f"USING fts5(title, body, comments, tokenize='porter unicode61')"
+            )
+
+    def document_saved(self, document_id):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [document_id])
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body, comments) '
+                f'SELECT id, title, body, comments FROM core_searchdocument WHERE id = %s',
+                [document_id]
+            )
+
+    def documents_deleted(self, document_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [[pk] for pk in document_ids]
+            )
+
+    def refresh_all(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {FTS_TABLE}')
+            cursor.execute(
+                f'INSERT INTO {FTS_TABLE} (rowid, title, body, comments) '
+                f'SELECT id, title, body, comments FROM core_searchdocument'
+            )
+
+    def search(self, documents, terms, offset, limit):
+        match = ' '.join(f'"{term}"' for term in terms[:-1]) + f' "{terms[-1]}"*'
+        scope_sql, scope_params = documents.values('id').query.sql_with_params()
+
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT count(*) FROM {FTS_TABLE} '
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid IN ({scope_sql})',
+                [match, *scope_params]
+            )
+            total = cursor.fetchone()[0]
+
+            cursor.execute(
+                f'SELECT d.id, d.project_id, d.issue_id, bm25({FTS_TABLE}, 10.0, 4.0, 1.0) AS rank, '
+                f"highlight({FTS_TABLE}, 0, %s, %s), "
+                f"snippet({FTS_TABLE}, 1, %s, %s, '…', 24), "
+                f"snippet({FTS_TABLE}, 2, %s, %s, '…', 24) "
+                f'FROM {FTS_TABLE} JOIN core_searchdocument d ON d.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s AND d.id IN ({scope_sql}) '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [HIGHLIGHT_START, HIGHLIGHT_STOP] * 3 + [match, *scope_params, limit, offset]
+            )
+            rows = cursor.fetchall()
+
+        hits = [
+            {
+                'document_id': document_id,
+                'project_id': project_id,
+                'issue_id': issue_id,
+                # bm25 scores are negative; flip them so higher is better
+                'rank': -rank,
+                'title': title,
+                'snippet': _pick_snippet(body, comments),
+            }
+            for document_id, project_id, issue_id, rank, title, body, comments in rows
+        ]
+        return total, hits
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+}
+
+
+def get_backend(using='default'):
+    connection = connections[using]
+    return BACKENDS.get(connection.vendor, SearchBackend)(connection)
+
+
+def install(using='default'):
+    """
+    Create the database-specific index structures (idempotent).
+    """
+    get_backend(using).install()
+
+
+def index_project(project):
+    """
+    Create, refresh or drop the search document of a project.
+    """
+    if not project.is_active:
+        remove_documents(SearchDocument.objects.filter(project_id=project.pk, issue__isnull=True))
+        return
+
+    document, _created = SearchDocument.objects.update_or_create(
+        project_id=project.pk, issue=None,
+        defaults={'title': project.name, 'body': project.description},
+    )
+    get_backend().document_saved(document.pk)
+
+
+def index_issue(issue):
+    """
+    Create, refresh or drop the search document of an issue.
+    """
+    if not issue.is_active:
+        remove_documents(SearchDocument.objects.filter(issue_id=issue.pk))
+        return
+
+    document, created = SearchDocument.objects.update_or_create(
+        issue_id=issue.pk,
+        defaults={'project_id': issue.project_id, 'title': issue.title, 'body': issue.description},
+    )
+    if created and issue.comments_count:
+        document.comments = _comments_text(issue.pk)
+        document.save(update_fields=['comments'])
+    get_backend().document_saved(document.pk)
+
+
+def append_comment(comment):
+    """
+    Add a new comment's text to its issue's document without re-reading the thread.
+    """
+    document_id = SearchDocument.objects.filter(issue_id=comment.issue_id).values_list('pk', flat=True).first()
+    if document_id is None:
+        return
+    SearchDocument.objects.filter(pk=document_id).update(
+        comments=Concat(F('comments'), Value('\n' + comment.content))
+    )
+    get_backend().document_saved(document_id)
+
+
+def reindex_comments(issue_id):
+    """
+    Rebuild the comment text of an issue's document after an edit or delete.
+    """
+    document_id = SearchDocument.objects.filter(issue_id=issue_id).values_list('pk', flat=True).first()
+    if document_id is None:
+        return
+    SearchDocument.objects.filter(pk=document_id).update(comments=_comments_text(issue_id))
+    get_backend().document_saved(document_id)
+
+
+def remove_documents(queryset):
+    document_ids = list(queryset.values_list('pk', flat=True))
+    if document_ids:
+        SearchDocument.objects.filter(pk__in=document_ids).delete()
+        get_backend().documents_deleted(document_ids)
+
+
+def _comments_text(issue_id):
+    contents = Comment.objects.filter(issue_id=issue_id).order_by('created_at', 'id').values_list('content', flat=True)
+    return '\n'.join(contents)
+
+
+def rebuild(batch_size=1000):
+    """
+    Regenerate every search document and the text index from scratch.
+
+    Returns the number of documents written.
+    """
+    install()
+    SearchDocument.objects.all().delete()
+
+    written = SearchDocument.objects.bulk_create(
+        [
+            SearchDocument(project_id=pk, title=name, body=description)
+            for pk, name, description in Project.objects.filter(is_active=True)
+            .values_list('id', 'name', 'description').iterator(chunk_size=batch_size)
+        ],
+        batch_size=batch_size,
+    )
+    total = len(written)
+
+    issues = Issue.objects.filter(is_active=True).order_by('id').values_list(
+        'id', 'project_id', 'title', 'description'
+    )
+    batch = []
+    for row in issues.iterator(chunk_size=batch_size):
+        batch.append(row)
+        if len(batch) >= batch_size:
+            total += _create_issue_documents(batch)
+            batch = []
+    if batch:
+        total += _create_issue_documents(batch)
+
+    # bulk_create stamps auto_now; rebuilt documents keep the recency of their rows
+    SearchDocument.objects.filter(issue__isnull=True).update(
+        updated_at=Subquery(Project.objects.filter(pk=OuterRef('project_id')).values('updated_at')[:1])
+    )
+    SearchDocument.objects.filter(issue__isnull=False).update(
+        updated_at=Subquery(Issue.objects.filter(pk=OuterRef('issue_id')).values('updated_at')[:1])
+    )
+
+    get_backend().refresh_all()
+    return total
+
+
+def _create_issue_documents(rows):
+    comments = {}
+    for issue_id, content in Comment.objects.filter(
+        issue_id__in=[row[0] for row in rows]
+    ).order_by('issue_id', 'created_at', 'id').values_list('issue_id', 'content'):
+        comments.setdefault(issue_id, []).append(content)
+
+    documents = [
+        SearchDocument(
+            issue_id=issue_id, project_id=project_id, title=title, body=description,
+            comments='\n'.join(comments.get(issue_id, [])),
+        )
+        for issue_id, project_id, title, description in rows
+    ]
+    return len(SearchDocument.objects.bulk_create(documents))
+
+
+def search(documents, query, offset=0, limit=20):
+    """
+    Rank ``documents`` (already scoped to what the user may see) against ``query``.
+
+    Returns ``(total, hits)``; each hit holds the document, project and issue
+    ids, a rank where higher is better, and highlighted ``title``/``snippet``.
+    """
+    terms = tokenize(query)
+    if not terms:
+        return 0, []
+    return get_backend(documents.db).search(documents, terms, offset, limit)
@@ -1,10 +1,13 @@
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
 from django.contrib.auth.models import User
 from .models import Project, Issue, Comment, Activity, Label, IssueAttachment
+from . import threads
+from .authentication import RevocableRefreshToken
+from .sparse import SparseFieldsMixin, nested_context
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField()
     avatar = serializers.SerializerMethodField()
     
@@ -12,6 +15,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ['id', 'username', 'email', 'first_name', 'last_name', 'full_name', 'avatar', 'is_active', 'date_joined']
         read_only_fields = ['id', 'date_joined', 'is_active']
+        sparse_requires = {'full_name': ['first_name', 'last_name', 'username'], 'avatar': []}
     
     def get_full_name(self, obj):
         return f"{obj.first_name} {obj.last_name}".strip() or obj.username
@@ -28,7 +32,11 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         return data
 
 
-class ProjectSerializer(serializers.ModelSerializer):
+class CustomTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = RevocableRefreshToken
+
+
+class ProjectSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     created_by = UserSerializer(read_only=True)
     members = UserSerializer(many=True, read_only=True)
     member_ids = serializers.ListField(
@@ -36,23 +44,18 @@ class ProjectSerializer(serializers.ModelSerializer):
         write_only=True,
         required=False
     )
-    issues_count = serializers.SerializerMethodField()
-    open_issues_count = serializers.SerializerMethodField()
     
     class Meta:
         model = Project
         fields = [
             'id', 'name', 'description', 'created_at', 'updated_at',
             'created_by', 'members', 'member_ids', 'issues_count', 
-            'open_issues_count', 'is_active'
+            'open_issues_count', 'members_count', 'is_active'
+        ]
+        read_only_fields = [
+            'created_at', 'updated_at', 'created_by', 'is_active',
+            'issues_count', 'open_issues_count', 'members_count'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'created_by', 'is_active']
-    
-    def get_issues_count(self, obj):
-        return obj.issues_count
-    
-    def get_open_issues_count(self, obj):
-        return obj.open_issues_count
     
     def create(self, validated_data):
         member_ids = validated_data.pop('member_ids', [])
@@ -62,6 +65,8 @@ class ProjectSerializer(serializers.ModelSerializer):
         if member_ids:
             members = User.objects.filter(id__in=member_ids)
             project.members.set(members)
+            # The member signal recounts in SQL, behind this instance's back
+            project.refresh_from_db(fields=['members_count', 'updated_at'])
         
         return project
     
@@ -72,42 +77,45 @@ class ProjectSerializer(serializers.ModelSerializer):
         if member_ids is not None:
             members = User.objects.filter(id__in=member_ids)
             instance.members.set(members)
+            instance.refresh_from_db(fields=['members_count', 'updated_at'])
         
         return instance
 
 
-class LabelSerializer(serializers.ModelSerializer):
+class LabelSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Label
         fields = ['id', 'name', 'color', 'description', 'created_at']
         read_only_fields = ['created_at']
 
 
-class CommentSerializer(serializers.ModelSerializer):
+class CommentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     author = UserSerializer(read_only=True)
     replies = serializers.SerializerMethodField()
     
     class Meta:
         model = Comment
-        fields = ['id', 'content', 'created_at', 'updated_at', 'author', 'parent', 'replies', 'is_edited']
-        read_only_fields = ['created_at', 'updated_at', 'author', 'is_edited']
+        fields = ['id', 'content', 'created_at', 'updated_at', 'author', 'parent', 'depth', 'replies', 'is_edited']
+        read_only_fields = ['created_at', 'updated_at', 'author', 'depth', 'is_edited']
+        expandable = ['replies']
+        sparse_requires = {'replies': ['parent', 'root', 'depth', 'created_at']}
     
     def get_replies(self, obj):
-        if obj.replies.exists():
-            return CommentSerializer(obj.replies.all(), many=True, context=self.context).data
-        return []
+        # Views attach whole threads up front; a lone comment loads its own subtree
+        if not hasattr(obj, 'thread_replies'):
+            threads.attach_replies([obj], threads.get_max_depth(self.context.get('request')))
+        return CommentSerializer(obj.thread_replies, many=True, context=nested_context(self.context)).data
     
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
         return super().create(validated_data)
 
 
-class IssueSerializer(serializers.ModelSerializer):
+class IssueSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     reporter = UserSerializer(read_only=True)
     assignee = UserSerializer(read_only=True)
     assignee_id = serializers.IntegerField(write_only=True, required=False, allow_null=True)
     project_name = serializers.CharField(source='project.name', read_only=True)
-    comments_count = serializers.SerializerMethodField()
     labels = LabelSerializer(many=True, read_only=True)
     label_ids = serializers.ListField(
         child=serializers.IntegerField(),
@@ -122,12 +130,13 @@ class IssueSerializer(serializers.ModelSerializer):
             'id', 'title', 'description', 'status', 'priority', 'severity',
             'created_at', 'updated_at', 'due_date', 'estimated_hours',
             'project', 'project_name', 'reporter', 'assignee', 'assignee_id',
-            'comments_count', 'labels', 'label_ids', 'is_overdue', 'is_active'
+            'comments_count', 'attachments_count', 'labels', 'label_ids', 'is_overdue', 'is_active'
         ]
-        read_only_fields = ['created_at', 'updated_at', 'reporter', 'project', 'is_active']
-    
-    def get_comments_count(self, obj):
-        return obj.comments.count()
+        read_only_fields = [
+            'created_at', 'updated_at', 'reporter', 'project', 'is_active',
+            'comments_count', 'attachments_count'
+        ]
+        sparse_requires = {'is_overdue': ['due_date', 'status']}
     
     def create(self, validated_data):
         assignee_id = validated_data.pop('assignee_id', None)
@@ -184,17 +193,59 @@ class IssueSerializer(serializers.ModelSerializer):
 
 
 class IssueDetailSerializer(IssueSerializer):
-    comments = CommentSerializer(many=True, read_only=True)
+    comments = serializers.SerializerMethodField()
     attachments = serializers.SerializerMethodField()
     
     class Meta(IssueSerializer.Meta):
         fields = IssueSerializer.Meta.fields + ['comments', 'attachments']
+        expandable = ['comments', 'attachments']
+        sparse_requires = {**IssueSerializer.Meta.sparse_requires, 'comments': ['comments'], 'attachments': ['attachments']}
+    
+    def get_comments(self, obj):
+        # Top-level comments with their replies nested, built from the prefetched list
+        max_depth = threads.get_max_depth(self.context.get('request'))
+        roots = threads.build_threads(obj.comments.all(), max_depth)
+        return CommentSerializer(roots, many=True, context=nested_context(self.context)).data
     
     def get_attachments(self, obj):
-        return IssueAttachmentSerializer(obj.attachments.all(), many=True, context=self.context).data
+        return IssueAttachmentSerializer(obj.attachments.all(), many=True, context=nested_context(self.context)).data
+
+
+class BulkIssueChangesSerializer(serializers.Serializer):
+    """
+    The whitelisted fields a bulk update may set; anything else is rejected.
+    """
+    status = serializers.ChoiceField(choices=Issue.STATUS_CHOICES, required=False)
+    priority = serializers.ChoiceField(choices=Issue.PRIORITY_CHOICES, required=False)
+    severity = serializers.ChoiceField(choices=Issue.SEVERITY_CHOICES, required=False)
+    assignee_id = serializers.IntegerField(required=False, allow_null=True)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+    estimated_hours = serializers.DecimalField(max_digits=6, decimal_places=2, required=False, allow_null=True)
+    
+    def to_internal_value(self, data):
+        unknown = set(data) - set(self.fields) if isinstance(data, dict) else set()
+        if unknown:
+            raise serializers.ValidationError(
+                {field: 'This field cannot be bulk updated.' for field in sorted(unknown)}
+            )
+        return super().to_internal_value(data)
+    
+    def validate(self, attrs):
+        if not attrs:
+            raise serializers.ValidationError('No fields to update')
+        return attrs
+
+
+class BulkIssueUpdateSerializer(serializers.Serializer):
+    issue_ids = serializers.ListField(
+        child=serializers.IntegerField(),
+        allow_empty=False,
+        max_length=50000
+    )
+    updates = BulkIssueChangesSerializer()
 
 
-class ActivitySerializer(serializers.ModelSerializer):
+class ActivitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     issue_title = serializers.CharField(source='issue.title', read_only=True)
     project_name = serializers.CharField(source='project.name', read_only=True)
@@ -204,7 +255,7 @@ class ActivitySerializer(serializers.ModelSerializer):
         fields = ['id', 'action', 'description', 'created_at', 'user', 'issue_title', 'project_name']
 
 
-class IssueAttachmentSerializer(serializers.ModelSerializer):
+class IssueAttachmentSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     uploaded_by = UserSerializer(read_only=True)
     
     class Meta:
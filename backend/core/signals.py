@@ -0,0 +1,146 @@
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete, post_migrate, m2m_changed
+from django.dispatch import receiver
+from django.contrib.auth.models import User
+
+from . import access, counters, dashboard, fuzzy, search, usercache
+from .models import Project, Issue, Comment, IssueAttachment, Activity
+
+
+@receiver(post_init, sender=Issue)
+def remember_issue_state(sender, instance, **kwargs):
+    counters.snapshot_issue(instance)
+    instance._loaded_assignee_id = instance.__dict__.get('assignee_id')
+
+
+@receiver(post_save, sender=Issue)
+def on_issue_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    dashboard.invalidate(
+        project_ids=[instance._counter_state[0], instance.project_id],
+        user_ids=[instance._loaded_assignee_id, instance.assignee_id],
+    )
+    counters.issue_saved(instance, created)
+    search.index_issue(instance)
+    instance._loaded_assignee_id = instance.assignee_id
+
+
+@receiver(post_delete, sender=Issue)
+def on_issue_deleted(sender, instance, **kwargs):
+    counters.issue_deleted(instance)
+    dashboard.invalidate(project_ids=[instance.project_id], user_ids=[instance.assignee_id])
+
+
+@receiver(post_save, sender=Comment)
+def on_comment_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.adjust_issue_counter(instance.issue_id, 'comments_count', 1)
+        search.append_comment(instance)
+    else:
+        search.reindex_comments(instance.issue_id)
+
+
+@receiver(post_delete, sender=Comment)
+def on_comment_deleted(sender, instance, **kwargs):
+    counters.adjust_issue_counter(instance.issue_id, 'comments_count', -1)
+    search.reindex_comments(instance.issue_id)
+
+
+@receiver(post_init, sender=Project)
+def remember_project_owner(sender, instance, **kwargs):
+    instance._loaded_created_by_id = instance.__dict__.get('created_by_id')
+
+
+@receiver(post_save, sender=Project)
+def on_project_saved(sender, instance, created, raw=False, **kwargs):
+    if created or instance._loaded_created_by_id != instance.created_by_id:
+        access.owner_changed(instance, None if created else instance._loaded_created_by_id)
+        instance._loaded_created_by_id = instance.created_by_id
+    if not raw:
+        search.index_project(instance)
+        fuzzy.record_change('projects', instance)
+        dashboard.invalidate(project_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Project)
+def on_project_deleted(sender, instance, **kwargs):
+    fuzzy.record_change('projects', instance, deleted=True)
+
+
+@receiver(post_save, sender=User)
+def on_user_saved(sender, instance, raw=False, **kwargs):
+    # Covers profile updates, deactivation and password changes
+    usercache.invalidate(instance.pk)
+    if not raw:
+        fuzzy.record_change('users', instance)
+
+
+@receiver(pre_delete, sender=User)
+def remember_user_projects(sender, instance, **kwargs):
+    # The cascade removes memberships without an m2m_changed signal
+    instance._member_project_ids = list(
+        Project.members.through.objects.filter(user_id=instance.pk).values_list('project_id', flat=True)
+    )
+
+
+@receiver(post_delete, sender=User)
+def on_user_deleted(sender, instance, **kwargs):
+    usercache.invalidate(instance.pk)
+    fuzzy.record_change('users', instance, deleted=True)
+    project_ids = instance.__dict__.pop('_member_project_ids', [])
+    if project_ids:
+        counters.refresh_members_count(project_ids)
+        dashboard.invalidate(project_ids=project_ids)
+
+
+@receiver(post_save, sender=Activity)
+def on_activity_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        dashboard.invalidate(project_ids=[instance.project_id])
+
+
+@receiver(post_save, sender=IssueAttachment)
+def on_attachment_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.adjust_issue_counter(instance.issue_id, 'attachments_count', 1)
+
+
+@receiver(post_delete, sender=IssueAttachment)
+def on_attachment_deleted(sender, instance, **kwargs):
+    counters.adjust_issue_counter(instance.issue_id, 'attachments_count', -1)
+
+
+@receiver(m2m_changed, sender=Project.members.through)
+def on_members_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        # A clear reports no pk_set, so remember who is about to be unlinked
+        column, other = ('user_id', 'project_id') if reverse else ('project_id', 'user_id')
+        instance._cleared_pks = set(
+            sender.objects.filter(**{column: instance.pk}).values_list(other, flat=True)
+        )
+        return
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    
+    changed = instance.__dict__.pop('_cleared_pks', set()) if action == 'post_clear' else pk_set
+    if reverse:
+        project_ids, user_ids = changed, [instance.pk]
+    else:
+        project_ids, user_ids = [instance.pk], changed
+    pairs = [(project_id, user_id) for project_id in project_ids for user_id in user_ids]
+    if action == 'post_add':
+        access.members_added(pairs)
+    else:
+        access.members_removed(pairs)
+    counters.refresh_members_count(project_ids)
+    dashboard.invalidate(user_ids=user_ids)
+
+
+@receiver(post_migrate)
+def on_post_migrate(sender, using, **kwargs):
+    if sender.name == 'core':
+        search.install(using)
+        fuzzy.install(using)
+        access.install(using)
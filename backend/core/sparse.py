@@ -0,0 +1,198 @@
+"""
+Sparse fieldsets and opt-in expansion.
+
+``?fields=id,title,status`` limits a response to the listed top-level fields.
+``?expand=reporter,comments`` picks which nested objects are rendered in
+full: once ``expand`` is given, every other nested object collapses to its
+primary key (or list of keys), and nested collections computed by a method
+(an issue's ``comments``, a comment's ``replies``) are left out. Without
+``expand`` everything is expanded, as before.
+
+Both parameters apply to the outermost serializer only, on GET and HEAD.
+SparseQuerysetMixin then trims the view's queryset to what the chosen fields
+read: unused ``select_related`` joins and prefetches are dropped, collapsed
+to-many relations prefetch only their keys, and ``only()`` defers unused
+columns. Fields that are computed rather than read from a column declare the
+lookups they need in ``Meta.sparse_requires``.
+"""
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+SAFE_METHODS = ('GET', 'HEAD')
+
+
+def _split(value):
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_params(request):
+    """
+    Return ``(fields, expand)`` from the query string; each is a set or None.
+    """
+    if request is None or request.method not in SAFE_METHODS:
+        return None, None
+    params = request.query_params
+    fields = _split(params['fields']) if 'fields' in params else None
+    expand = _split(params['expand']) if 'expand' in params else None
+    return fields, expand
+
+
+def _is_nested(field):
+    return isinstance(field, serializers.BaseSerializer)
+
+
+def nested_context(context):
+    """
+    Context for a serializer built inside another one's method field, which
+    must render in full whatever the query string asks of the outer one.
+    """
+    return {**context, 'nested': True}
+
+
+class SparseFieldsMixin:
+    """
+    Serializer mixin honouring ``?fields=`` and ``?expand=``.
+    """
+
+    def _is_outermost(self):
+        if self.context.get('nested'):
+            return False
+        parent = self.parent
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self._is_outermost():
+            return fields
+        only, expand = get_params(self.context.get('request'))
+
+        if only is not None:
+            fields = {name: field for name, field in fields.items() if name in only}
+        if expand is not None:
+            expandable_methods = getattr(self.Meta, 'expandable', ())
+            for name, field in list(fields.items()):
+                if name in expand:
+                    continue
+                if _is_nested(field):
+                    fields[name] = serializers.PrimaryKeyRelatedField(
+                        read_only=True, source=field.source, many=isinstance(field, serializers.ListSerializer)
+                    )
+                elif name in expandable_methods:
+                    del fields[name]
+        return fields
+
+
+class _Requirements:
+    """
+    The columns, joins and prefetches a set of serializer fields reads.
+    """
+
+    def __init__(self):
+        self.columns = set()
+        self.select = {}
+        self.prefetch = {}
+        # False once a field reads something we cannot account for
+        self.complete = True
+
+    def add(self, model, attrs, nested):
+        """
+        Record what rendering ``attrs`` (a source path) off ``model`` reads.
+        """
+        try:
+            model_field = model._meta.get_field(attrs[0])
+        except FieldDoesNotExist:
+            if hasattr(model, attrs[0]):
+                # A property or method of unknown cost
+                self.complete = False
+            return
+
+        if not model_field.is_relation:
+            self.columns.add(attrs[0])
+        elif model_field.many_to_one or (model_field.one_to_one and model_field.concrete):
+            self.columns.add(attrs[0])
+            if nested:
+                # The whole related row; None means no column restriction
+                self.select[attrs[0]] = None
+            elif len(attrs) > 1 and self.select.get(attrs[0], set()) is not None:
+                self.select.setdefault(attrs[0], set()).add(attrs[1])
+        else:
+            # A to-many relation: full rows when nested, keys only otherwise
+            self.prefetch[attrs[0]] = self.prefetch.get(attrs[0], False) or nested or len(attrs) > 1
+
+
+def requirements(serializer):
+    """
+    Work out what rendering ``serializer``'s current fields reads from its model.
+    """
+    model = serializer.Meta.model
+    declared = getattr(serializer.Meta, 'sparse_requires', {})
+    needs = _Requirements()
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in declared:
+            for lookup in declared[name]:
+                needs.add(model, lookup.split('__'), nested=True)
+        elif field.source == '*':
+            needs.complete = False
+        else:
+            needs.add(model, field.source_attrs, nested=_is_nested(field))
+    return needs
+
+
+def _ordering_columns(queryset):
+    ordering = queryset.query.order_by or queryset.model._meta.ordering
+    return {name.lstrip('-').split('__')[0] for name in ordering if isinstance(name, str)}
+
+
+def trim_queryset(queryset, serializer):
+    """
+    Drop the joins, prefetches and columns ``serializer`` will not render.
+    """
+    fields, expand = get_params(serializer.context.get('request'))
+    if fields is None and expand is None:
+        return queryset
+
+    needs = requirements(serializer)
+
+    columns = needs.columns | _ordering_columns(queryset)
+    select = queryset.query.select_related
+    if isinstance(select, dict):
+        kept = [name for name in select if name in needs.select]
+        queryset = queryset.select_related(None)
+        if kept:
+            queryset = queryset.select_related(*kept)
+        for name in kept:
+            if needs.select[name] is not None:
+                columns.update(f'{name}__{column}' for column in needs.select[name])
+
+    prefetches = []
+    for lookup in queryset._prefetch_related_lookups:
+        path = lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+        relation = path.split('__')[0]
+        if needs.prefetch.get(relation):
+            prefetches.append(lookup)
+    for relation, nested in needs.prefetch.items():
+        if not nested:
+            related_model = queryset.model._meta.get_field(relation).related_model
+            prefetches.append(Prefetch(relation, queryset=related_model.objects.only('pk')))
+    queryset = queryset.prefetch_related(None).prefetch_related(*prefetches)
+
+    if needs.complete:
+        queryset = queryset.only(*columns)
+    return queryset
+
+
+class SparseQuerysetMixin:
+    """
+    View mixin applying ``trim_queryset`` after the filter backends.
+    """
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        return trim_queryset(queryset, self.get_serializer())
@@ -0,0 +1,1167 @@
+import gzip
+import io
+import json
+import os
+import tempfile
+import uuid
+import time
+from datetime import date, datetime, time as day_time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Prefetch
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core import access, analytics, apikeys, archive, backup, benchmark, counters, dashboard, datagen, export, fuzzy, querystats, restore, revocation, usercache
+from core.authentication import RevocableRefreshToken
+from core.fastpath import ActivityRows, IssueRows, ProjectRows
+from core.models import APIKey, Activity, ArchivedIssue, Comment, Issue, IssueLabel, Label, Project, ProjectAccessEntry, RevokedToken
+from core.renderers import ORJSONRenderer
+from core.serializers import ActivitySerializer, IssueSerializer, ProjectSerializer
+
+
+class RestoreArchivedIssuesTests(TestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user('owner', password='password')
+        self.other = User.objects.create_user('other', password='password')
+        self.label = Label.objects.create(name='bug')
+        self.project = Project.objects.create(name='Project', created_by=self.owner)
+        self.project.members.add(self.other)
+
+    def archive(self, issue):
+        list(archive.archive_issues(Issue.objects.filter(pk=issue.pk), timezone.now()))
+        self.assertFalse(Issue.objects.filter(pk=issue.pk).exists())
+
+    def test_restore_after_user_and_label_deleted(self):
+        issue = Issue.objects.create(
+            title='Crash', description='Crashes', project=self.project, reporter=self.owner, assignee=self.other
+        )
+        issue.watchers.add(self.owner, self.other)
+        IssueLabel.objects.create(issue=issue, label=self.label, added_by=self.owner)
+        kept = Comment.objects.create(issue=issue, author=self.owner, content='Kept')
+        thread = Comment.objects.create(issue=issue, author=self.other, content='Dropped')
+        Comment.objects.create(issue=issue, author=self.owner, parent=thread, content='Reply to dropped')
+        self.archive(issue)
+
+        self.other.delete()
+        self.label.delete()
+        restored, skipped, dropped = archive.restore_issues([issue.pk])
+
+        self.assertEqual((restored, skipped), (1, []))
+        self.assertEqual(dropped['core.comment'], 2)
+        self.assertEqual(dropped['core.issuelabel'], 1)
+        issue = Issue.objects.get(pk=issue.pk)
+        self.assertIsNone(issue.assignee_id)
+        self.assertEqual(list(issue.watchers.all()), [self.owner])
+        self.assertFalse(issue.issue_labels.exists())
+        self.assertEqual(list(issue.comments.values_list('pk', flat=True)), [kept.pk])
+        self.assertEqual(issue.comments_count, 1)
+        self.assertEqual(list(counters.find_mismatches([self.project.pk])), [])
+        self.assertFalse(ArchivedIssue.objects.filter(pk=issue.pk).exists())
+
+    def test_issue_of_deleted_reporter_stays_archived(self):
+        issue = Issue.objects.create(title='Crash', description='Crashes', project=self.project, reporter=self.other)
+        self.archive(issue)
+
+        self.other.delete()
+        restored, skipped, _dropped = archive.restore_issues([issue.pk])
+
+        self.assertEqual((restored, skipped), (0, [issue.pk]))
+        self.assertFalse(Issue.objects.filter(pk=issue.pk).exists())
+        self.assertTrue(ArchivedIssue.objects.filter(pk=issue.pk).exists())
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class FuzzyLookupTests(TestCase):
+    def setUp(self):
+        # The in-process index outlives the test transactions it was built in
+        fuzzy._in_process.indexes.clear()
+        self.user = User.objects.create_user('owner', password='password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unseen_trigram_with_scope(self):
+        index = fuzzy.TrigramIndex([(1, 'apollo'), (2, 'gemini')])
+
+        self.assertEqual([pk for pk, _score in index.search('apolo', 5, within=frozenset({1}))], [1])
+        self.assertEqual(index.search('zzzz', 5, within=frozenset({1, 2})), [])
+
+    def test_index_follows_committed_writes_only(self):
+        project = Project.objects.create(name='Apollo', created_by=self.user)
+        self.assertEqual([pk for pk, _score in fuzzy.lookup('projects', 'apollo')], [project.pk])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                project.name = 'Gemini'
+                project.save()
+                transaction.set_rollback(True)
+        self.assertEqual([pk for pk, _score in fuzzy.lookup('projects', 'apollo')], [project.pk])
+
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            project.name = 'Gemini'
+            project.save()
+            # Nothing is applied before the commit
+            self.assertEqual([pk for pk, _score in fuzzy.lookup('projects', 'gemini')], [])
+        self.assertTrue(callbacks)
+        self.assertEqual([pk for pk, _score in fuzzy.lookup('projects', 'gemini')], [project.pk])
+        self.assertEqual(fuzzy.lookup('projects', 'apollo'), [])
+
+    def test_project_lookup_with_typo(self):
+        project = Project.objects.create(name='Apollo', created_by=self.user)
+        other = User.objects.create_user('other', password='password')
+        Project.objects.create(name='Apollo', created_by=other)
+
+        response = self.client.get('/api/projects/lookup/', {'q': 'apolo'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([result['id'] for result in response.json()['results']], [project.pk])
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        self.issue = Issue.objects.create(title='Crash', description='Crashes', project=self.project, reporter=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertRevalidates(self, path, change):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        change()
+
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        since = http_date(time.time() + 60)
+        self.assertEqual(self.client.get(path, HTTP_IF_MODIFIED_SINCE=since).status_code, 200)
+
+    def test_issue_list_after_soft_delete(self):
+        other = Issue.objects.create(title='Other', description='Other', project=self.project, reporter=self.user)
+
+        def soft_delete():
+            other.is_active = False
+            other.save()
+
+        self.assertRevalidates(f'/api/projects/{self.project.pk}/issues/', soft_delete)
+
+    def test_issue_detail_after_comment_delete(self):
+        comment = Comment.objects.create(issue=self.issue, author=self.user, content='Comment')
+
+        self.assertRevalidates(f'/api/issues/{self.issue.pk}/', comment.delete)
+
+
+class CleanupOldDataTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        self.issue = Issue.objects.create(
+            title='Crash', description='Crashes', project=self.project, reporter=self.user, status='closed'
+        )
+        long_ago = timezone.now() - timedelta(days=800)
+        Project.objects.filter(pk=self.project.pk).update(updated_at=long_ago)
+        Issue.objects.filter(pk=self.issue.pk).update(updated_at=long_ago)
+        Activity.objects.create(
+            action='created', description='Created', user=self.user, issue=self.issue, project=self.project
+        )
+        Activity.objects.update(created_at=long_ago)
+
+    def cleanup(self, **options):
+        call_command('cleanup_old_data', pause=0, stdout=io.StringIO(), **options)
+
+    def test_idle_projects_stay_active_by_default(self):
+        self.cleanup()
+
+        self.assertFalse(Activity.objects.exists())
+        self.assertFalse(Issue.objects.get(pk=self.issue.pk).is_active)
+        self.project.refresh_from_db()
+        self.assertTrue(self.project.is_active)
+        self.assertEqual(self.project.issues_count, 0)
+
+    def test_idle_projects_deactivated_on_request(self):
+        self.cleanup(deactivate_idle_projects=True)
+
+        self.project.refresh_from_db()
+        self.assertFalse(self.project.is_active)
+
+
+class FastPathParityTests(TestCase):
+    """
+    The fast list path rendered with orjson must match the serializers
+    rendered with DRF's JSONRenderer byte for byte.
+    """
+
+    def setUp(self):
+        self.owner = User.objects.create_user(
+            'owner', email='owner@example.com', password='password', first_name='Zoë', last_name='Ångström'
+        )
+        self.member = User.objects.create_user('member', password='password')
+        self.project = Project.objects.create(
+            name='Projekt ü', description='Line\u2028separator, paragraph\u2029separator, emoji 🐛', created_by=self.owner
+        )
+        self.project.members.add(self.member, self.owner)
+        Project.objects.create(name='Empty', created_by=self.member)
+
+        due = timezone.now() + timedelta(days=3, microseconds=123456)
+        Issue.objects.create(
+            title='日本語のタイトル', description='Text\u2028with separators\u2029', project=self.project,
+            reporter=self.owner, assignee=self.member, due_date=due, estimated_hours=Decimal('3.5'),
+        )
+        Issue.objects.create(
+            title='Unassigned', description='', project=self.project, reporter=self.member,
+            due_date=timezone.now() - timedelta(days=1), estimated_hours=Decimal('1234.56'), status='closed',
+        )
+        Issue.objects.create(title='No due date', description='Plain', project=self.project, reporter=self.owner)
+        issue = Issue.objects.first()
+        Activity.objects.create(
+            action='created', description='Créé \u2028 “quoted”', user=self.owner, issue=issue, project=self.project
+        )
+
+    def assertParity(self, rows, serializer_class, queryset):
+        queryset = queryset.order_by('pk')
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        actual = ORJSONRenderer().render(rows.to_representation(rows.project(queryset)))
+        self.assertEqual(actual, expected)
+
+    def assertParityAcrossTimeZones(self, rows, serializer_class, queryset):
+        for zone in ('UTC', 'Asia/Kolkata', 'America/St_Johns'):
+            with self.subTest(zone=zone), timezone.override(zone):
+                self.assertParity(rows, serializer_class, queryset)
+
+    def test_issues(self):
+        self.assertParityAcrossTimeZones(
+            IssueRows(), IssueSerializer, Issue.objects.select_related('project', 'reporter', 'assignee')
+        )
+
+    def test_projects(self):
+        self.assertParityAcrossTimeZones(
+            ProjectRows(), ProjectSerializer,
+            Project.objects.select_related('created_by').prefetch_related(
+                Prefetch('members', queryset=User.objects.order_by('id'))
+            ),
+        )
+
+    def test_activities(self):
+        self.assertParityAcrossTimeZones(
+            ActivityRows(), ActivitySerializer, Activity.objects.select_related('user', 'issue', 'project')
+        )
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class UserCacheTests(TestCase):
+    def setUp(self):
+        usercache.local.clear()
+        self.user = User.objects.create_user('owner', password='password')
+        token = RevocableRefreshToken.for_user(self.user).access_token
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+
+    def test_password_hash_not_cached(self):
+        user = usercache.get_user(self.user.pk)
+
+        cached = cache.get(usercache.cache_key(self.user.pk, usercache._current_version(self.user.pk)))
+        self.assertNotIn(self.user.password, cached)
+        self.assertTrue(user.check_password('password'))
+
+    def test_profile_update_keeps_changes_made_elsewhere(self):
+        self.assertEqual(self.client.get('/api/auth/profile/').status_code, 200)
+        # Another process changes the row; this one still holds the cached user
+        User.objects.filter(pk=self.user.pk).update(password=make_password('changed'), email='new@example.com')
+
+        response = self.client.put('/api/auth/profile/update/', {'first_name': 'Zoë'}, format='json')
+
+        self.assertEqual(response.status_code, 200)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(user.first_name, 'Zoë')
+        self.assertEqual(user.email, 'new@example.com')
+        self.assertTrue(user.check_password('changed'))
+
+
+class MembersCountTests(TestCase):
+    def test_deleting_a_member_updates_members_count(self):
+        owner = User.objects.create_user('owner', password='password')
+        member = User.objects.create_user('member', password='password')
+        project = Project.objects.create(name='Project', created_by=owner)
+        project.members.add(owner, member)
+
+        member.delete()
+
+        project.refresh_from_db()
+        self.assertEqual(project.members_count, 1)
+        self.assertEqual(list(counters.find_mismatches([project.pk])), [])
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        start = timezone.now()
+        for number in range(45):
+            # Repeated due dates and NULLs exercise the tie-breaker and NULL ordering
+            due_date = None if number % 4 == 0 else start + timedelta(days=number % 5)
+            Issue.objects.create(
+                title=f'Issue {number}', description='', project=self.project, reporter=self.user, due_date=due_date
+            )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.path = f'/api/projects/{self.project.pk}/issues/'
+
+    def walk(self, url, direction):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([issue['id'] for issue in response.json()['results']])
+            url = response.json()[direction]
+        return pages
+
+    def test_cursor_walk_matches_ordering(self):
+        issues = Issue.objects.filter(project=self.project)
+        expected = [
+            *issues.filter(due_date__isnull=False).order_by('due_date', 'pk').values_list('pk', flat=True),
+            *issues.filter(due_date__isnull=True).order_by('pk').values_list('pk', flat=True),
+        ]
+
+        forward = self.walk(f'{self.path}?ordering=due_date&cursor=', 'next')
+        self.assertEqual([len(page) for page in forward], [20, 20, 5])
+        self.assertEqual([pk for page in forward for pk in page], expected)
+
+        response = self.client.get(f'{self.path}?ordering=due_date&cursor=')
+        last = self.client.get(self.client.get(response.json()['next']).json()['next'])
+        backward = self.walk(last.json()['previous'], 'previous')
+        self.assertEqual(backward, forward[1::-1])
+
+    def test_count_can_be_skipped(self):
+        response = self.client.get(f'{self.path}?cursor=&count=false')
+
+        self.assertNotIn('count', response.json())
+        self.assertEqual(self.client.get(f'{self.path}?cursor=').json()['count'], 45)
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(f'{self.path}?cursor=not-a-cursor').status_code, 404)
+
+    def test_cursor_from_another_ordering_is_rejected(self):
+        next_link = self.client.get(f'{self.path}?ordering=due_date&cursor=').json()['next']
+        cursor = next_link.split('cursor=')[1].split('&')[0]
+
+        self.assertEqual(self.client.get(f'{self.path}?ordering=-created_at&cursor={cursor}').status_code, 404)
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class CommentThreadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        project = Project.objects.create(name='Project', created_by=self.user)
+        self.issue = Issue.objects.create(title='Crash', description='', project=project, reporter=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.path = f'/api/issues/{self.issue.pk}/comments/'
+
+    def comment(self, content, parent=None):
+        return Comment.objects.create(issue=self.issue, author=self.user, content=content, parent=parent)
+
+    def shape(self, comments):
+        return [(comment['content'], self.shape(comment['replies'])) for comment in comments]
+
+    def test_threads_nest_in_order(self):
+        first = self.comment('first')
+        reply = self.comment('reply', first)
+        self.comment('nested', reply)
+        self.comment('second reply', first)
+        self.comment('second')
+
+        response = self.client.get(self.path)
+
+        self.assertEqual(self.shape(response.json()['results']), [
+            ('first', [('reply', [('nested', [])]), ('second reply', [])]),
+            ('second', []),
+        ])
+        self.assertEqual(
+            self.shape(self.client.get(self.path, {'max_depth': 1}).json()['results']),
+            [('first', [('reply', []), ('second reply', [])]), ('second', [])],
+        )
+
+    def test_query_count_does_not_grow_with_depth(self):
+        parent = self.comment('top')
+
+        def queries():
+            with CaptureQueriesContext(connection) as context:
+                self.assertEqual(self.client.get(self.path).status_code, 200)
+            return len(context)
+
+        shallow = queries()
+        for depth in range(6):
+            parent = self.comment(f'depth {depth}', parent)
+        self.assertEqual(queries(), shallow)
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class GlobalSearchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Payments', created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, query):
+        response = self.client.get('/api/search/', {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [(result['type'], result['id']) for result in response.json()['results']]
+
+    def issue(self, title, description=''):
+        return Issue.objects.create(title=title, description=description, project=self.project, reporter=self.user)
+
+    def test_title_match_outranks_comment_match(self):
+        in_comment = self.issue('Checkout broken')
+        Comment.objects.create(issue=in_comment, author=self.user, content='The refund flow fails too')
+        in_title = self.issue('Refund fails for cards')
+
+        self.assertEqual(self.search('refund'), [('issue', in_title.pk), ('issue', in_comment.pk)])
+
+    def test_prefix_and_stemming(self):
+        issue = self.issue('Timeouts while uploading')
+
+        self.assertEqual(self.search('upload'), [('issue', issue.pk)])
+        self.assertEqual(self.search('timeo'), [('issue', issue.pk)])
+
+    def test_edits_and_deletes_reach_the_index(self):
+        issue = self.issue('Flaky export')
+        issue.title = 'Flaky import'
+        issue.save()
+        self.assertEqual(self.search('export'), [])
+        self.assertEqual(self.search('import'), [('issue', issue.pk)])
+
+        issue.is_active = False
+        issue.save()
+        self.assertEqual(self.search('import'), [])
+
+    def test_only_accessible_projects(self):
+        other = User.objects.create_user('other', password='password')
+        hidden = Project.objects.create(name='Secret payments', created_by=other)
+        Issue.objects.create(title='Payments outage', description='', project=hidden, reporter=other)
+
+        self.assertEqual(self.search('payments'), [('project', self.project.pk)])
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class DashboardCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stats(self):
+        response = self.client.get('/api/dashboard/stats/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_served_from_cache_until_invalidated(self):
+        self.assertFalse(self.stats()['freshness']['cached'])
+        self.assertTrue(self.stats()['freshness']['cached'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.create(title='Crash', description='', project=self.project, reporter=self.user)
+
+        stats = self.stats()
+        self.assertFalse(stats['freshness']['cached'])
+        self.assertEqual(stats['total_issues'], 1)
+
+    def test_entry_computed_before_a_commit_is_never_served(self):
+        stale, _ttl = dashboard.compute_stats(self.user)
+        version = dashboard._current_version(self.user.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.create(title='Crash', description='', project=self.project, reporter=self.user)
+        # A reader that computed before the commit stores its result after it
+        cache.set(dashboard.cache_key(self.user.pk, version), {'data': stale, 'generated_at': 0}, 300)
+
+        self.assertEqual(dashboard.get_stats(self.user)[0]['total_issues'], 1)
+
+    def test_other_users_entries_survive(self):
+        other = User.objects.create_user('other', password='password')
+        dashboard.get_stats(other)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Issue.objects.create(title='Crash', description='', project=self.project, reporter=self.user)
+
+        self.assertTrue(dashboard.get_stats(other)[2])
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class ProjectAnalyticsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        self.day = date(2024, 3, 10)
+
+    def at(self, day, hour=12):
+        return timezone.make_aware(datetime.combine(day, day_time(hour)))
+
+    def issue(self, created_at, closed_at=None, **kwargs):
+        issue = Issue.objects.create(
+            title='Issue', description='', project=self.project, reporter=self.user,
+            created_at=created_at, **kwargs
+        )
+        if closed_at is not None:
+            Issue.objects.filter(pk=issue.pk).update(status='closed', closed_at=closed_at)
+        return issue
+
+    def test_rollup_counts_opened_closed_and_open_at_end_of_day(self):
+        before, after = self.day - timedelta(days=1), self.day + timedelta(days=1)
+        self.issue(self.at(before), priority='high')
+        self.issue(self.at(self.day), closed_at=self.at(self.day, 18))
+        self.issue(self.at(before), closed_at=self.at(self.day))
+        # Closed later, so still open at the end of the day
+        self.issue(self.at(self.day), closed_at=self.at(after), priority='high')
+        self.issue(self.at(after))
+
+        list(analytics.rollup(before, self.day))
+        rows = {row['date']: row for row in analytics.trends(self.project, before, after)}
+
+        self.assertEqual(sorted(rows), [before, self.day])
+        row = rows[self.day]
+        self.assertEqual((row['opened'], row['closed'], row['open_total']), (2, 2, 2))
+        self.assertEqual(row['by_status'], {'open': 2})
+        self.assertEqual(row['by_priority'], {'high': 2})
+        self.assertEqual((rows[before]['opened'], rows[before]['open_total']), (2, 2))
+
+    def test_rollup_replaces_existing_rows(self):
+        self.issue(self.at(self.day))
+        analytics.rollup_day(self.day)
+        self.issue(self.at(self.day))
+        analytics.rollup_day(self.day)
+
+        [row] = analytics.trends(self.project, self.day, self.day)
+        self.assertEqual(row['opened'], 2)
+
+    def test_pending_days_resume_after_last_rollup(self):
+        self.issue(self.at(self.day))
+        until = self.day + timedelta(days=5)
+        self.assertEqual(analytics.pending_days(until), (self.day, until))
+
+        analytics.rollup_day(self.day)
+        self.assertEqual(analytics.pending_days(until), (self.day + timedelta(days=1), until))
+
+    def test_summary_and_contributors(self):
+        other = User.objects.create_user('other', password='password')
+        self.issue(self.at(self.day), assignee=other, priority='high')
+        self.issue(self.at(self.day), assignee=self.user, closed_at=self.at(self.day))
+
+        summary = analytics.project_summary(self.project)
+        self.assertEqual(summary['total_issues'], 2)
+        self.assertEqual(summary['status_distribution']['closed'], 1)
+        self.assertEqual(summary['priority_distribution']['high'], 1)
+        self.assertEqual(analytics.top_contributors(self.project), [(self.user.pk, 3), (other.pk, 1)])
+
+    def test_endpoint_reads_trends_from_rollup(self):
+        self.issue(self.at(self.day))
+        analytics.rollup_day(self.day)
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        response = client.get(
+            f'/api/projects/{self.project.pk}/analytics/', {'start': '2024-03-01', 'end': '2024-03-31'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['opened'] for row in response.json()['trends']], [1])
+        self.assertEqual(client.get(f'/api/projects/{self.project.pk}/analytics/', {'end': 'soon'}).status_code, 400)
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class BulkUpdateTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        self.issues = [
+            Issue.objects.create(title=f'Issue {n}', description='', project=self.project, reporter=self.user)
+            for n in range(3)
+        ]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post(self, issue_ids, updates):
+        return self.client.post(
+            '/api/issues/bulk-update/', {'issue_ids': issue_ids, 'updates': updates}, format='json'
+        )
+
+    def test_closing_applies_per_row_side_effects(self):
+        ids = [issue.pk for issue in self.issues[:2]]
+        response = self.post(ids, {'status': 'closed'})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertCountEqual(response.json()['issue_ids'], ids)
+        self.assertFalse(Issue.objects.filter(pk__in=ids, closed_at__isnull=True).exists())
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.open_issues_count, 1)
+        self.assertEqual(
+            Activity.objects.filter(issue_id__in=ids, action='status_changed').count(), 2
+        )
+
+    def test_skips_issues_the_user_cannot_edit(self):
+        other = User.objects.create_user('other', password='password')
+        hidden = Project.objects.create(name='Hidden', created_by=other)
+        foreign = Issue.objects.create(title='Foreign', description='', project=hidden, reporter=other)
+
+        response = self.post([self.issues[0].pk, foreign.pk, 0], {'priority': 'critical'})
+
+        self.assertEqual(response.json()['skipped_ids'], [foreign.pk, 0])
+        foreign.refresh_from_db()
+        self.assertEqual(foreign.priority, 'medium')
+
+    def test_unchanged_rows_record_no_activity(self):
+        self.post([self.issues[0].pk], {'priority': 'medium'})
+        self.assertFalse(Activity.objects.filter(action='priority_changed').exists())
+
+    def test_rejects_fields_outside_the_whitelist(self):
+        response = self.post([self.issues[0].pk], {'title': 'Renamed'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.post([self.issues[0].pk], {'assignee_id': 0}).status_code, 400)
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class SparseFieldsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        Issue.objects.create(
+            title='Crash', description='', project=self.project, reporter=self.user, assignee=self.user
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.path = f'/api/projects/{self.project.pk}/issues/'
+
+    def first(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.path, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results'][0], [query['sql'] for query in queries]
+
+    def test_fields_limits_keys_and_columns(self):
+        full, _queries = self.first({})
+        issue, queries = self.first({'fields': 'id,title,is_overdue'})
+
+        self.assertEqual(set(issue), {'id', 'title', 'is_overdue'})
+        self.assertEqual(issue['is_overdue'], full['is_overdue'])
+        issue_query = next(sql for sql in queries if 'FROM "core_issue"' in sql and '"title"' in sql)
+        self.assertNotIn('"description"', issue_query)
+        self.assertNotIn('auth_user', issue_query)
+
+    def test_expand_collapses_other_nested_objects(self):
+        issue, queries = self.first({'expand': 'reporter'})
+
+        self.assertEqual(issue['reporter']['id'], self.user.pk)
+        self.assertEqual(issue['assignee'], self.user.pk)
+        issue_query = next(sql for sql in queries if 'FROM "core_issue"' in sql and '"title"' in sql)
+        self.assertEqual(issue_query.count('JOIN "auth_user"'), 1)
+
+    def test_writes_ignore_sparse_params(self):
+        response = self.client.post(
+            f'{self.path}?fields=id', {'title': 'New issue', 'description': 'Details'}, format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('reporter', response.json())
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class ProjectExportTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        self.issues = [
+            Issue.objects.create(title=f'Issue {n}', description='', project=self.project, reporter=self.user)
+            for n in range(3)
+        ]
+        self.comment = Comment.objects.create(issue=self.issues[0], author=self.user, content='First')
+        Comment.objects.create(issue=self.issues[0], author=self.user, content='Reply', parent=self.comment)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.path = f'/api/projects/{self.project.pk}/export/'
+
+    def lines(self, response):
+        body = b''.join(response.streaming_content)
+        if response.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return [json.loads(line) for line in body.splitlines()]
+
+    def test_streams_every_type_in_list_shape(self):
+        response = self.client.get(self.path)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = self.lines(response)
+
+        self.assertEqual([line['type'] for line in lines], ['issue'] * 3 + ['comment'] * 2)
+        listed = self.client.get(f'/api/projects/{self.project.pk}/issues/').json()['results']
+        self.assertEqual(lines[0]['data'], next(issue for issue in listed if issue['id'] == self.issues[0].pk))
+        self.assertEqual(lines[4]['data']['parent'], self.comment.pk)
+
+    def test_chunks_do_not_change_output(self):
+        issues = Issue.objects.filter(project=self.project)
+        self.assertEqual(
+            b''.join(export.project_export(issues, chunk_size=1)),
+            b''.join(export.project_export(issues)),
+        )
+
+    def test_gzip_types_and_updated_since(self):
+        since = timezone.now()
+        Issue.objects.filter(pk=self.issues[1].pk).update(updated_at=since + timedelta(seconds=1))
+
+        response = self.client.get(
+            self.path, {'types': 'issues', 'updated_since': since.isoformat()}, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual([line['data']['id'] for line in self.lines(response)], [self.issues[1].pk])
+
+    def test_rejects_bad_params_and_non_members(self):
+        self.assertEqual(self.client.get(self.path, {'types': 'labels'}).status_code, 400)
+        self.assertEqual(self.client.get(self.path, {'updated_since': 'yesterday'}).status_code, 400)
+
+        self.client.force_authenticate(User.objects.create_user('other', password='password'))
+        self.assertEqual(self.client.get(self.path).status_code, 403)
+
+
+class BackupTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        self.issues = [
+            Issue.objects.create(title=f'Issue {n}', description='', project=self.project, reporter=self.user)
+            for n in range(3)
+        ]
+        Comment.objects.create(issue=self.issues[0], author=self.user, content='First')
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def create(self, **kwargs):
+        return backup.create_backup(self.tmp.name, compression='gzip', chunk_size=2, log=lambda message: None, **kwargs)
+
+    def test_manifest_counts_and_checksums(self):
+        directory = self.create()
+
+        self.assertEqual(os.listdir(self.tmp.name), [os.path.basename(directory)])
+        manifest = backup.load_manifest(directory)
+        self.assertEqual((manifest['kind'], manifest['compression']), ('full', 'gzip'))
+        entries = {entry['model']: entry for entry in manifest['tables']}
+        self.assertEqual(entries['core.issue']['rows'], 3)
+        self.assertEqual(entries['core.comment']['rows'], 1)
+        self.assertEqual(backup.verify(directory), [])
+
+        rows = list(backup.read_rows(directory, entries['core.issue'], 'gzip'))
+        self.assertEqual([row['title'] for row in rows], ['Issue 0', 'Issue 1', 'Issue 2'])
+
+    def test_verify_reports_corrupt_files(self):
+        directory = self.create()
+        entry = next(t for t in backup.load_manifest(directory)['tables'] if t['model'] == 'core.issue')
+        with open(os.path.join(directory, entry['file']), 'ab') as f:
+            f.write(b'garbage')
+
+        self.assertEqual(backup.verify(directory), [f'{entry["file"]}: checksum mismatch'])
+
+    def test_incremental_holds_changes_and_tombstones(self):
+        self.create()
+        Issue.objects.filter(pk=self.issues[1].pk).update(is_active=False)
+        deleted_pk = self.issues[2].pk
+        self.issues[2].delete()
+        added = Issue.objects.create(title='Issue 3', description='', project=self.project, reporter=self.user)
+
+        directory = self.create(incremental=True)
+
+        manifest = backup.load_manifest(directory)
+        self.assertEqual(manifest['kind'], 'incremental')
+        entry = next(t for t in manifest['tables'] if t['model'] == 'core.issue')
+        self.assertEqual(entry['mode'], 'changes')
+        self.assertIn(added.pk, [row['id'] for row in backup.read_rows(directory, entry, 'gzip')])
+        self.assertEqual(
+            sorted((row['id'], row['change']) for row in backup.read_rows(directory, entry['tombstones'], 'gzip')),
+            [(self.issues[1].pk, 'deactivated'), (deleted_pk, 'deleted')],
+        )
+        self.assertEqual(backup.verify(directory), [])
+        self.assertEqual([path for path, _manifest in backup.backup_chain(directory)][-1], directory)
+
+    def test_incremental_needs_a_parent(self):
+        with self.assertRaises(ValueError):
+            self.create(incremental=True)
+
+    def snapshot(self):
+        return {
+            'issues': list(Issue.objects.order_by('pk').values()),
+            'comments': list(Comment.objects.order_by('pk').values()),
+            'projects': list(Project.objects.order_by('pk').values()),
+        }
+
+    def test_restore_replays_chain(self):
+        self.create()
+        self.issues[1].is_active = False
+        self.issues[1].save()
+        self.issues[2].delete()
+        Issue.objects.create(title='Issue 3', description='', project=self.project, reporter=self.user)
+        Comment.objects.create(issue=self.issues[0], author=self.user, content='Second')
+        directory = self.create(incremental=True)
+        expected = self.snapshot()
+
+        Issue.objects.all().delete()
+        Project.objects.create(name='Created after the backup', created_by=self.user)
+        restore.restore(directory, chunk_size=2, log=lambda message: None)
+
+        self.assertEqual(self.snapshot(), expected)
+        # Sequences continue after the restored rows
+        self.assertGreater(
+            Issue.objects.create(title='Next', description='', project=self.project, reporter=self.user).pk,
+            max(row['id'] for row in expected['issues']),
+        )
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class TokenRevocationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        revocation.local = revocation.LocalFilter()
+        self.user = User.objects.create_user('owner', password='password')
+        self.client = APIClient()
+
+    def refresh(self, token):
+        return self.client.post('/api/auth/refresh/', {'refresh': str(token)}, format='json')
+
+    def test_logout_revokes_refresh_token(self):
+        token = RevocableRefreshToken.for_user(self.user)
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/auth/logout/', {'refresh': str(token)}, format='json')
+
+        self.assertEqual(self.refresh(token).status_code, 401)
+
+    def test_rotation_revokes_the_old_token(self):
+        token = RevocableRefreshToken.for_user(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.refresh(token)
+        self.assertEqual(response.status_code, 200)
+
+        self.assertEqual(self.refresh(token).status_code, 401)
+        self.assertEqual(self.refresh(response.json()['refresh']).status_code, 200)
+
+    def test_other_processes_see_revocations(self):
+        other = revocation.LocalFilter()
+        first, second = uuid.uuid4(), uuid.uuid4()
+        self.assertFalse(other.might_contain(first.bytes))
+
+        expires_at = timezone.now() + timedelta(days=1)
+        with self.captureOnCommitCallbacks(execute=True):
+            revocation.revoke(first, expires_at)
+        self.assertTrue(other.might_contain(first.bytes))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            revocation.revoke(second, expires_at)
+        # An evicted entry makes the filter rebuild from the table
+        cache.delete(revocation.entry_key(revocation._current_generation()))
+        with self.captureOnCommitCallbacks(execute=True):
+            revocation.revoke(uuid.uuid4(), expires_at)
+        self.assertTrue(other.might_contain(second.bytes))
+
+    def test_purge_expired_keeps_live_revocations(self):
+        now = timezone.now()
+        live = RevokedToken.objects.create(jti=uuid.uuid4(), expires_at=now + timedelta(hours=1))
+        for _ in range(3):
+            RevokedToken.objects.create(jti=uuid.uuid4(), expires_at=now - timedelta(hours=1))
+
+        self.assertEqual(list(revocation.purge_expired(now, batch_size=2)), [2, 1])
+        self.assertEqual(list(RevokedToken.objects.values_list('jti', flat=True)), [live.jti])
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class APIKeyTests(TestCase):
+    def setUp(self):
+        apikeys.verified.entries.clear()
+        apikeys.usage.counts.clear()
+        self.user = User.objects.create_user('owner', password='password')
+        self.client = APIClient()
+
+    def get(self, raw_key):
+        return self.client.get('/api/auth/profile/', HTTP_X_API_KEY=raw_key)
+
+    def test_authenticates_with_scopes(self):
+        api_key, raw_key = apikeys.generate('CI', self.user)
+
+        self.assertEqual(self.get(raw_key).json()['id'], self.user.pk)
+        self.assertNotIn(raw_key, str(list(APIKey.objects.values())))
+        response = self.client.post('/api/projects/', {'name': 'New'}, format='json', HTTP_X_API_KEY=raw_key)
+        self.assertEqual(response.status_code, 403)
+
+    def test_rejects_unknown_and_tampered_keys(self):
+        _api_key, raw_key = apikeys.generate('CI', self.user)
+
+        self.assertEqual(self.get(raw_key[:-1] + ('A' if raw_key[-1] != 'A' else 'B')).status_code, 401)
+        self.assertEqual(self.get('not-a-key').status_code, 401)
+        with self.assertRaises(ValueError):
+            apikeys.generate('CI', self.user, scopes=['admin'])
+
+    def test_revoked_key_stops_working_at_once(self):
+        api_key, raw_key = apikeys.generate('CI', self.user)
+        self.assertEqual(self.get(raw_key).status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            apikeys.revoke(api_key)
+        self.assertEqual(self.get(raw_key).status_code, 401)
+
+    def test_rotated_key_works_until_grace_ends(self):
+        api_key, raw_key = apikeys.generate('CI', self.user, scopes=['read', 'write'])
+        with self.captureOnCommitCallbacks(execute=True):
+            new_key, new_raw_key = apikeys.rotate(api_key, grace=timedelta(hours=1))
+
+        self.assertEqual(new_key.scopes, ['read', 'write'])
+        self.assertEqual(self.get(raw_key).status_code, 200)
+        self.assertEqual(self.get(new_raw_key).status_code, 200)
+
+        APIKey.objects.filter(pk=api_key.pk).update(expires_at=timezone.now())
+        apikeys.verified.entries.clear()
+        self.assertEqual(self.get(raw_key).status_code, 401)
+
+    def test_usage_is_flushed_in_bulk(self):
+        api_key, raw_key = apikeys.generate('CI', self.user)
+        for _ in range(3):
+            self.get(raw_key)
+        api_key.refresh_from_db()
+        self.assertEqual(api_key.usage_count, 0)
+
+        apikeys.usage.flush()
+        api_key.refresh_from_db()
+        self.assertEqual(api_key.usage_count, 3)
+        self.assertIsNotNone(api_key.last_used_at)
+
+
+class ProjectAccessTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner', password='password')
+        self.member = User.objects.create_user('member', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.owner)
+
+    def access(self, user):
+        return access.get_access(user)
+
+    def test_cached_until_membership_changes(self):
+        self.assertFalse(self.access(self.member).is_member(self.project.pk))
+        with self.assertNumQueries(0):
+            self.access(self.member)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.members.add(self.member)
+        member_access = self.access(self.member)
+        self.assertTrue(member_access.is_member(self.project.pk))
+        self.assertFalse(member_access.is_owner(self.project.pk))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.member.projects.clear()
+        self.assertFalse(self.access(self.member).is_member(self.project.pk))
+
+    def test_ownership_transfer(self):
+        self.project.members.add(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.created_by = self.member
+            self.project.save()
+
+        self.assertTrue(self.access(self.member).is_owner(self.project.pk))
+        previous = self.access(self.owner)
+        # The old owner is still a member
+        self.assertTrue(previous.is_member(self.project.pk))
+        self.assertFalse(previous.is_owner(self.project.pk))
+
+    def test_owner_keeps_access_when_removed_as_member(self):
+        self.project.members.add(self.owner)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.project.members.remove(self.owner)
+
+        self.assertTrue(self.access(self.owner).is_owner(self.project.pk))
+
+    def test_resolved_once_per_request(self):
+        request = type('Request', (), {'user': self.owner})()
+        first = access.for_request(request)
+        with self.assertNumQueries(0):
+            self.assertIs(access.for_request(request), first)
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class AccessScopingTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user('owner', password='password')
+        self.member = User.objects.create_user('member', password='password')
+        self.outsider = User.objects.create_user('outsider', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.owner)
+        self.project.members.add(self.member)
+        self.issue = Issue.objects.create(title='Crash', description='', project=self.project, reporter=self.owner)
+        Comment.objects.create(issue=self.issue, author=self.owner, content='First')
+        self.client = APIClient()
+
+    def ids(self, user, path):
+        self.client.force_authenticate(user)
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_lists_only_show_accessible_projects(self):
+        issues = f'/api/projects/{self.project.pk}/issues/'
+        comments = f'/api/issues/{self.issue.pk}/comments/'
+        for user in (self.owner, self.member):
+            self.assertEqual(self.ids(user, '/api/projects/'), [self.project.pk])
+            self.assertEqual(self.ids(user, issues), [self.issue.pk])
+            self.assertEqual(len(self.ids(user, comments)), 1)
+
+        self.assertEqual(self.ids(self.outsider, '/api/projects/'), [])
+        self.assertEqual(self.ids(self.outsider, issues), [])
+        self.assertEqual(self.ids(self.outsider, comments), [])
+
+    def test_scope_uses_no_distinct(self):
+        queryset = access.scope(Issue.objects.all(), self.member)
+        self.assertNotIn('DISTINCT', str(queryset.query))
+        self.assertEqual(list(queryset), [self.issue])
+
+    def test_rebuild_matches_signal_maintained_rows(self):
+        self.outsider.projects.add(self.project)
+        self.project.members.remove(self.member)
+        expected = set(ProjectAccessEntry.objects.values_list('project_id', 'user_id', 'is_owner'))
+
+        self.assertEqual(access.rebuild(), len(expected))
+        self.assertEqual(set(ProjectAccessEntry.objects.values_list('project_id', 'user_id', 'is_owner')), expected)
+        self.assertEqual(expected, {(self.project.pk, self.owner.pk, True), (self.project.pk, self.outsider.pk, False)})
+
+
+class QueryStatsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('owner', password='password')
+        self.project = Project.objects.create(name='Project', created_by=self.user)
+        for n in range(6):
+            reporter = User.objects.create(username=f'reporter{n}')
+            Issue.objects.create(title=f'Issue {n}', description='', project=self.project, reporter=reporter)
+
+    def test_shape_collapses_in_lists(self):
+        self.assertEqual(
+            querystats.shape('SELECT 1 WHERE id IN (%s, %s, %s) AND x IN (%s)'),
+            'SELECT 1 WHERE id IN (%s) AND x IN (%s)',
+        )
+
+    def test_n_plus_one_names_the_serializer_field(self):
+        stats = querystats.QueryStats()
+        with connection.execute_wrapper(stats):
+            IssueSerializer(Issue.objects.select_related('project', 'assignee'), many=True).data
+
+        [(sql, count, _duration, field)] = stats.repeated(querystats.get_threshold())
+        self.assertIn('auth_user', sql)
+        self.assertEqual((count, field), (6, 'IssueSerializer.reporter'))
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=1)
+    def test_sampled_request_gets_server_timing_and_log(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.assertLogs('core.querystats', 'INFO') as logs:
+            response = client.get('/api/projects/')
+
+        self.assertRegex(response['Server-Timing'], r'^db;desc="\d+ queries";dur=[\d.]+, total;dur=[\d.]+$')
+        record = logs.records[0].query_stats
+        self.assertEqual((record['view'], record['status']), ('project-list-create', 200))
+        self.assertGreater(record['queries'], 0)
+
+    @override_settings(QUERY_STATS_SAMPLE_RATE=0)
+    def test_unsampled_request_is_untouched(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        self.assertNotIn('Server-Timing', client.get('/api/projects/'))
+
+
+@override_settings(QUERY_STATS_SAMPLE_RATE=0)
+class BenchmarkTests(TestCase):
+    def test_percentile_is_nearest_rank(self):
+        samples = [5, 1, 4, 2, 3]
+        self.assertEqual(benchmark.percentile(samples, 0.5), 3)
+        self.assertEqual(benchmark.percentile(samples, 0.95), 5)
+        self.assertEqual(benchmark.percentile(samples, 0), 1)
+
+    def test_compare_flags_only_real_regressions(self):
+        def results(**measurement):
+            return {'endpoints': {'GET issue-list': {
+                'status': 200, 'p50_ms': 10.0, 'p95_ms': 20.0, 'queries': 4, 'peak_kb': 100.0, **measurement,
+            }}}
+
+        baseline = results()
+        self.assertEqual(benchmark.compare(results(p50_ms=10.9, p95_ms=20.5, peak_kb=110.0), baseline), [])
+        # Well past the tolerance, but under MIN_LATENCY_DELTA
+        self.assertEqual(benchmark.compare(results(p50_ms=0.9), results(p50_ms=0.2)), [])
+        self.assertEqual(
+            benchmark.compare(results(queries=5, p95_ms=30.0, status=500), baseline),
+            [('GET issue-list', 'status', 200, 500), ('GET issue-list', 'queries', 4, 5),
+             ('GET issue-list', 'p95_ms', 20.0, 30.0)],
+        )
+
+    def test_run_covers_every_route(self):
+        datagen.generate(100, log=lambda message: None)
+        self.assertEqual(benchmark.uncovered(benchmark.scenarios(benchmark.fixtures())), [])
+
+        results = benchmark.run(iterations=2, warmup=0, only='project-list-create')
+        self.assertEqual(set(results['endpoints']), {'GET project-list-create', 'POST project-list-create'})
+        for measurement in results['endpoints'].values():
+            self.assertLess(measurement['status'], 400)
+            self.assertGreater(measurement['queries'], 0)
+        # Writes are rolled back
+        self.assertEqual(Project.objects.count(), results['meta']['projects'])
+
+
+class DataGeneratorTests(TestCase):
+    def setUp(self):
+        self.now = timezone.now()
+
+    def generate(self, seed=0):
+        return datagen.generate(300, seed=seed, now=self.now, batch_size=100, log=lambda message: None)
+
+    def snapshot(self):
+        return (
+            list(Issue.objects.order_by('pk').values()),
+            list(Comment.objects.order_by('pk').values()),
+            list(Project.objects.order_by('pk').values()),
+        )
+
+    def test_same_seed_same_rows(self):
+        counts = self.generate()
+        first = self.snapshot()
+        self.assertEqual(counts[Issue._meta.db_table], 300)
+
+        User.objects.all().delete()
+        Label.objects.all().delete()
+        self.generate()
+        self.assertEqual(self.snapshot(), first)
+
+        User.objects.all().delete()
+        Label.objects.all().delete()
+        self.generate(seed=1)
+        self.assertNotEqual(self.snapshot(), first)
+
+    def test_rows_are_consistent(self):
+        self.generate()
+        first_project = Project.objects.order_by('pk').first()
+        self.assertTrue(first_project.created_by.is_staff)
+
+        for issue in Issue.objects.all():
+            self.assertLessEqual(issue.created_at, issue.updated_at)
+            self.assertLessEqual(issue.updated_at, self.now)
+            if issue.closed_at is not None:
+                self.assertLessEqual(issue.closed_at, issue.updated_at)
+        # Timestamps follow the generated history, not the time of the run
+        self.assertGreater(Issue.objects.values('updated_at').distinct().count(), 250)
+
+        for project in Project.objects.all():
+            self.assertEqual(project.issues_count, project.issues.filter(is_active=True).count())
+            self.assertTrue(project.members.filter(pk=project.created_by_id).exists())
+        for comment in Comment.objects.filter(parent__isnull=False).select_related('parent'):
+            self.assertEqual(comment.depth, comment.parent.depth + 1)
+            self.assertEqual(comment.issue_id, comment.parent.issue_id)
+            self.assertLessEqual(comment.depth, datagen.MAX_REPLY_DEPTH)
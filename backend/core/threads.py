@@ -0,0 +1,102 @@
+"""
+In-memory comment thread assembly.
+
+Every reply stores the id of the top-level comment of its thread (``root``)
+and its nesting ``depth``, so a whole thread - or the threads of a page of
+top-level comments - loads with a single query and is linked into a tree
+here instead of walking ``replies`` one level (and one query) at a time.
+"""
+
+from collections import defaultdict
+
+from .models import Comment
+
+DEFAULT_MAX_DEPTH = 10
+
+
+def get_max_depth(request):
+    """
+    Read the ``max_depth`` query parameter, capped at DEFAULT_MAX_DEPTH.
+    """
+    if request is None:
+        return DEFAULT_MAX_DEPTH
+    try:
+        max_depth = int(request.query_params.get('max_depth', DEFAULT_MAX_DEPTH))
+    except (TypeError, ValueError):
+        return DEFAULT_MAX_DEPTH
+    return max(0, min(max_depth, DEFAULT_MAX_DEPTH))
+
+
+def _link(comments, max_depth):
+    """
+    Give every comment a ``thread_replies`` list holding its loaded children.
+    """
+    children = defaultdict(list)
+    for comment in sorted(comments, key=lambda c: (c.created_at, c.pk)):
+        if comment.depth <= max_depth:
+            children[comment.parent_id].append(comment)
+
+    for comment in comments:
+        comment.thread_replies = children.get(comment.pk, []) if comment.depth < max_depth else []
+    return children
+
+
+def build_threads(comments, max_depth=DEFAULT_MAX_DEPTH):
+    """
+    Link an issue's full comment list into trees and return the top-level comments.
+    """
+    comments = list(comments)
+    return _link(comments, max_depth)[None]
+
+
+def attach_replies(comments, max_depth=DEFAULT_MAX_DEPTH):
+    """
+    Load the replies below ``comments`` with one query and link them in.
+    """
+    comments = list(comments)
+    if not comments:
+        return comments
+
+    root_ids = {comment.root_id or comment.pk for comment in comments}
+    descendants = Comment.objects.filter(
+        root_id__in=root_ids, depth__lte=max_depth
+    ).select_related('author')
+
+    loaded = {comment.pk: comment for comment in descendants}
+    loaded.update((comment.pk, comment) for comment in comments)
+    _link(list(loaded.values()), max_depth)
+    return comments
+
+
+def rebuild_thread_fields(batch_size=2000):
+    """
+    Recompute ``root`` and ``depth`` for every comment from the parent links.
+
+    Returns the number of comments that had to be corrected.
+    """
+    parents = dict(Comment.objects.values_list('id', 'parent_id').iterator(chunk_size=batch_size))
+
+    def locate(comment_id):
+        depth, current = 0, comment_id
+        while parents.get(current) is not None:
+            current = parents[current]
+            depth += 1
+        return (current if depth else None), depth
+
+    stale = []
+    fixed = 0
+    current = Comment.objects.only('id', 'root_id', 'depth').order_by('id')
+    for comment in current.iterator(chunk_size=batch_size):
+        root_id, depth = locate(comment.pk)
+        if (comment.root_id, comment.depth) != (root_id, depth):
+            comment.root_id, comment.depth = root_id, depth
+            stale.append(comment)
+        if len(stale) >= batch_size:
+            Comment.objects.bulk_update(stale, ['root', 'depth'])
+            fixed += len(stale)
+            stale = []
+
+    if stale:
+        Comment.objects.bulk_update(stale, ['root', 'depth'])
+        fixed += len(stale)
+    return fixed
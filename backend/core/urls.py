@@ -1,6 +1,5 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenRefreshView
 from . import views
 
 router = DefaultRouter()
@@ -10,7 +9,7 @@ urlpatterns = [
     path('auth/register/', views.register, name='register'),
     path('auth/login/', views.CustomTokenObtainPairView.as_view(), name='login'),
     path('auth/logout/', views.logout, name='logout'),
-    path('auth/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('auth/refresh/', views.CustomTokenRefreshView.as_view(), name='token_refresh'),
     path('auth/profile/', views.user_profile, name='user_profile'),
     path('auth/profile/update/', views.update_profile, name='update_profile'),
     
@@ -22,11 +21,14 @@ urlpatterns = [
     
     # Users
     path('users/', views.UserListView.as_view(), name='user-list'),
+    path('users/lookup/', views.user_lookup, name='user-lookup'),
     
     # Projects
     path('projects/', views.ProjectListCreateView.as_view(), name='project-list-create'),
+    path('projects/lookup/', views.project_lookup, name='project-lookup'),
     path('projects/<int:pk>/', views.ProjectDetailView.as_view(), name='project-detail'),
     path('projects/<int:project_id>/analytics/', views.project_analytics, name='project-analytics'),
+    path('projects/<int:project_id>/export/', views.ProjectExportView.as_view(), name='project-export'),
     
     # Issues
     path('projects/<int:project_id>/issues/', views.IssueListCreateView.as_view(), name='issue-list-create'),
@@ -0,0 +1,183 @@
+"""
+Cached user lookups for token authentication.
+
+Every authenticated request needs the user row its token names. Resolving it
+goes through two layers before the database: a small per-process LRU and
+the shared cache. The shared entry is keyed by user id and a version stamp
+kept in the cache. Saving or deleting a user bumps the stamp once the
+transaction commits, so a request that read the row before the commit can
+only have cached it under the old stamp, which nobody reads any more.
+
+The local LRU answers without a cache round trip for USER_CACHE_LOCAL_TTL
+seconds, then checks the stamp again. An invalidation in this process drops
+the local entry at once; other processes see it within that window, so a
+deactivated user's tokens keep working for at most a few seconds there.
+
+Entries hold the row's values rather than a model instance, and every
+lookup builds a fresh User, so no two requests share one object. Cached
+instances may be seconds old: code that writes a user must load it from
+the database first instead of saving ``request.user``.
+
+Lookups are counted per process as local hits, shared hits and misses.
+The counts are added to shared totals every METRICS_FLUSH_EVERY lookups,
+which ``user_cache_stats`` reports.
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+
+# The password hash and login time are never read on the request path and
+# stay out of the shared cache; instances load them on access, as deferred fields
+EXCLUDED_FIELDS = {'password', 'last_login'}
+FIELDS = [field.attname for field in User._meta.concrete_fields if field.attname not in EXCLUDED_FIELDS]
+OUTCOMES = ('local_hits', 'shared_hits', 'misses')
+METRICS_FLUSH_EVERY = 100
+
+
+def version_key(user_id):
+    return f'auth:user:version:{user_id}'
+
+
+def cache_key(user_id, version):
+    return f'auth:user:{user_id}:{version}'
+
+
+def metrics_key(outcome):
+    return f'auth:user:metrics:{outcome}'
+
+
+def get_ttl():
+    return getattr(settings, 'USER_CACHE_TTL', 300)
+
+
+def get_local_ttl():
+    return getattr(settings, 'USER_CACHE_LOCAL_TTL', 5)
+
+
+class LocalCache:
+    """
+    Thread-safe LRU of ``user_id -> (version, values, checked_at)``.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None:
+                self.entries.move_to_end(user_id)
+            return entry
+
+    def set(self, user_id, version, values, checked_at):
+        with self.lock:
+            self.entries[user_id] = (version, values, checked_at)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def discard(self, user_id):
+        with self.lock:
+            self.entries.pop(user_id, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+local = LocalCache(getattr(settings, 'USER_CACHE_SIZE', 1024))
+_counts_lock = threading.Lock()
+_counts = Counter()
+_unflushed = Counter()
+
+
+def _record(outcome):
+    with _counts_lock:
+        _counts[outcome] += 1
+        _unflushed[outcome] += 1
+        if sum(_unflushed.values()) < METRICS_FLUSH_EVERY:
+            return
+        pending = dict(_unflushed)
+        _unflushed.clear()
+
+    for name, count in pending.items():
+        try:
+            cache.incr(metrics_key(name), count)
+        except ValueError:
+            cache.add(metrics_key(name), count, None)
+
+
+def stats():
+    """
+    Return this process's lookup counts and the totals flushed by all processes.
+    """
+    with _counts_lock:
+        process = {outcome: _counts[outcome] for outcome in OUTCOMES}
+    shared = cache.get_many([metrics_key(outcome) for outcome in OUTCOMES])
+    return {
+        'process': process,
+        'shared': {outcome: shared.get(metrics_key(outcome), 0) for outcome in OUTCOMES},
+    }
+
+
+def _current_version(user_id):
+    # A nanosecond clock start means a version lost to eviction never comes back
+    return cache.get_or_set(version_key(user_id), time.time_ns(), None)
+
+
+def _build(values):
+    return User.from_db(User.objects.db, FIELDS, values)
+
+
+def get_user(user_id):
+    """
+    Return a fresh User instance for ``user_id``, or None if there is no such user.
+    """
+    now = time.monotonic()
+    entry = local.get(user_id)
+    if entry is not None and now - entry[2] < get_local_ttl():
+        _record('local_hits')
+        return _build(entry[1])
+
+    version = _current_version(user_id)
+    if entry is not None and entry[0] == version:
+        local.set(user_id, version, entry[1], now)
+        _record('local_hits')
+        return _build(entry[1])
+
+    key = cache_key(user_id, version)
+    values = cache.get(key)
+    if values is not None:
+        _record('shared_hits')
+    else:
+        _record('misses')
+        values = User.objects.filter(pk=user_id).values_list(*FIELDS).first()
+        if values is None:
+            return None
+        cache.set(key, values, get_ttl())
+
+    local.set(user_id, version, values, now)
+    return _build(values)
+
+
+def _bump(user_id):
+    try:
+        cache.incr(version_key(user_id))
+    except ValueError:
+        cache.set(version_key(user_id), time.time_ns(), None)
+    local.discard(user_id)
+
+
+def invalidate(user_id):
+    """
+    Drop the cached user once the current transaction commits.
+    """
+    transaction.on_commit(lambda: _bump(user_id))
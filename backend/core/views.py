@@ -1,23 +1,36 @@
 from rest_framework import generics, status, filters
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.permissions import IsAuthenticated, AllowAny, SAFE_METHODS
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework.utils.urls import replace_query_param
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from django_filters.rest_framework import DjangoFilterBackend
-from django.db.models import Prefetch, Q
+from django.db.models import Count, Max, OuterRef, Prefetch, Q, Subquery, Sum
+from django.http import Http404, StreamingHttpResponse
 from django.utils import timezone
-from datetime import timedelta
+from django.utils.dateparse import parse_datetime
+import re
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
 
-from .models import Project, Issue, Comment, Activity, Label, IssueAttachment
+from .models import Project, Issue, Comment, Activity, Label, IssueAttachment, SearchDocument, ArchivedIssue
 from .serializers import (
     ProjectSerializer, IssueSerializer, IssueDetailSerializer, 
     CommentSerializer, UserSerializer, ActivitySerializer,
-    LabelSerializer, IssueAttachmentSerializer, CustomTokenObtainPairSerializer
+    LabelSerializer, IssueAttachmentSerializer, CustomTokenObtainPairSerializer,
+    CustomTokenRefreshSerializer, BulkIssueUpdateSerializer
 )
+from .authentication import RevocableRefreshToken
 from .permissions import IsReporterOrAssignee, IsAuthorOrReadOnly
+from . import access, analytics, archive, bulk, dashboard, export, fuzzy, search, threads
+from .conditional import ConditionalGetMixin, collection_version
+from .fastpath import ActivityRows, FastListMixin, IssueRows, ProjectRows
+from .sparse import SparseQuerysetMixin
+
+# Project members in a stable order, the same one the fast list path uses
+MEMBERS_PREFETCH = Prefetch('members', queryset=User.objects.order_by('id'))
 
 
 # Authentication Views
@@ -28,6 +41,13 @@ class CustomTokenObtainPairView(TokenObtainPairView):
     serializer_class = CustomTokenObtainPairSerializer
 
 
+class CustomTokenRefreshView(TokenRefreshView):
+    """
+    Token refresh view that rejects revoked refresh tokens
+    """
+    serializer_class = CustomTokenRefreshSerializer
+
+
 @api_view(['POST'])
 @permission_classes([AllowAny])
 def register(request):
@@ -74,7 +94,7 @@ def register(request):
             last_name=last_name
         )
         
-        refresh = RefreshToken.for_user(user)
+        refresh = RevocableRefreshToken.for_user(user)
         
         return Response({
             'user': UserSerializer(user).data,
@@ -113,7 +133,7 @@ def login(request):
                 status=status.HTTP_401_UNAUTHORIZED
             )
             
-        refresh = RefreshToken.for_user(user)
+        refresh = RevocableRefreshToken.for_user(user)
         return Response({
             'user': UserSerializer(user).data,
             'refresh': str(refresh),
@@ -135,7 +155,7 @@ def logout(request):
     try:
         refresh_token = request.data.get('refresh')
         if refresh_token:
-            token = RefreshToken(refresh_token)
+            token = RevocableRefreshToken(refresh_token)
             token.blacklist()
         return Response({'message': 'Successfully logged out'}, status=status.HTTP_200_OK)
     except Exception:
@@ -157,7 +177,8 @@ def update_profile(request):
     """
     Update current user profile
     """
-    user = request.user
+    # request.user may come from the user cache; saving it would write back stale columns
+    user = User.objects.get(pk=request.user.pk)
     serializer = UserSerializer(user, data=request.data, partial=True)
     if serializer.is_valid():
         serializer.save()
@@ -166,8 +187,9 @@ def update_profile(request):
 
 
 # Project Views
-class ProjectListCreateView(generics.ListCreateAPIView):
+class ProjectListCreateView(ConditionalGetMixin, SparseQuerysetMixin, FastListMixin, generics.ListCreateAPIView):
     serializer_class = ProjectSerializer
+    fast_rows_class = ProjectRows
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description']
@@ -175,23 +197,31 @@ class ProjectListCreateView(generics.ListCreateAPIView):
     ordering = ['-created_at']
     
     def get_queryset(self):
-        queryset = Project.objects.filter(is_active=True).select_related('created_by').prefetch_related('issues')
-        
-        # Filter by user's projects if requested
-        if self.request.query_params.get('my_projects'):
-            queryset = queryset.filter(
-                Q(created_by=self.request.user) | Q(members=self.request.user)
-            ).distinct()
-            
-        return queryset
+        # Only the user's own projects; ?my_projects is accepted for compatibility
+        return access.scope(
+            Project.objects.filter(is_active=True), self.request.user, 'pk'
+        ).select_related('created_by').prefetch_related(MEMBERS_PREFETCH)
+    
+    def get_version(self):
+        return collection_version(
+            self.filter_queryset(self.get_queryset()), 'updated_at',
+            issues=Sum('issues_count'), open_issues=Sum('open_issues_count'), members=Sum('members_count')
+        )
 
 
-class ProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
+class ProjectDetailView(ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = ProjectSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
-        return Project.objects.filter(is_active=True).select_related('created_by')
+        return Project.objects.filter(is_active=True).select_related('created_by').prefetch_related(MEMBERS_PREFETCH)
+    
+    def get_version(self):
+        # Membership changes touch updated_at; the counters cover issue changes
+        row = Project.objects.filter(pk=self.kwargs['pk'], is_active=True).values_list(
+            'updated_at', 'issues_count', 'open_issues_count', 'members_count'
+        ).first()
+        return row
     
     def perform_destroy(self, instance):
         # Soft delete
@@ -200,8 +230,9 @@ class ProjectDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Issue Views
-class IssueListCreateView(generics.ListCreateAPIView):
+class IssueListCreateView(ConditionalGetMixin, SparseQuerysetMixin, FastListMixin, generics.ListCreateAPIView):
     serializer_class = IssueSerializer
+    fast_rows_class = IssueRows
     permission_classes = [IsAuthenticated]
     filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
     filterset_fields = ['status', 'priority', 'severity', 'assignee']
@@ -211,12 +242,12 @@ class IssueListCreateView(generics.ListCreateAPIView):
     
     def get_queryset(self):
         project_id = self.kwargs['project_id']
-        queryset = Issue.objects.filter(
+        queryset = access.scope(Issue.objects.filter(
             project_id=project_id, 
             is_active=True
-        ).select_related(
+        ), self.request.user).select_related(
             'project', 'reporter', 'assignee'
-        ).prefetch_related('comments')
+        )
         
         # Filter overdue issues if requested
         if self.request.query_params.get('overdue'):
@@ -227,6 +258,14 @@ class IssueListCreateView(generics.ListCreateAPIView):
             
         return queryset
     
+    def get_version(self):
+        # Counters and overdue flags change without touching updated_at
+        return collection_version(
+            self.filter_queryset(self.get_queryset()), 'updated_at',
+            comments=Sum('comments_count'), attachments=Sum('attachments_count'),
+            overdue=Count('id', filter=Q(due_date__lt=timezone.now()) & ~Q(status__in=Issue.CLOSED_STATUSES)),
+        )
+    
     def perform_create(self, serializer):
         project_id = self.kwargs['project_id']
         project = Project.objects.get(id=project_id)
@@ -242,7 +281,7 @@ class IssueListCreateView(generics.ListCreateAPIView):
         )
 
 
-class IssueDetailView(generics.RetrieveUpdateDestroyAPIView):
+class IssueDetailView(ConditionalGetMixin, SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = IssueDetailSerializer
     permission_classes = [IsAuthenticated, IsReporterOrAssignee]
     
@@ -253,6 +292,44 @@ class IssueDetailView(generics.RetrieveUpdateDestroyAPIView):
             Prefetch('comments', queryset=Comment.objects.select_related('author'))
         )
     
+    def get_object(self):
+        try:
+            return super().get_object()
+        except Http404:
+            # Archived issues stay readable, but only restoring them makes them editable again
+            if self.request.method not in SAFE_METHODS:
+                raise
+            issue = archive.load_issue(self.kwargs['pk'])
+            if issue is None:
+                raise
+            self.check_object_permissions(self.request, issue)
+            return issue
+    
+    def get_version(self):
+        # The issue row plus the newest change in its comment and attachment collections
+        row = Issue.objects.filter(pk=self.kwargs['pk'], is_active=True).annotate(
+            comments_version=Subquery(
+                Comment.objects.filter(issue=OuterRef('pk')).order_by('-updated_at').values('updated_at')[:1]
+            ),
+            attachments_version=Subquery(
+                IssueAttachment.objects.filter(issue=OuterRef('pk')).order_by('-uploaded_at').values('uploaded_at')[:1]
+            ),
+        ).values(
+            'updated_at', 'status', 'due_date', 'comments_count', 'attachments_count',
+            'comments_version', 'attachments_version'
+        ).first()
+        if row is None:
+            # An archived issue only changes by being restored
+            archived_at = ArchivedIssue.objects.filter(
+                pk=self.kwargs['pk'], is_active=True
+            ).values_list('archived_at', flat=True).first()
+            return None if archived_at is None else ('archived', archived_at)
+        
+        is_overdue = bool(
+            row['due_date'] and row['status'] not in Issue.CLOSED_STATUSES and timezone.now() > row['due_date']
+        )
+        return tuple(row.values()), is_overdue
+    
     def perform_update(self, serializer):
         old_instance = self.get_object()
         instance = serializer.save()
@@ -274,13 +351,29 @@ class IssueDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # Comment Views
-class CommentListCreateView(generics.ListCreateAPIView):
+class CommentListCreateView(ConditionalGetMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
+        # Paginate top-level comments; replies are nested under their thread
         issue_id = self.kwargs['issue_id']
-        return Comment.objects.filter(issue_id=issue_id).select_related('author', 'issue')
+        return access.scope(
+            Comment.objects.filter(issue_id=issue_id, parent__isnull=True), self.request.user, 'issue__project'
+        ).select_related('author', 'issue')
+    
+    def paginate_queryset(self, queryset):
+        page = super().paginate_queryset(queryset)
+        if page is not None and 'replies' in self.get_serializer().fields:
+            threads.attach_replies(page, threads.get_max_depth(self.request))
+        return page
+    
+    def get_version(self):
+        # Replies are nested in the page, so version the whole thread set
+        return collection_version(
+            access.scope(Comment.objects.filter(issue_id=self.kwargs['issue_id']), self.request.user, 'issue__project'),
+            'updated_at'
+        )
     
     def perform_create(self, serializer):
         issue_id = self.kwargs['issue_id']
@@ -288,7 +381,7 @@ class CommentListCreateView(generics.ListCreateAPIView):
         serializer.save(issue=issue)
 
 
-class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
+class CommentDetailView(SparseQuerysetMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CommentSerializer
     permission_classes = [IsAuthenticated, IsAuthorOrReadOnly]
     
@@ -297,7 +390,7 @@ class CommentDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 # User Views
-class UserListView(generics.ListAPIView):
+class UserListView(SparseQuerysetMixin, generics.ListAPIView):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticated]
@@ -305,8 +398,60 @@ class UserListView(generics.ListAPIView):
     search_fields = ['username', 'first_name', 'last_name', 'email']
 
 
+def _lookup_params(request):
+    query = request.GET.get('q', '').strip()
+    try:
+        limit = min(max(int(request.GET.get('limit', 10)), 1), 50)
+    except ValueError:
+        limit = 10
+    return query, limit
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def user_lookup(request):
+    """
+    Typo-tolerant user lookup for assignee and member pickers
+    """
+    query, limit = _lookup_params(request)
+    matches = fuzzy.lookup('users', query, limit)
+    users = User.objects.in_bulk([pk for pk, _score in matches])
+    
+    results = []
+    for pk, score in matches:
+        if pk in users:
+            results.append({**UserSerializer(users[pk]).data, 'score': round(score, 3)})
+    return Response({'results': results})
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def project_lookup(request):
+    """
+    Typo-tolerant project name lookup
+    """
+    query, limit = _lookup_params(request)
+    # Rank only accessible projects, so inaccessible matches cannot take the top slots
+    matches = fuzzy.lookup('projects', query, limit, within=access.for_request(request).projects)
+    projects = Project.objects.filter(is_active=True).only('id', 'name', 'description').in_bulk(
+        [pk for pk, _score in matches]
+    )
+    
+    results = []
+    for pk, score in matches:
+        if pk in projects:
+            project = projects[pk]
+            results.append({
+                'id': project.id,
+                'name': project.name,
+                'description': project.description,
+                'score': round(score, 3),
+            })
+    return Response({'results': results})
+
+
 # Label Views
-class LabelListCreateView(generics.ListCreateAPIView):
+class LabelListCreateView(SparseQuerysetMixin, generics.ListCreateAPIView):
     queryset = Label.objects.all()
     serializer_class = LabelSerializer
     permission_classes = [IsAuthenticated]
@@ -315,8 +460,9 @@ class LabelListCreateView(generics.ListCreateAPIView):
 
 
 # Activity Views
-class ActivityListView(generics.ListAPIView):
+class ActivityListView(ConditionalGetMixin, SparseQuerysetMixin, FastListMixin, generics.ListAPIView):
     serializer_class = ActivitySerializer
+    fast_rows_class = ActivityRows
     permission_classes = [IsAuthenticated]
     filter_backends = [filters.OrderingFilter]
     ordering = ['-created_at']
@@ -325,7 +471,7 @@ class ActivityListView(generics.ListAPIView):
         project_id = self.kwargs.get('project_id')
         issue_id = self.kwargs.get('issue_id')
         
-        queryset = Activity.objects.select_related('user', 'issue', 'project')
+        queryset = access.scope(Activity.objects.all(), self.request.user).select_related('user', 'issue', 'project')
         
         if project_id:
             queryset = queryset.filter(project_id=project_id)
@@ -333,62 +479,40 @@ class ActivityListView(generics.ListAPIView):
             queryset = queryset.filter(issue_id=issue_id)
             
         return queryset
+    
+    def get_version(self):
+        return collection_version(self.filter_queryset(self.get_queryset()), 'created_at')
 
 
 class DashboardStatsView(generics.GenericAPIView):
     permission_classes = [IsAuthenticated]
     
     def get(self, request):
-        user = request.user
-        
-        # Get user's projects
-        user_projects = Project.objects.filter(
-            Q(created_by=user) | Q(members=user),
-            is_active=True
-        ).distinct()
-        
-        # Calculate stats
-        total_projects = user_projects.count()
-        total_issues = Issue.objects.filter(
-            project__in=user_projects,
-            is_active=True
-        ).count()
-        
-        assigned_issues = Issue.objects.filter(
-            assignee=user,
-            is_active=True,
-            status__in=['open', 'in_progress', 'reopened']
-        ).count()
-        
-        overdue_issues = Issue.objects.filter(
-            project__in=user_projects,
-            is_active=True,
-            due_date__lt=timezone.now(),
-            status__in=['open', 'in_progress', 'reopened']
-        ).count()
-        
-        # Recent activity
-        recent_activities = Activity.objects.filter(
-            project__in=user_projects
-        ).select_related('user', 'issue', 'project')[:10]
+        data, generated_at, cached = dashboard.get_stats(request.user)
         
         return Response({
-            'total_projects': total_projects,
-            'total_issues': total_issues,
-            'assigned_issues': assigned_issues,
-            'overdue_issues': overdue_issues,
-            'recent_activities': ActivitySerializer(recent_activities, many=True).data
+            **data,
+            'freshness': {
+                'generated_at': datetime.fromtimestamp(generated_at, tz=dt_timezone.utc).isoformat(),
+                'age_seconds': round(max(time.time() - generated_at, 0), 3),
+                'cached': cached,
+            }
         })
 
 
 # Issue Attachment Views
-class IssueAttachmentListCreateView(generics.ListCreateAPIView):
+class IssueAttachmentListCreateView(ConditionalGetMixin, SparseQuerysetMixin, generics.ListCreateAPIView):
     serializer_class = IssueAttachmentSerializer
     permission_classes = [IsAuthenticated]
     
     def get_queryset(self):
         issue_id = self.kwargs['issue_id']
-        return IssueAttachment.objects.filter(issue_id=issue_id).select_related('uploaded_by')
+        return access.scope(
+            IssueAttachment.objects.filter(issue_id=issue_id), self.request.user, 'issue__project'
+        ).select_related('uploaded_by')
+    
+    def get_version(self):
+        return collection_version(self.get_queryset(), 'uploaded_at', newest=Max('id'))
     
     def perform_create(self, serializer):
         issue_id = self.kwargs['issue_id']
@@ -396,60 +520,102 @@ class IssueAttachmentListCreateView(generics.ListCreateAPIView):
         serializer.save(issue=issue)
 
 
+# Export Views
+class ProjectExportView(IssueListCreateView):
+    """
+    Stream a project's issues, comments and activities as NDJSON.
+    
+    Accepts the issue list filters plus ``types`` (comma separated, default
+    all) and ``updated_since`` (ISO 8601). Gzipped when the client accepts it.
+    """
+    http_method_names = ['get', 'head', 'options']
+    pagination_class = None
+    accepts_gzip = re.compile(r'\bgzip\b')
+    
+    def get(self, request, project_id):
+        try:
+            project = Project.objects.get(id=project_id, is_active=True)
+        except Project.DoesNotExist:
+            return Response(
+                {'error': 'Project not found'}, 
+                status=status.HTTP_404_NOT_FOUND
+            )
+        
+        if not access.for_request(request).is_member(project.pk):
+            return Response(
+                {'error': 'Access denied'}, 
+                status=status.HTTP_403_FORBIDDEN
+            )
+        
+        types = [name for name in request.GET.get('types', ','.join(export.TYPES)).split(',') if name]
+        if not types or set(types) - set(export.TYPES):
+            return Response(
+                {'error': f'types must be a comma separated subset of {", ".join(export.TYPES)}'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        updated_since = None
+        if 'updated_since' in request.GET:
+            try:
+                updated_since = parse_datetime(request.GET['updated_since'])
+            except ValueError:
+                pass
+            if updated_since is None:
+                return Response(
+                    {'error': 'updated_since must be an ISO 8601 date and time'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+            if timezone.is_naive(updated_since):
+                updated_since = timezone.make_aware(updated_since)
+        
+        chunks = export.project_export(self.filter_queryset(self.get_queryset()), types, updated_since)
+        compress = bool(self.accepts_gzip.search(request.META.get('HTTP_ACCEPT_ENCODING', '')))
+        
+        response = StreamingHttpResponse(
+            export.gzipped(chunks) if compress else chunks,
+            content_type='application/x-ndjson'
+        )
+        response['Content-Disposition'] = f'attachment; filename="project-{project.pk}-export.ndjson"'
+        response['Vary'] = 'Accept-Encoding'
+        if compress:
+            response['Content-Encoding'] = 'gzip'
+        return response
+
+
 # Bulk Operations Views
+BULK_RESPONSE_LIMIT = 100
+
+
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
 def bulk_update_issues(request):
     """
     Bulk update multiple issues at once
     """
-    issue_ids = request.data.get('issue_ids', [])
-    updates = request.data.get('updates', {})
+    serializer = BulkIssueUpdateSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-    if not issue_ids or not updates:
-        return Response(
-            {'error': 'issue_ids and updates are required'}, 
-            status=status.HTTP_400_BAD_REQUEST
+    try:
+        updated_ids, skipped_ids = bulk.bulk_update(
+            request.user,
+            serializer.validated_data['issue_ids'],
+            serializer.validated_data['updates']
         )
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
     
-    # Get issues that user can modify
+    # Echo back at most BULK_RESPONSE_LIMIT full issues
     issues = Issue.objects.filter(
-        id__in=issue_ids,
-        is_active=True
+        id__in=updated_ids[:BULK_RESPONSE_LIMIT]
     ).select_related('project', 'reporter', 'assignee')
     
-    updated_issues = []
-    for issue in issues:
-        # Check permissions
-        can_update = (
-            issue.reporter == request.user or 
-            issue.assignee == request.user or
-            issue.project.created_by == request.user or
-            request.user in issue.project.members.all()
-        )
-        
-        if can_update:
-            # Apply updates
-            for field, value in updates.items():
-                if hasattr(issue, field) and field not in ['id', 'created_at', 'reporter', 'project']:
-                    if field == 'assignee_id':
-                        if value:
-                            try:
-                                assignee = User.objects.get(id=value)
-                                issue.assignee = assignee
-                            except User.DoesNotExist:
-                                continue
-                        else:
-                            issue.assignee = None
-                    else:
-                        setattr(issue, field, value)
-            
-            issue.save()
-            updated_issues.append(issue)
-    
     return Response({
-        'updated_count': len(updated_issues),
-        'issues': IssueSerializer(updated_issues, many=True).data
+        'updated_count': len(updated_ids),
+        'issue_ids': updated_ids,
+        'skipped_ids': skipped_ids,
+        'issues': IssueSerializer(issues, many=True).data,
+        'issues_truncated': len(updated_ids) > BULK_RESPONSE_LIMIT
     })
 
 
@@ -458,7 +624,7 @@ def bulk_update_issues(request):
 @permission_classes([IsAuthenticated])
 def global_search(request):
     """
-    Global search across projects, issues, and comments
+    Ranked full-text search across projects, issues, and their comments
     """
     query = request.GET.get('q', '').strip()
     if not query or len(query) < 3:
@@ -467,36 +633,54 @@ def global_search(request):
             status=status.HTTP_400_BAD_REQUEST
         )
     
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        page_size = min(max(int(request.GET.get('page_size', 20)), 1), 50)
+    except ValueError:
+        return Response(
+            {'error': 'page and page_size must be integers'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    
     # Get user's accessible projects
-    user_projects = Project.objects.filter(
-        Q(created_by=request.user) | Q(members=request.user),
-        is_active=True
-    ).distinct()
+    user_projects = access.scope(Project.objects.filter(is_active=True), request.user, 'pk').values('id')
+    documents = SearchDocument.objects.filter(project_id__in=user_projects)
     
-    # Search projects
-    projects = user_projects.filter(
-        Q(name__icontains=query) | Q(description__icontains=query)
-    )[:10]
+    total, hits = search.search(documents, query, offset=(page - 1) * page_size, limit=page_size)
     
-    # Search issues
+    # Load the matched objects for this page in one query per type
     issues = Issue.objects.filter(
-        project__in=user_projects,
-        is_active=True
-    ).filter(
-        Q(title__icontains=query) | Q(description__icontains=query)
-    ).select_related('project', 'reporter', 'assignee')[:20]
-    
-    # Search comments
-    comments = Comment.objects.filter(
-        issue__project__in=user_projects,
-        content__icontains=query
-    ).select_related('author', 'issue')[:15]
+        id__in=[hit['issue_id'] for hit in hits if hit['issue_id']], is_active=True
+    ).select_related('project', 'reporter', 'assignee').in_bulk()
+    projects = Project.objects.filter(
+        id__in=[hit['project_id'] for hit in hits if not hit['issue_id']]
+    ).select_related('created_by').prefetch_related(MEMBERS_PREFETCH).in_bulk()
+    
+    results = []
+    for hit in hits:
+        if hit['issue_id']:
+            obj_type, obj = 'issue', issues.get(hit['issue_id'])
+            data = IssueSerializer(obj, context={'request': request}).data if obj else None
+        else:
+            obj_type, obj = 'project', projects.get(hit['project_id'])
+            data = ProjectSerializer(obj, context={'request': request}).data if obj else None
+        if data is None:
+            continue
+        results.append({
+            'type': obj_type,
+            'id': obj.id,
+            'rank': hit['rank'],
+            'highlight': {'title': hit['title'], 'snippet': hit['snippet']},
+            obj_type: data,
+        })
     
+    base_url = request.build_absolute_uri()
     return Response({
-        'projects': ProjectSerializer(projects, many=True).data,
-        'issues': IssueSerializer(issues, many=True).data,
-        'comments': CommentSerializer(comments, many=True).data,
-        'total_results': projects.count() + issues.count() + comments.count()
+        'count': total,
+        'total_results': total,
+        'next': replace_query_param(base_url, 'page', page + 1) if page * page_size < total else None,
+        'previous': replace_query_param(base_url, 'page', page - 1) if page > 1 else None,
+        'results': results,
     })
 
 
@@ -516,46 +700,39 @@ def project_analytics(request, project_id):
         )
     
     # Check if user has access to project
-    if not (project.created_by == request.user or request.user in project.members.all()):
+    if not access.for_request(request).is_member(project.pk):
         return Response(
             {'error': 'Access denied'}, 
             status=status.HTTP_403_FORBIDDEN
         )
     
-    # Calculate analytics
-    issues = Issue.objects.filter(project=project, is_active=True)
-    
-    status_counts = {}
-    for status_choice in Issue.STATUS_CHOICES:
-        status_counts[status_choice[0]] = issues.filter(status=status_choice[0]).count()
-    
-    priority_counts = {}
-    for priority_choice in Issue.PRIORITY_CHOICES:
-        priority_counts[priority_choice[0]] = issues.filter(priority=priority_choice[0]).count()
+    # Daily trends from the rollup table, last 30 days by default
+    try:
+        end = date.fromisoformat(request.GET['end']) if 'end' in request.GET else timezone.localdate()
+        start = date.fromisoformat(request.GET['start']) if 'start' in request.GET else end - timedelta(days=30)
+    except ValueError:
+        return Response(
+            {'error': 'start and end must be dates in YYYY-MM-DD format'}, 
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     # Recent activity
     recent_activities = Activity.objects.filter(
         project=project
-    ).select_related('user', 'issue')[:20]
+    ).select_related('user', 'issue', 'project')[:20]
     
     # Top contributors
-    from django.db.models import Count
-    top_contributors = User.objects.filter(
-        Q(reported_issues__project=project) | Q(assigned_issues__project=project)
-    ).annotate(
-        issue_count=Count('reported_issues', filter=Q(reported_issues__project=project)) +
-                   Count('assigned_issues', filter=Q(assigned_issues__project=project))
-    ).order_by('-issue_count')[:10]
+    contributors = analytics.top_contributors(project)
+    users = User.objects.in_bulk([user_id for user_id, _count in contributors])
+    top_contributors = [
+        {**UserSerializer(users[user_id]).data, 'issue_count': issue_count}
+        for user_id, issue_count in contributors if user_id in users
+    ]
     
     return Response({
         'project': ProjectSerializer(project).data,
-        'total_issues': issues.count(),
-        'status_distribution': status_counts,
-        'priority_distribution': priority_counts,
+        **analytics.project_summary(project),
         'recent_activities': ActivitySerializer(recent_activities, many=True).data,
-        'top_contributors': UserSerializer(top_contributors, many=True).data,
-        'overdue_issues': issues.filter(
-            due_date__lt=timezone.now(),
-            status__in=['open', 'in_progress', 'reopened']
-        ).count()
+        'top_contributors': top_contributors,
+        'trends': analytics.trends(project, start, end),
     })
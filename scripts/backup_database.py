@@ -3,10 +3,10 @@
 Database backup utility for Bug Reporting System
 """
 
+import argparse
 import os
 import sys
 import django
-import json
 from datetime import datetime
 from django.core import serializers
 
@@ -18,55 +18,72 @@ os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'bugreporting.settings')
 django.setup()
 
 from django.contrib.auth.models import User
+from django.db import transaction
+from core import backup, restore
 from core.models import Project, Issue, Comment, Label, Activity, IssueAttachment, IssueLabel
 
-def create_backup():
-    """Create a JSON backup of all data"""
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    backup_dir = os.path.join(os.path.dirname(__file__), '..', 'backups')
-    
-    # Create backups directory if it doesn't exist
-    os.makedirs(backup_dir, exist_ok=True)
-    
-    backup_file = os.path.join(backup_dir, f'backup_{timestamp}.json')
-    
-    print(f"Creating backup: {backup_file}")
-    
-    # Models to backup
-    models_to_backup = [
-        User,
-        Project,
-        Issue,
+BACKUP_DIR = os.path.join(os.path.dirname(__file__), '..', 'backups')
+
+def create_backup(compression=None, jobs=1, chunk_size=backup.CHUNK_SIZE, incremental=False, parent=None):
+    """Stream every table, or only the changes since the last backup, into a compressed backup directory"""
+    os.makedirs(BACKUP_DIR, exist_ok=True)
+    
+    kind = 'incremental' if incremental else 'full'
+    print(f"Creating {kind} backup in {BACKUP_DIR} ({compression or backup.default_compression()})")
+    backup_path = backup.create_backup(
+        BACKUP_DIR, compression=compression, jobs=jobs, chunk_size=chunk_size,
+        incremental=incremental, parent=parent,
+    )
+    
+    manifest = backup.load_manifest(backup_path)
+    total = sum(entry['rows'] for entry in manifest['tables'])
+    size = sum(entry['bytes'] for entry in manifest['tables'])
+    print(f"Backup completed: {backup_path}")
+    print(f"Total rows backed up: {total} ({size} bytes compressed)")
+    
+    return backup_path
+
+def verify_backup(backup_path):
+    """Check a backup's files against its manifest"""
+    problems = backup.verify(backup_path)
+    for problem in problems:
+        print(f"  {problem}")
+    if problems:
+        print(f"Backup is damaged: {len(problems)} problem(s)")
+        return False
+    print("Backup is intact.")
+    return True
+
+def _restore_legacy(backup_file):
+    """Restore a single-file JSON backup from before the streaming format"""
+    # Clear existing data (in reverse order to handle dependencies)
+    models_to_clear = [
+        IssueAttachment,
+        Activity,
+        IssueLabel,
         Comment,
+        Issue,
+        Project,
         Label,
-        IssueLabel,
-        Activity,
-        IssueAttachment,
+        # Don't clear User objects to preserve admin accounts
     ]
     
-    all_objects = []
-    
-    for model in models_to_backup:
-        objects = model.objects.all()
-        serialized = serializers.serialize('json', objects)
-        model_data = json.loads(serialized)
-        
-        print(f"Backing up {len(model_data)} {model.__name__} objects")
-        all_objects.extend(model_data)
+    for model in models_to_clear:
+        count = model.objects.count()
+        model.objects.all().delete()
+        print(f"Cleared {count} {model.__name__} objects")
     
-    # Write backup file
-    with open(backup_file, 'w') as f:
-        json.dump(all_objects, f, indent=2, default=str)
-    
-    print(f"Backup completed: {backup_file}")
-    print(f"Total objects backed up: {len(all_objects)}")
-    
-    return backup_file
+    with open(backup_file, 'r') as f:
+        for obj in serializers.deserialize('json', f.read()):
+            # Skip User objects if they already exist
+            if isinstance(obj.object, User) and User.objects.filter(pk=obj.object.pk).exists():
+                continue
+            obj.save()
 
 def restore_backup(backup_file):
-    """Restore data from a JSON backup file"""
+    """Restore data from a backup directory or legacy JSON file"""
     if not os.path.exists(backup_file):
-        print(f"Backup file not found: {backup_file}")
+        print(f"Backup not found: {backup_file}")
         return False
     
     print(f"Restoring from backup: {backup_file}")
@@ -78,37 +95,12 @@ def restore_backup(backup_file):
         return False
     
     try:
-        with open(backup_file, 'r') as f:
-            backup_data = json.load(f)
-        
-        print(f"Found {len(backup_data)} objects in backup")
-        
-        # Clear existing data (in reverse order to handle dependencies)
-        models_to_clear = [
-            IssueAttachment,
-            Activity,
-            IssueLabel,
-            Comment,
-            Issue,
-            Project,
-            Label,
-            # Don't clear User objects to preserve admin accounts
-        ]
-        
-        for model in models_to_clear:
-            count = model.objects.count()
-            model.objects.all().delete()
-            print(f"Cleared {count} {model.__name__} objects")
-        
-        # Restore data
-        for obj_data in backup_data:
-            # Skip User objects if they already exist
-            if obj_data['model'] == 'auth.user':
-                continue
-            
-            # Deserialize and save
-            for obj in serializers.deserialize('json', [obj_data]):
-                obj.save()
+        if backup.is_backup(backup_file):
+            total = restore.restore(backup_file)
+            print(f"Total rows restored: {total}")
+        else:
+            with transaction.atomic():
+                _restore_legacy(backup_file)
         
         print("Backup restored successfully!")
         return True
@@ -119,13 +111,16 @@ def restore_backup(backup_file):
 
 def list_backups():
     """List available backup files"""
-    backup_dir = os.path.join(os.path.dirname(__file__), '..', 'backups')
+    backup_dir = BACKUP_DIR
     
     if not os.path.exists(backup_dir):
         print("No backups directory found.")
         return []
     
-    backup_files = [f for f in os.listdir(backup_dir) if f.startswith('backup_') and f.endswith('.json')]
+    backup_files = [
+        f for f in os.listdir(backup_dir)
+        if f.startswith('backup_') and (f.endswith('.json') or backup.is_backup(os.path.join(backup_dir, f)))
+    ]
     backup_files.sort(reverse=True)  # Most recent first
     
     if not backup_files:
@@ -135,9 +130,15 @@ def list_backups():
     print("Available backups:")
     for i, filename in enumerate(backup_files, 1):
         filepath = os.path.join(backup_dir, filename)
-        size = os.path.getsize(filepath)
+        kind = ''
+        if backup.is_backup(filepath):
+            manifest = backup.load_manifest(filepath)
+            size = sum(entry['bytes'] for entry in manifest['tables'])
+            kind = f", {manifest['kind']}"
+        else:
+            size = os.path.getsize(filepath)
         mtime = datetime.fromtimestamp(os.path.getmtime(filepath))
-        print(f"  {i}. {filename} ({size} bytes, {mtime.strftime('%Y-%m-%d %H:%M:%S')})")
+        print(f"  {i}. {filename} ({size} bytes{kind}, {mtime.strftime('%Y-%m-%d %H:%M:%S')})")
     
     return backup_files
 
@@ -146,37 +147,41 @@ def main():
     print("Bug Reporting System - Database Backup Utility")
     print("=" * 50)
     
-    if len(sys.argv) < 2:
-        print("Usage:")
-        print("  python backup_database.py create          - Create a new backup")
-        print("  python backup_database.py restore <file>  - Restore from backup")
-        print("  python backup_database.py list            - List available backups")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(prog='backup_database.py')
+    commands = parser.add_subparsers(dest='command', required=True)
     
-    command = sys.argv[1].lower()
+    create = commands.add_parser('create', help='Create a new backup')
+    create.add_argument('--compression', choices=sorted(backup.CODECS), help='Default: zstd when installed, else gzip')
+    create.add_argument('--jobs', type=int, default=1, help='Dump this many tables in parallel (PostgreSQL)')
+    create.add_argument('--chunk-size', type=int, default=backup.CHUNK_SIZE, help='Rows fetched per round trip')
+    create.add_argument('--incremental', action='store_true', help='Only back up changes since the previous backup')
+    create.add_argument('--parent', help='Backup an incremental builds on (default: the latest)')
     
-    if command == 'create':
-        create_backup()
+    restore = commands.add_parser('restore', help='Restore from backup')
+    restore.add_argument('backup', help='Backup directory or legacy .json file; incrementals restore their whole chain')
     
-    elif command == 'restore':
-        if len(sys.argv) < 3:
-            print("Please specify the backup file to restore from.")
-            list_backups()
-            sys.exit(1)
-        
-        backup_file = sys.argv[2]
-        if not os.path.isabs(backup_file):
-            backup_dir = os.path.join(os.path.dirname(__file__), '..', 'backups')
-            backup_file = os.path.join(backup_dir, backup_file)
+    verify = commands.add_parser('verify', help='Check a backup against its manifest')
+    verify.add_argument('backup', help='Backup directory')
+    
+    commands.add_parser('list', help='List available backups')
+    
+    args = parser.parse_args()
+    
+    if args.command == 'create':
+        create_backup(args.compression, args.jobs, args.chunk_size, args.incremental, args.parent)
+    
+    elif args.command in ('restore', 'verify'):
+        backup_path = args.backup
+        if not os.path.isabs(backup_path):
+            backup_path = os.path.join(BACKUP_DIR, backup_path)
         
-        restore_backup(backup_file)
+        if args.command == 'restore':
+            restore_backup(backup_path)
+        elif not verify_backup(backup_path):
+            sys.exit(1)
     
-    elif command == 'list':
+    elif args.command == 'list':
         list_backups()
-    
-    else:
-        print(f"Unknown command: {command}")
-        sys.exit(1)
 
 if __name__ == '__main__':
     main()